@@ -0,0 +1,101 @@
+"""Measure what the symlink-aware access check costs on top of the lexical one.
+
+Run from the repository root:
+
+    python benchmarks/access_checks.py [--dirs 200] [--files 100] [--repeat 9]
+
+Builds a scratch tree (with a few symlinks) under a temp directory, points
+%APPDATA% at a config that allows it, and reports the best of ``--repeat``
+runs for a bare check and for the batch tools that check every path.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from bench_env import TREE, best, cleanup
+import filesystem
+
+def build_tree(dirs, files):
+    paths = []
+    for d in range(dirs):
+        dir_path = os.path.join(TREE, f'd{d}')
+        os.makedirs(dir_path)
+        for i in range(files):
+            path = os.path.join(dir_path, f'f{i}.txt')
+            with open(path, 'w') as f:
+                f.write(path)
+            paths.append(path)
+        if d % 10 == 0:
+            os.symlink(os.path.join(dir_path, 'f0.txt'), os.path.join(dir_path, 'link'))
+    return paths
+
+def lexical_only(path, matcher=None, resolved_dirs=None):
+    """The access check as it was before symlinks were resolved."""
+    node = filesystem.allowed_matcher() if matcher is None else matcher
+    return filesystem._matches_allowed(os.path.abspath(path), node)
+
+def check_in_batches(paths, matcher):
+    """Check paths the way get_files_info does, sharing resolved parents within a batch."""
+    for i in range(0, len(paths), filesystem.FILES_INFO_BATCH):
+        resolved_dirs = {}
+        for path in paths[i:i + filesystem.FILES_INFO_BATCH]:
+            filesystem.is_path_allowed(path, matcher, resolved_dirs)
+
+async def compare(repeat, func):
+    """Best times of ``func`` with the lexical and the resolving check, runs interleaved."""
+    original = filesystem.is_path_allowed
+    times = {lexical_only: [], original: []}
+    try:
+        for _ in range(repeat):
+            for check in times:
+                filesystem.is_path_allowed = check
+                start = time.perf_counter()
+                await func()
+                times[check].append(time.perf_counter() - start)
+    finally:
+        filesystem.is_path_allowed = original
+    return min(times[lexical_only]), min(times[original])
+
+async def time_tools(paths, repeat):
+    # Warm the hash cache so hash_files measures the checks and stats, not hashing
+    await filesystem.hash_files(paths)
+    infos = json.loads(await filesystem.get_files_info(paths))
+    assert not any('error' in info for info in infos), "benchmark paths must all be allowed"
+    tools = {
+        'get_files_info': lambda: filesystem.get_files_info(paths),
+        'hash_files (cached)': lambda: filesystem.hash_files(paths),
+    }
+    for name, func in tools.items():
+        lexical, resolved = await compare(repeat, func)
+        print(f"  {name:22} {len(paths)} paths: lexical {lexical * 1e3:7.1f} ms, "
+              f"resolved {resolved * 1e3:7.1f} ms ({(resolved / lexical - 1) * 100:+.1f}%)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dirs', type=int, default=200)
+    parser.add_argument('--files', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=9)
+    args = parser.parse_args()
+    try:
+        paths = build_tree(args.dirs, args.files)
+        matcher = filesystem.allowed_matcher()
+        print(f"{len(paths)} files in {args.dirs} directories; best of {args.repeat} runs")
+
+        per_check = {
+            'lexical only': lambda: [lexical_only(p, matcher) for p in paths],
+            'resolved (cached dirs)': lambda: [filesystem.is_path_allowed(p, matcher) for p in paths],
+            'resolved (per batch)': lambda: check_in_batches(paths, matcher),
+            'os.path.realpath': lambda: [os.path.realpath(p) for p in paths],
+        }
+        for name, func in per_check.items():
+            print(f"  check, {name:24} {best(args.repeat, func) / len(paths) * 1e6:6.2f} us/path")
+
+        # The tools share semaphores bound to one event loop, so time them all inside one
+        asyncio.run(time_tools(paths[::4], args.repeat))
+    finally:
+        cleanup()
+
+if __name__ == '__main__':
+    main()
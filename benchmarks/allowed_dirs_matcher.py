@@ -0,0 +1,58 @@
+"""Compare the allowed-directory trie with the linear scan it replaced.
+
+Run from the repository root:
+
+    python benchmarks/allowed_dirs_matcher.py [--roots 30] [--paths 200000] [--repeat 3]
+
+Checks a mix of paths inside and outside ``--roots`` allowed directories
+with both implementations, verifies they agree on every path and reports
+the best of ``--repeat`` runs.
+"""
+import argparse
+import os
+import random
+
+from bench_env import ROOT, best, cleanup
+import filesystem
+
+def linear_scan(path, allowed_dirs):
+    """is_path_allowed as it was before the trie: re-normalize every root per call."""
+    path = os.path.abspath(os.path.normpath(path))
+    normalized_allowed_dirs = [os.path.abspath(os.path.normpath(dir_path)) for dir_path in allowed_dirs]
+    for allowed_dir in normalized_allowed_dirs:
+        if path.lower().startswith(allowed_dir.lower() + os.sep) or path.lower() == allowed_dir.lower():
+            return True
+    return False
+
+def make_paths(roots, count):
+    rng = random.Random(0)
+    paths = []
+    for _ in range(count):
+        base = rng.choice(roots) if rng.random() < 0.7 else os.path.join(ROOT, 'elsewhere', str(rng.randrange(50)))
+        depth = rng.randrange(1, 8)
+        paths.append(os.path.join(base, *(f'dir{rng.randrange(20)}' for _ in range(depth)), 'file.txt'))
+    return paths
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--roots', type=int, default=30)
+    parser.add_argument('--paths', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    try:
+        roots = [os.path.join(ROOT, 'projects', f'Project{i}', 'src') for i in range(args.roots)]
+        paths = make_paths(roots, args.paths)
+        trie = filesystem.build_allowed_matcher(roots)
+        lexical = lambda p: filesystem._matches_allowed(os.path.abspath(p), trie)
+        
+        mismatches = sum(linear_scan(p, roots) != lexical(p) for p in paths)
+        print(f"{len(paths)} paths, {len(roots)} allowed roots; best of {args.repeat} runs; "
+              f"{mismatches} mismatches")
+        for name, check in (('linear scan', lambda p: linear_scan(p, roots)), ('trie', lexical)):
+            elapsed = best(args.repeat, lambda: [check(p) for p in paths])
+            print(f"  {name:12} {elapsed:7.2f} s  ({elapsed / len(paths) * 1e6:5.2f} us/path)")
+    finally:
+        cleanup()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+"""Scratch environment shared by the benchmark scripts.
+
+Importing this module creates a temp directory, points %APPDATA% at a config
+that allows ``TREE`` inside it and puts ``src`` on the import path, so it must
+be imported before the servers. Call ``cleanup()`` when done.
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.realpath(tempfile.mkdtemp(prefix='mcp_bench_'))
+TREE = os.path.join(ROOT, 'tree')
+os.environ['APPDATA'] = os.path.join(ROOT, 'appdata')
+os.environ.setdefault('LOCALAPPDATA', os.path.join(ROOT, 'localappdata'))
+CONFIG_DIR = os.path.join(os.environ['APPDATA'], 'Claude', 'mcp_scripts')
+os.makedirs(CONFIG_DIR)
+os.makedirs(TREE)
+with open(os.path.join(CONFIG_DIR, 'allowed_dirs.json'), 'w', encoding='utf-8') as f:
+    json.dump({"allowed_dirs": [TREE]}, f)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+def cleanup():
+    shutil.rmtree(ROOT, ignore_errors=True)
+
+def best(repeat, func):
+    """Best wall time of ``repeat`` calls to ``func``."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
@@ -0,0 +1,88 @@
+"""Compare search_files with the os.walk implementation it replaced.
+
+Run from the repository root:
+
+    python benchmarks/search_files.py [--projects 100] [--files 200] [--repeat 3]
+
+Builds ``--projects`` directories that each hold a source tree and a
+node_modules tree, then times a plain search, a search excluding
+node_modules and an early stop with max_results, checking that the old and
+new implementations return the same matches.
+"""
+import argparse
+import asyncio
+import fnmatch
+import json
+import os
+import time
+
+from bench_env import TREE, best, cleanup
+import filesystem
+
+def os_walk_search(path, pattern, exclude_patterns=None):
+    """search_files as it was before scandir, minus the per-path access check."""
+    matches = []
+    exclude_patterns = exclude_patterns or []
+    for root, dirnames, filenames in os.walk(path):
+        if any(fnmatch.fnmatch(root.lower(), p.lower()) for p in exclude_patterns):
+            continue
+        for name in dirnames + filenames:
+            full_path = os.path.join(root, name)
+            if fnmatch.fnmatch(name.lower(), pattern.lower()):
+                if not any(fnmatch.fnmatch(full_path.lower(), p.lower()) for p in exclude_patterns):
+                    matches.append(full_path)
+    return matches
+
+def build_tree(projects, files):
+    count = 0
+    for p in range(projects):
+        for sub, ext in (('src', '.py'), ('docs', '.md'), (os.path.join('node_modules', 'pkg'), '.js')):
+            for d in range(4):
+                dir_path = os.path.join(TREE, f'project{p}', sub, f'd{d}')
+                os.makedirs(dir_path)
+                for i in range(files // 4):
+                    open(os.path.join(dir_path, f'f{i}{ext}'), 'w').close()
+                    count += 1
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--projects', type=int, default=100)
+    parser.add_argument('--files', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    try:
+        entries = build_tree(args.projects, args.files)
+        print(f"{entries} files under {TREE}; best of {args.repeat} runs")
+        
+        async def run():
+            cases = (
+                ('*.py, no excludes', '*.py', None, None),
+                ('*.py, exclude node_modules', '*.py', ['node_modules'], ['*node_modules*']),
+                ('*.js, max_results=100', '*.js', None, None),
+            )
+            for name, pattern, excludes, old_excludes in cases:
+                limit = 100 if 'max_results' in name else None
+                search = lambda: filesystem.search_files(
+                    TREE, pattern, excludes, max_results=limit,
+                    max_bytes=filesystem.RESPONSE_MAX_BYTES, max_entries=filesystem.RESPONSE_MAX_ENTRIES)
+                times = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    result = json.loads(await search())
+                    times.append(time.perf_counter() - start)
+                new = sorted(result['matches'] if isinstance(result, dict) else result)
+                line = f"  {name:28} scandir {min(times):6.3f} s"
+                if limit is None:
+                    old = sorted(os_walk_search(TREE, pattern, old_excludes))
+                    elapsed = best(args.repeat, lambda: os_walk_search(TREE, pattern, old_excludes))
+                    line = (f"  {name:28} os.walk {elapsed:6.3f} s, scandir {min(times):6.3f} s, "
+                            f"{len(new)} matches, {'same' if old == new else 'DIFFERENT'} results")
+                print(line)
+                
+        asyncio.run(run())
+    finally:
+        cleanup()
+
+if __name__ == '__main__':
+    main()
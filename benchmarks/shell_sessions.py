@@ -0,0 +1,52 @@
+"""Compare run_command latency in a persistent session with a new shell per call.
+
+Run from the repository root:
+
+    python benchmarks/shell_sessions.py [--calls 200] [--command "echo hi"]
+
+Runs ``--calls`` commands each way, interleaved, and reports the median and
+95th percentile per-call latency. The session numbers include the framing
+around each command; the one-shot numbers include starting a shell.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from bench_env import cleanup
+import terminal
+
+async def time_calls(calls, command):
+    spawned, session = [], []
+    # Start the session outside the timed calls, as a pooled session would be
+    await terminal.run_command(command, session='bench')
+    try:
+        for _ in range(calls):
+            for times, kwargs in ((spawned, {}), (session, {'session': 'bench'})):
+                start = time.perf_counter()
+                output = await terminal.run_command(command, **kwargs)
+                times.append(time.perf_counter() - start)
+                assert 'Error' not in output, output
+    finally:
+        await terminal.close_session('bench')
+    return spawned, session
+
+def summarize(name, times):
+    cut = statistics.quantiles(times, n=20)[-1]
+    print(f"  {name:18} median {statistics.median(times) * 1e3:7.2f} ms, p95 {cut * 1e3:7.2f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--calls', type=int, default=200)
+    parser.add_argument('--command', default='echo hi')
+    args = parser.parse_args()
+    try:
+        spawned, session = asyncio.run(time_calls(args.calls, args.command))
+        print(f"{args.calls} calls of {args.command!r} each way")
+        summarize('new shell per call', spawned)
+        summarize('session', session)
+    finally:
+        cleanup()
+
+if __name__ == '__main__':
+    main()
@@ -70,7 +70,7 @@ def copy_files_to_mcp_scripts():
     mcp_scripts_path = os.path.join(os.environ['APPDATA'], 'Claude', 'mcp_scripts')
     
     print(_('copying_files'))
-    files_to_copy = ['filesystem.py', 'terminal.py', 'allowed_dirs_manager.py']
+    files_to_copy = ['filesystem.py', 'terminal.py', 'allowed_dirs_manager.py', 'allowed_dirs_config.py']
     
     for file in files_to_copy:
         src_file = os.path.join(src_dir, file)
@@ -0,0 +1,101 @@
+import os
+import sys
+import json
+import tempfile
+import threading
+
+# Path to the allowed_dirs.json file shared by all MCP servers
+ALLOWED_DIRS_PATH = os.path.join(os.environ['APPDATA'], 'Claude', 'mcp_scripts', 'allowed_dirs.json')
+
+# Location used by older versions of filesystem.py
+LEGACY_ALLOWED_DIRS_PATH = os.path.join(os.environ['APPDATA'], 'Claude', 'allowed_dirs.json')
+
+_lock = threading.Lock()
+_cache = {'key': None, 'dirs': (), 'version': 0}
+
+def _stat_config():
+    """Return ``(path, stat_result)`` for the config in use, or ``(path, None)`` if missing.
+
+    The current location costs a single ``stat``; the legacy one is only
+    tried when that fails.
+    """
+    try:
+        return ALLOWED_DIRS_PATH, os.stat(ALLOWED_DIRS_PATH)
+    except OSError:
+        pass
+    try:
+        return LEGACY_ALLOWED_DIRS_PATH, os.stat(LEGACY_ALLOWED_DIRS_PATH)
+    except OSError:
+        return ALLOWED_DIRS_PATH, None
+
+def config_path():
+    """Return the allowed_dirs.json in use, falling back to the legacy location."""
+    return _stat_config()[0]
+
+def read_config_data(path=None):
+    """Return the whole config file as a dict, for callers that are about to rewrite it.
+
+    A missing file reads as an empty list. Unlike the servers' read path,
+    an unreadable file raises ValueError instead of falling back to an empty
+    list, so an update cannot save over entries it failed to parse.
+    """
+    path = config_path() if path is None else path
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {"allowed_dirs": []}
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Configuration file at {path} is not valid JSON ({e}); "
+                         "fix it before changing allowed directories")
+    if not isinstance(data, dict) or not isinstance(data.get('allowed_dirs', []), list):
+        raise ValueError(f"Configuration file at {path} must be an object with an allowed_dirs list")
+    data.setdefault('allowed_dirs', [])
+    return data
+
+def _read_config(path):
+    """Parse the config file, returning an empty list if it is missing or invalid."""
+    try:
+        return tuple(read_config_data(path)['allowed_dirs'])
+    except OSError:
+        # stdout is the MCP channel, so diagnostics go to stderr
+        print(f"Warning: Could not read configuration file at {path}. Using empty allowed directories.",
+              file=sys.stderr)
+    except ValueError as e:
+        print(f"Error: {e}. Using empty allowed directories.", file=sys.stderr)
+    return ()
+
+def load_allowed_dirs():
+    """Return ``(allowed_dirs, version)`` from the shared config file.
+
+    The parsed list is cached and only re-read when the file's path, mtime or
+    size changes, so each call costs a single ``stat``. ``version`` increases
+    whenever the list is re-read, letting callers rebuild derived state.
+    """
+    path, stat_info = _stat_config()
+    key = (path, None, None) if stat_info is None else (path, stat_info.st_mtime_ns, stat_info.st_size)
+
+    with _lock:
+        if key != _cache['key']:
+            _cache['dirs'] = _read_config(path)
+            _cache['key'] = key
+            _cache['version'] += 1
+        return _cache['dirs'], _cache['version']
+
+def save_allowed_dirs(allowed_dirs, data=None):
+    """Atomically write the allowed directories list to the shared config file.
+
+    Other top-level keys are kept: pass the ``data`` the list was read from,
+    or leave it out to re-read the file (which raises if it is invalid).
+    """
+    data = dict(read_config_data() if data is None else data)
+    data['allowed_dirs'] = list(allowed_dirs)
+    os.makedirs(os.path.dirname(ALLOWED_DIRS_PATH), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(ALLOWED_DIRS_PATH), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=4)
+        os.replace(tmp_path, ALLOWED_DIRS_PATH)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
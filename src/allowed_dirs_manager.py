@@ -1,14 +1,12 @@
 import os
 import json
-from typing import List, Dict, Any
+from typing import List
 from mcp.server.fastmcp import FastMCP
+from allowed_dirs_config import config_path, load_allowed_dirs, read_config_data, save_allowed_dirs
 
 # Initialize FastMCP server
 mcp = FastMCP("allowed_dirs_manager")
 
-# Path to the allowed_dirs.json file
-ALLOWED_DIRS_PATH = os.path.join(os.environ['APPDATA'], 'Claude', 'mcp_scripts', 'allowed_dirs.json')
-
 # Define protected directories that should not be removed
 PROTECTED_DIRS = [
     os.path.normpath(os.path.join(os.environ['LOCALAPPDATA'], 'AnthropicClaude')),
@@ -28,12 +26,8 @@ async def get_allowed_directories() -> str:
         JSON string with the list of allowed directories
     """
     try:
-        if not os.path.exists(ALLOWED_DIRS_PATH):
-            return json.dumps({"allowed_dirs": []})
-            
-        with open(ALLOWED_DIRS_PATH, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            return json.dumps(data)
+        allowed_dirs, _ = load_allowed_dirs()
+        return json.dumps({"allowed_dirs": list(allowed_dirs)})
     except Exception as e:
         return json.dumps({"error": str(e)})
 
@@ -47,23 +41,19 @@ async def add_allowed_directory(directory: str) -> str:
     try:
         directory = os.path.normpath(directory)
         
-        # Load existing data
-        if os.path.exists(ALLOWED_DIRS_PATH):
-            with open(ALLOWED_DIRS_PATH, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-        else:
-            data = {"allowed_dirs": []}
+        # Load existing data; an unreadable file raises instead of being overwritten
+        data = read_config_data()
+        allowed_dirs = list(data["allowed_dirs"])
             
         # Check if directory already exists
-        if directory in data["allowed_dirs"]:
+        if directory in allowed_dirs:
             return json.dumps({"success": False, "message": "Directory already in allowed list"})
             
         # Add directory
-        data["allowed_dirs"].append(directory)
+        allowed_dirs.append(directory)
         
         # Save updated data
-        with open(ALLOWED_DIRS_PATH, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=4)
+        save_allowed_dirs(allowed_dirs, data)
             
         return json.dumps({"success": True, "message": f"Added '{directory}' to allowed directories"})
     except Exception as e:
@@ -87,22 +77,21 @@ async def remove_allowed_directory(directory: str) -> str:
             })
         
         # Load existing data
-        if not os.path.exists(ALLOWED_DIRS_PATH):
+        if not os.path.exists(config_path()):
             return json.dumps({"success": False, "message": "Allowed directories file does not exist"})
             
-        with open(ALLOWED_DIRS_PATH, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = read_config_data()
+        allowed_dirs = list(data["allowed_dirs"])
             
         # Check if directory exists in list
-        if directory not in data["allowed_dirs"]:
+        if directory not in allowed_dirs:
             return json.dumps({"success": False, "message": "Directory not in allowed list"})
             
         # Remove directory
-        data["allowed_dirs"].remove(directory)
+        allowed_dirs.remove(directory)
         
         # Save updated data
-        with open(ALLOWED_DIRS_PATH, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=4)
+        save_allowed_dirs(allowed_dirs, data)
             
         return json.dumps({"success": True, "message": f"Removed '{directory}' from allowed directories"})
     except Exception as e:
@@ -124,12 +113,8 @@ async def update_allowed_directories(directories: List[str]) -> str:
             if protected_dir not in normalized_dirs:
                 normalized_dirs.append(protected_dir)
                 
-        # Update data
-        data = {"allowed_dirs": normalized_dirs}
-        
         # Save updated data
-        with open(ALLOWED_DIRS_PATH, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=4)
+        save_allowed_dirs(normalized_dirs)
             
         return json.dumps({
             "success": True, 
@@ -149,14 +134,11 @@ async def check_directory_allowed(directory: str) -> str:
         directory = os.path.normpath(directory)
         
         # Load existing data
-        if not os.path.exists(ALLOWED_DIRS_PATH):
+        if not os.path.exists(config_path()):
             return json.dumps({"allowed": False, "message": "Allowed directories file does not exist"})
             
-        with open(ALLOWED_DIRS_PATH, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            
         # Check if directory exists in list
-        is_allowed = directory in data["allowed_dirs"]
+        is_allowed = directory in load_allowed_dirs()[0]
         
         return json.dumps({
             "allowed": is_allowed,
@@ -1,75 +1,772 @@
 import os
+import sys
 import json
 import shutil
-import glob
+import stat
+import re
+import fnmatch
 import datetime
+import asyncio
+import base64
+import errno
+import functools
+import hashlib
+import itertools
+import threading
+import bisect
+import codecs
+import ctypes
+import mmap
+import select
+import sqlite3
+import struct
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from array import array
+from collections import OrderedDict, deque
 from typing import List, Optional, Dict, Any, Union
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import FastMCP, Context
+from allowed_dirs_config import load_allowed_dirs
 
 # Initialize FastMCP server
 mcp = FastMCP("filesystem")
 
-# Load allowed directories from a configuration file
-CONFIG_PATH = os.path.join(os.environ['APPDATA'], 'Claude', 'allowed_dirs.json')
-
-try:
-    with open(CONFIG_PATH, 'r', encoding='utf-8') as config_file:
-        config_data = json.load(config_file)
-        ALLOWED_DIRS = config_data.get('allowed_dirs', [])
-except FileNotFoundError:
-    ALLOWED_DIRS = []
-    print(f"Warning: Configuration file not found at {CONFIG_PATH}. Using empty allowed directories.")
-except json.JSONDecodeError:
-    ALLOWED_DIRS = []
-    print(f"Error: Failed to decode JSON from configuration file at {CONFIG_PATH}. Using empty allowed directories.")
-
-def is_path_allowed(path):
-    """Check if the given path is within allowed directories."""
-    path = os.path.abspath(os.path.normpath(path))
-    normalized_allowed_dirs = [os.path.abspath(os.path.normpath(dir_path)) for dir_path in ALLOWED_DIRS]
-    
-    for allowed_dir in normalized_allowed_dirs:
-        # Windows 대소문자 구분 없이 경로 비교
-        if path.lower().startswith(allowed_dir.lower() + os.sep) or path.lower() == allowed_dir.lower():
+# Shared worker pool for blocking filesystem calls (size via MCP_FS_WORKERS)
+IO_WORKERS = int(os.environ.get('MCP_FS_WORKERS', min(32, (os.cpu_count() or 1) * 4)))
+DEFAULT_TOOL_CONCURRENCY = IO_WORKERS
+# Heavy tools get fewer slots so they cannot starve quick reads
+TOOL_CONCURRENCY = {
+    'search_files': 2,
+    'grep_files': 2,
+    'rebuild_index': 1,
+    'changes_since': 1,
+    'copy_tree': 4,
+    'edit_file': 4,
+    'hash_files': 4,
+    'tree_digest': 2,
+    'disk_usage': 4,
+    'find_duplicates': 4,
+}
+_io_executor = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix='fs-io')
+_tool_semaphores = {}
+
+class OperationCancelled(Exception):
+    """Raised inside a worker thread once the client has cancelled the call."""
+
+def check_cancelled(cancel):
+    """Abort a long-running worker if its tool call was cancelled."""
+    if cancel is not None and cancel.is_set():
+        raise OperationCancelled("Operation cancelled")
+
+async def run_blocking(tool, func, *args, cancellable=False, **kwargs):
+    """Run a blocking call on the shared pool under the tool's concurrency limit.
+
+    With ``cancellable`` the function receives a ``cancel`` event that is set
+    when the awaiting tool call is cancelled, so long walks can stop at their
+    next checkpoint instead of running on in the background.
+    """
+    semaphore = _tool_semaphores.get(tool)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(TOOL_CONCURRENCY.get(tool, DEFAULT_TOOL_CONCURRENCY))
+        _tool_semaphores[tool] = semaphore
+    cancel = threading.Event()
+    if cancellable:
+        kwargs['cancel'] = cancel
+    async with semaphore:
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(_io_executor, functools.partial(func, *args, **kwargs))
+        except asyncio.CancelledError:
+            cancel.set()
+            raise
+
+def _path_parts(path):
+    """Split a path into case-folded components for allowed-dir matching."""
+    # Windows 대소문자 구분 없이 경로 비교
+    path = os.path.abspath(os.path.normpath(path)).lower()
+    return [part for part in path.split(os.sep) if part]
+
+def build_allowed_matcher(allowed_dirs):
+    """Compile allowed directories into a component trie.
+
+    Each allowed directory becomes a path of nested dicts keyed by its
+    case-folded components; the node for the directory itself is marked with
+    a ``None`` key. Normalization happens once here instead of on every check.
+    An allowed directory that is itself reached through a symlink is also
+    added under its real path, so resolved paths inside it still match.
+    """
+    trie = {}
+    for dir_path in allowed_dirs:
+        for variant in {dir_path, os.path.realpath(dir_path)}:
+            node = trie
+            for part in _path_parts(variant):
+                node = node.setdefault(part, {})
+            node[None] = True
+    return trie
+
+_matcher_cache = {'version': None, 'matcher': {}}
+
+def allowed_matcher():
+    """Return the compiled matcher, rebuilding it only when the config changed."""
+    allowed_dirs, version = load_allowed_dirs()
+    if version != _matcher_cache['version']:
+        _matcher_cache['matcher'] = build_allowed_matcher(allowed_dirs)
+        _matcher_cache['version'] = version
+    return _matcher_cache['matcher']
+
+def _matches_allowed(path, node):
+    """Walk the compiled trie for an already absolute, normalized path."""
+    if None in node:
+        return True
+    # Windows 대소문자 구분 없이 경로 비교
+    for part in path.lower().split(os.sep):
+        if not part:
+            continue
+        node = node.get(part)
+        if node is None:
+            return False
+        if None in node:
             return True
-    
     return False
 
+# Resolved real paths of recently checked directories
+REALPATH_CACHE_SIZE = 4096
+# Larger directories are not scanned for symlinks; their entries are lstat'ed instead
+REALPATH_SCAN_MAX_ENTRIES = 2048
+_realpath_cache = OrderedDict()
+_realpath_lock = threading.Lock()
+
+def _scan_symlinks(dir_path):
+    """Names of the symlinks in a directory, or None if it is too big to list."""
+    links = set()
+    try:
+        with os.scandir(dir_path) as it:
+            for count, entry in enumerate(it):
+                if count >= REALPATH_SCAN_MAX_ENTRIES:
+                    return None
+                if entry.is_symlink():
+                    links.add(entry.name)
+    except OSError:
+        return None
+    return frozenset(links)
+
+def _resolve_dir(dir_path):
+    """Return ``(real_path, symlink_names)`` for a directory, or None if it does not exist.
+
+    Answers are cached per directory and reused while its device, inode,
+    mtime and ctime are unchanged, so a cache hit costs one ``stat`` instead
+    of an ``lstat`` per path component. Swapping any component for a
+    symlink changes the inode that ``stat`` reaches, renaming the directory
+    changes its ctime, and adding or replacing an entry changes its mtime.
+    """
+    try:
+        stat_info = os.stat(dir_path)
+    except OSError:
+        return None
+    stamp = (stat_info.st_dev, stat_info.st_ino, stat_info.st_mtime_ns, stat_info.st_ctime_ns)
+    with _realpath_lock:
+        cached = _realpath_cache.get(dir_path)
+        if cached is not None and cached[0] == stamp:
+            _realpath_cache.move_to_end(dir_path)
+            return cached[1]
+    resolved = (os.path.realpath(dir_path), _scan_symlinks(dir_path))
+    with _realpath_lock:
+        _realpath_cache[dir_path] = (stamp, resolved)
+        if len(_realpath_cache) > REALPATH_CACHE_SIZE:
+            _realpath_cache.popitem(last=False)
+    return resolved
+
+def resolve_path(path):
+    """Resolve symlinks in ``path`` using the directory cache for its parent."""
+    return _resolve_abs(os.path.abspath(path))
+
+def _resolve_abs(path, resolved_dirs=None):
+    parent, _, name = path.rpartition(os.sep)
+    if not parent or parent.endswith(':'):
+        # Children of a filesystem or drive root keep the separator on the parent
+        parent, name = os.path.split(path)
+    if resolved_dirs is None:
+        resolved = _resolve_dir(parent)
+    elif parent in resolved_dirs:
+        resolved = resolved_dirs[parent]
+    else:
+        resolved = resolved_dirs[parent] = _resolve_dir(parent)
+    if resolved is None:
+        # Not created yet (e.g. a write target); resolve whatever prefix exists
+        return os.path.realpath(path)
+    real_parent, links = resolved
+    if not name:
+        return real_parent
+    real = path if real_parent == parent else os.path.join(real_parent, name)
+    is_link = os.path.islink(real) if links is None else name in links
+    return os.path.realpath(real) if is_link else real
+
+_PARENT_DIR_RE = re.compile(r'(^|[\\/])\.\.([\\/]|$)')
+
+def is_path_allowed(path, matcher=None, resolved_dirs=None):
+    """Check if the given path is within allowed directories.
+
+    The path must be inside an allowed directory both as written and after
+    resolving symlinks, so a link inside an allowed directory cannot point
+    the server outside it. The lexical check walks the compiled trie one
+    component at a time; loops checking many paths should fetch
+    ``allowed_matcher()`` once and pass it in, so the config file is only
+    stat'ed once per call. Batches can also pass a ``resolved_dirs`` dict
+    so paths sharing a parent directory resolve it only once per batch.
+
+    The check can stat, resolve and scan directories, so tools run it on
+    their worker pool (``run_blocking``), never on the event loop.
+
+    A path with ``..`` components is resolved by ``realpath`` as written:
+    the OS follows ``link/..`` to the link target's parent, while
+    ``abspath`` would collapse it lexically and hide where it really goes.
+    """
+    node = allowed_matcher() if matcher is None else matcher
+    if '..' in path and _PARENT_DIR_RE.search(path):
+        real = os.path.realpath(path if os.path.isabs(path) else os.path.join(os.getcwd(), path))
+        return _matches_allowed(os.path.abspath(path), node) and _matches_allowed(real, node)
+    path = os.path.abspath(path)
+    if not _matches_allowed(path, node):
+        return False
+    real = _resolve_abs(path, resolved_dirs)
+    return real == path or _matches_allowed(real, node)
+
+def is_entry_allowed(entry, matcher):
+    """Check a DirEntry found by walking from an already-checked directory.
+
+    The walk does not follow directory symlinks, so only entries that are
+    symlinks themselves need resolving; the rest take the lexical check.
+    """
+    if entry.is_symlink():
+        return is_path_allowed(entry.path, matcher)
+    return _matches_allowed(os.path.abspath(entry.path), matcher)
+
+# Response budgets shared by tools whose output can grow without bound. Each
+# call may ask for its own budget, but never more than the server maximum.
+RESPONSE_BUDGET_BYTES = int(os.environ.get('MCP_FS_RESPONSE_BYTES', 1024 * 1024))
+RESPONSE_BUDGET_ENTRIES = int(os.environ.get('MCP_FS_RESPONSE_ENTRIES', 1000))
+RESPONSE_MAX_BYTES = int(os.environ.get('MCP_FS_MAX_RESPONSE_BYTES', 32 * 1024 * 1024))
+RESPONSE_MAX_ENTRIES = int(os.environ.get('MCP_FS_MAX_RESPONSE_ENTRIES', 100000))
+
+def response_budget(max_bytes=None, max_entries=None):
+    """Resolve a call's ``(max_bytes, max_entries)``, clamped to the server maximum."""
+    max_bytes = RESPONSE_BUDGET_BYTES if max_bytes is None else max_bytes
+    max_entries = RESPONSE_BUDGET_ENTRIES if max_entries is None else max_entries
+    return (min(max(max_bytes, 0), RESPONSE_MAX_BYTES),
+            min(max(max_entries, 0), RESPONSE_MAX_ENTRIES))
+
+def decode_continuation(token):
+    """Turn a continuation token from a previous response back into an offset."""
+    if not token:
+        return 0
+    try:
+        return max(int(token), 0)
+    except ValueError:
+        raise ValueError(f"Invalid continuation token: {token!r}")
+
+def take_within_budget(items, max_bytes, max_entries):
+    """Count how many leading ``items`` fit the budget once JSON-encoded.
+
+    At least one item is always taken (if the entry budget allows any), so
+    paging makes progress even past an oversized entry.
+    """
+    used = 0
+    for count, item in enumerate(items):
+        if count >= max_entries:
+            return count
+        used += len(json.dumps(item)) + 2
+        if used > max_bytes and count:
+            return count
+    return len(items)
+
+def budget_info(total, next_offset):
+    """Truncation metadata added to budgeted responses.
+
+    ``total`` is exact when the tool saw everything, otherwise a lower bound.
+    """
+    return {
+        "truncated": next_offset is not None,
+        "total_estimate": total,
+        "continuation": None if next_offset is None else str(next_offset)
+    }
+
+# Sparse line-offset index: one checkpoint every LINE_INDEX_STRIDE lines
+LINE_INDEX_STRIDE = 1024
+LINE_INDEX_CACHE_SIZE = 32
+LINE_INDEX_CHUNK = 4 * 1024 * 1024
+LINE_INDEX_BLOCK = 4 * 1024
+_line_index_cache = OrderedDict()
+_line_index_lock = threading.Lock()
+
+def _build_line_index(mm, size):
+    """Scan a mapped file once and record the offset of every STRIDE-th line."""
+    checkpoints = array('q', [0])
+    newlines = 0
+    next_checkpoint = LINE_INDEX_STRIDE
+    for chunk_start in range(0, size, LINE_INDEX_CHUNK):
+        chunk = mm[chunk_start:chunk_start + LINE_INDEX_CHUNK]
+        # Count newlines per small block in C; only walk the block holding a checkpoint
+        for block_start in range(0, len(chunk), LINE_INDEX_BLOCK):
+            block_end = block_start + LINE_INDEX_BLOCK
+            count = chunk.count(b'\n', block_start, block_end)
+            pos = block_start
+            while newlines + count >= next_checkpoint:
+                for _ in range(next_checkpoint - newlines):
+                    pos = chunk.index(b'\n', pos, block_end) + 1
+                count -= next_checkpoint - newlines
+                newlines = next_checkpoint
+                checkpoints.append(chunk_start + pos)
+                next_checkpoint += LINE_INDEX_STRIDE
+            newlines += count
+    total_lines = newlines
+    if size and mm[size - 1:size] != b'\n':
+        total_lines += 1
+    return checkpoints, total_lines
+
+def _cached_line_index(path, stat_info):
+    """Return the line index for a file if one is cached for its current size and mtime."""
+    key = os.path.abspath(path)
+    stamp = (stat_info.st_size, stat_info.st_mtime_ns)
+    with _line_index_lock:
+        cached = _line_index_cache.get(key)
+        if cached is None or cached[0] != stamp:
+            return None
+        _line_index_cache.move_to_end(key)
+        return cached[1]
+
+def _get_line_index(path, mm, stat_info):
+    """Return the cached line index for a file, rebuilding it if the file changed."""
+    index = _cached_line_index(path, stat_info)
+    if index is not None:
+        return index
+    index = _build_line_index(mm, stat_info.st_size)
+    with _line_index_lock:
+        _line_index_cache[os.path.abspath(path)] = ((stat_info.st_size, stat_info.st_mtime_ns), index)
+        if len(_line_index_cache) > LINE_INDEX_CACHE_SIZE:
+            _line_index_cache.popitem(last=False)
+    return index
+
+def _tail_offset(mm, size, count):
+    """Scan back from EOF for the last ``count`` lines; returns ``(offset, lines_found)``.
+
+    Only the bytes being returned are touched, so tailing a log that keeps
+    growing does not rescan it on every call the way the line index would.
+    """
+    if count <= 0:
+        return size, 0
+    pos = size - 1 if mm[size - 1:size] == b'\n' else size
+    for found_lines in range(count):
+        found = mm.rfind(b'\n', 0, pos)
+        if found < 0:
+            return 0, found_lines + 1
+        pos = found
+    return pos + 1, count
+
+def _line_offset(mm, size, checkpoints, line):
+    """Byte offset where the given 0-based line starts (or size past EOF)."""
+    block = min(line // LINE_INDEX_STRIDE, len(checkpoints) - 1)
+    pos = checkpoints[block]
+    for _ in range(line - block * LINE_INDEX_STRIDE):
+        found = mm.find(b'\n', pos)
+        if found < 0:
+            return size
+        pos = found + 1
+    return pos
+
+# Encoding detection for read_file
+SNIFF_BYTES = 8192
+BINARY_CHUNK_BYTES = 256 * 1024
+# Tried in order on text without a BOM; cp949 covers legacy Korean files
+TEXT_ENCODINGS = ('utf-8', 'cp949')
+BOMS = (
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+# Control bytes that do not show up in ordinary text (\t \n \f \r and ESC are allowed)
+_CONTROL_BYTES = bytes(set(range(32)) - {8, 9, 10, 12, 13, 27})
+
+def sniff_encoding(sample):
+    """Guess a file's encoding from its first few KB; returns 'binary' for non-text."""
+    for bom, encoding in BOMS:
+        if sample.startswith(bom):
+            return encoding
+    if b'\0' in sample or len(sample.translate(None, _CONTROL_BYTES)) < len(sample) * 0.9:
+        return 'binary'
+    for encoding in TEXT_ENCODINGS:
+        try:
+            # Not final: the sample may end in the middle of a character
+            codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return 'binary'
+
+def sniff_file(path):
+    """Sniff a file's encoding from its first SNIFF_BYTES bytes."""
+    with open(path, 'rb') as f:
+        return sniff_encoding(f.read(SNIFF_BYTES))
+
+def resolve_encoding(encoding):
+    """Validate a caller-supplied encoding; 'base64' forces a binary read."""
+    if encoding in (None, 'base64', 'binary'):
+        return 'binary' if encoding else None
+    return codecs.lookup(encoding).name
+
+def decode_text(data, encoding):
+    """Decode file bytes, falling back through TEXT_ENCODINGS if the sniff was wrong.
+
+    The sniff only sees the start of the file, so a later invalid byte moves
+    on to the next candidate; as a last resort bad bytes are replaced.
+    """
+    candidates = [encoding] + [e for e in TEXT_ENCODINGS if e != encoding]
+    for candidate in candidates:
+        try:
+            return data.decode(candidate), candidate
+        except UnicodeDecodeError:
+            continue
+    return data.decode(encoding, errors='replace'), encoding
+
+def _binary_chunk(path, data, offset, size):
+    """Describe a base64 chunk of a binary file starting at ``offset``."""
+    end = offset + len(data)
+    return {'path': path, 'encoding': 'base64', 'content': base64.b64encode(data).decode('ascii'),
+            'offset': offset, 'length': len(data), 'total_size': size,
+            'next_offset': end if end < size else None}
+
+def read_file_range(path, offset=None, length=None, start_line=None, end_line=None, tail=None,
+                    encoding=None):
+    """Read part of a file without loading the rest of it.
+
+    Exactly one mode is used: a byte range (``offset``/``length``), an
+    inclusive 1-based line range (``start_line``/``end_line``) or the last
+    ``tail`` lines. Returns a dict with the decoded content and paging info.
+    Byte-range and tail reads only touch the bytes they return, so their
+    ``total_lines`` (and a tail's ``start_line``) are null unless the file's
+    line index is already cached. A line range starting past the end of the
+    file raises ValueError.
+    Binary files only support byte ranges and come back base64-encoded.
+    """
+    stat_info = os.stat(path)
+    size = stat_info.st_size
+    with open(path, 'rb') as f:
+        if size == 0:
+            return {'path': path, 'content': '', 'offset': 0, 'length': 0,
+                    'total_size': 0, 'total_lines': 0}
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if encoding is None:
+                encoding = sniff_encoding(mm[:SNIFF_BYTES])
+            line_mode = tail is not None or start_line is not None or end_line is not None
+            if encoding == 'binary':
+                if line_mode:
+                    raise ValueError("Line ranges are not supported for binary files; use offset/length")
+                start = min(max(offset or 0, 0), size)
+                stop = min(start + max(BINARY_CHUNK_BYTES if length is None else length, 0), size)
+                return _binary_chunk(path, mm[start:stop], start, size)
+            if line_mode and codecs.lookup(encoding).name.startswith(('utf-16', 'utf-32')):
+                raise ValueError(f"Line ranges are not supported for {encoding} files; use offset/length")
+                
+            if tail is not None:
+                start, found_lines = _tail_offset(mm, size, tail)
+                stop = size
+                if start == 0:
+                    total_lines = found_lines
+                else:
+                    index = _cached_line_index(path, stat_info)
+                    total_lines = None if index is None else index[1]
+                result = {'path': path, 'encoding': encoding, 'total_size': size, 'total_lines': total_lines}
+                result['start_line'] = None if total_lines is None else total_lines - found_lines + 1
+                result['end_line'] = total_lines
+            elif start_line is not None or end_line is not None:
+                checkpoints, total_lines = _get_line_index(path, mm, stat_info)
+                result = {'path': path, 'encoding': encoding, 'total_size': size, 'total_lines': total_lines}
+                first_line = max((start_line or 1) - 1, 0)
+                if first_line >= total_lines:
+                    raise ValueError(f"start_line {first_line + 1} is past the end of the file "
+                                     f"({total_lines} lines)")
+                if end_line is not None and end_line <= first_line:
+                    raise ValueError(f"end_line {end_line} is before start_line {first_line + 1}")
+                last_line = min(end_line if end_line is not None else total_lines, total_lines)
+                start = _line_offset(mm, size, checkpoints, first_line)
+                stop = _line_offset(mm, size, checkpoints, last_line) if last_line > first_line else start
+                result['start_line'] = first_line + 1
+                result['end_line'] = last_line
+            else:
+                # A byte range must not cost a scan of the whole file just to count its lines
+                index = _cached_line_index(path, stat_info)
+                result = {'path': path, 'encoding': encoding, 'total_size': size,
+                          'total_lines': None if index is None else index[1]}
+                start = min(max(offset or 0, 0), size)
+                stop = size if length is None else min(start + max(length, 0), size)
+
+            result['content'] = mm[start:stop].decode(encoding, errors='replace')
+            result['offset'] = start
+            result['length'] = stop - start
+            result['next_offset'] = stop if stop < size else None
+            return result
+
+# In-process LRU cache of whole-file contents (cap via MCP_FS_CACHE_BYTES)
+CONTENT_CACHE_MAX_BYTES = int(os.environ.get('MCP_FS_CACHE_BYTES', 64 * 1024 * 1024))
+# Files bigger than this are always read from disk so one file cannot flush the cache
+CONTENT_CACHE_MAX_FILE_BYTES = CONTENT_CACHE_MAX_BYTES // 4
+_content_cache = OrderedDict()
+_content_cache_lock = threading.Lock()
+_content_cache_stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0, 'bytes': 0}
+
+def read_cached_bytes(path, stat_info=None):
+    """Return a file's bytes, serving repeated reads from the content cache.
+
+    Entries are keyed by absolute path and only used while the file's size
+    and mtime_ns still match, so files changed outside the server are re-read.
+    """
+    key = os.path.abspath(path)
+    if stat_info is None:
+        stat_info = os.stat(path)
+    stamp = (stat_info.st_size, stat_info.st_mtime_ns)
+    with _content_cache_lock:
+        cached = _content_cache.get(key)
+        if cached is not None and cached[0] == stamp:
+            _content_cache.move_to_end(key)
+            _content_cache_stats['hits'] += 1
+            return cached[1]
+        _content_cache_stats['misses'] += 1
+        
+    with open(path, 'rb') as f:
+        data = f.read()
+    # A size mismatch means the file changed while it was read, so don't keep it
+    if len(data) != stat_info.st_size or len(data) > CONTENT_CACHE_MAX_FILE_BYTES:
+        return data
+        
+    with _content_cache_lock:
+        previous = _content_cache.pop(key, None)
+        if previous is not None:
+            _content_cache_stats['bytes'] -= len(previous[1])
+        _content_cache[key] = (stamp, data)
+        _content_cache_stats['bytes'] += len(data)
+        while _content_cache_stats['bytes'] > CONTENT_CACHE_MAX_BYTES:
+            _, (_, evicted) = _content_cache.popitem(last=False)
+            _content_cache_stats['bytes'] -= len(evicted)
+            _content_cache_stats['evictions'] += 1
+    return data
+
+def invalidate_cached(path):
+    """Drop cached contents for ``path`` and, if it is a directory, everything below it."""
+    key = os.path.abspath(path)
+    prefix = key.rstrip(os.sep) + os.sep
+    with _content_cache_lock:
+        for cached_key in [k for k in _content_cache if k == key or k.startswith(prefix)]:
+            _, data = _content_cache.pop(cached_key)
+            _content_cache_stats['bytes'] -= len(data)
+            _content_cache_stats['invalidations'] += 1
+
+def _universal_newlines(text):
+    """Translate \\r\\n and \\r to \\n, as text-mode open() does."""
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text
+
+def _read_text(path):
+    """Read a whole file as UTF-8 text with universal newlines, like text-mode open()."""
+    return _universal_newlines(read_cached_bytes(path).decode('utf-8'))
+
+def _read_whole(path, encoding=None):
+    """Blocking part of a full read_file.
+
+    Text files are decoded with the sniffed (or given) encoding and returned
+    as plain text; binary files return the first base64 chunk as JSON.
+    """
+    if encoding is None:
+        encoding = sniff_file(path)
+    if encoding == 'binary':
+        with open(path, 'rb') as f:
+            data = f.read(BINARY_CHUNK_BYTES)
+            return json.dumps(_binary_chunk(path, data, 0, os.fstat(f.fileno()).st_size))
+    text, _ = decode_text(read_cached_bytes(path), encoding)
+    return _universal_newlines(text)
+
 @mcp.tool()
-async def read_file(path: str) -> str:
-    """Read complete contents of a file.
+async def read_file(path: str, offset: Optional[int] = None, length: Optional[int] = None,
+                    start_line: Optional[int] = None, end_line: Optional[int] = None,
+                    tail: Optional[int] = None, encoding: Optional[str] = None) -> str:
+    """Read complete contents of a file, or a byte/line range of it.
+    
+    Without range arguments the whole file is returned as text. With any of
+    them a JSON object is returned with the content plus total_size and
+    total_lines so large files can be paged through. Byte-range and tail
+    reads do not scan the whole file, so total_lines may be null for them.
+    
+    The encoding is detected from the first few KB (BOM, UTF-8, then cp949).
+    Binary files are returned as JSON with base64 content, one chunk at a
+    time; pass next_offset back as offset to continue.
     
     Args:
         path: Path to the file to read
+        offset: Byte offset to start reading from
+        length: Maximum number of bytes to read from offset
+        start_line: First line to read (1-based, inclusive)
+        end_line: Last line to read (1-based, inclusive)
+        tail: Read only the last N lines
+        encoding: Text encoding to use instead of detecting it, or "base64" to read raw bytes
     """
     try:
-        if not is_path_allowed(path):
+        if not await run_blocking('read_file', is_path_allowed, path):
             return f"Error: Access to path '{path}' is not allowed."
             
-        with open(path, 'r', encoding='utf-8') as f:
-            return f.read()
+        encoding = resolve_encoding(encoding)
+        modes = [offset is not None or length is not None,
+                 start_line is not None or end_line is not None,
+                 tail is not None]
+        if sum(modes) > 1:
+            return "Error: Use only one of offset/length, start_line/end_line or tail."
+        if any(modes):
+            return json.dumps(await run_blocking('read_file', read_file_range, path, offset, length,
+                                                 start_line, end_line, tail, encoding))
+            
+        return await run_blocking('read_file', _read_whole, path, encoding)
     except Exception as e:
         return f"Error reading file: {str(e)}"
 
+# Limits for batched file reads
+READ_MULTIPLE_TOTAL_BUDGET = 20 * 1024 * 1024
+READ_MULTIPLE_FILE_CAP = 5 * 1024 * 1024
+
+def _read_prefix(path, limit, stat_info=None):
+    """Read at most ``limit`` bytes of a file as UTF-8 text.
+
+    Returns the text and whether the file had more data than was read. The
+    encoding is sniffed like read_file does, and a multibyte character cut
+    by the limit is dropped rather than garbled.
+    Files small enough for the content cache are served from it.
+    """
+    if stat_info is not None and stat_info.st_size <= CONTENT_CACHE_MAX_FILE_BYTES:
+        data = read_cached_bytes(path, stat_info)
+        data = data if len(data) <= limit else data[:limit + 1]
+    else:
+        with open(path, 'rb') as f:
+            data = f.read(limit + 1)
+    truncated = len(data) > limit
+    if truncated:
+        data = data[:limit]
+    encoding = sniff_encoding(data[:SNIFF_BYTES])
+    if encoding == 'binary':
+        raise ValueError("binary file; use read_file to read it as base64")
+    decoder = codecs.getincrementaldecoder(encoding)()
+    return decoder.decode(data, final=not truncated), truncated
+
+def _stat_allowed(paths):
+    """Check and stat a batch of paths in one worker call.
+
+    Returns one entry per path: its stat result, the OSError it raised, or
+    None if the path is not allowed.
+    """
+    matcher = allowed_matcher()
+    resolved_dirs = {}
+    stats = []
+    for path in paths:
+        if not is_path_allowed(path, matcher, resolved_dirs):
+            stats.append(None)
+            continue
+        try:
+            stats.append(os.stat(path))
+        except OSError as e:
+            stats.append(e)
+    return stats
+
 @mcp.tool()
-async def read_multiple_files(paths: List[str]) -> Dict[str, str]:
+async def read_multiple_files(paths: List[str], max_total_bytes: Optional[int] = None,
+                              max_file_bytes: Optional[int] = None, max_entries: Optional[int] = None,
+                              continuation: Optional[str] = None) -> Dict[str, Any]:
     """Read multiple files simultaneously.
     
+    Returns a map of path to content (or error message). When the files do
+    not fit the budget, or a budget or continuation is passed, the result is
+    an object with the map under "files". Files are read in parallel. Each file is capped at max_file_bytes and the
+    whole call at max_total_bytes (up to the server maximum); the budget is
+    handed out in input order, so files past the budget are listed under
+    "skipped" and files cut short under "truncated". When files were left
+    out, pass the same paths again with "continuation" to read the rest;
+    "total_estimate" is the combined size of the files considered.
+    
     Args:
         paths: List of file paths to read
+        max_total_bytes: Total byte budget for this call
+        max_file_bytes: Maximum bytes to read from a single file
+        max_entries: Maximum number of files to read in this call
+        continuation: Token from a previous call to resume after the files it returned
     """
+    total_budget = READ_MULTIPLE_TOTAL_BUDGET if max_total_bytes is None else max(max_total_bytes, 0)
+    total_budget = min(total_budget, RESPONSE_MAX_BYTES)
+    file_cap = READ_MULTIPLE_FILE_CAP if max_file_bytes is None else max(max_file_bytes, 0)
+    _, max_files = response_budget(None, max_entries)
+    start = decode_continuation(continuation)
+    window = paths[start:start + max_files]
+    
     results = {}
-    for path in paths:
-        try:
-            if not is_path_allowed(path):
-                results[path] = f"Error: Access to path '{path}' is not allowed."
-                continue
-                
-            with open(path, 'r', encoding='utf-8') as f:
-                results[path] = f.read()
-        except Exception as e:
-            results[path] = f"Error reading file: {str(e)}"
-    return results
+    truncated = []
+    skipped = []
+    
+    # Check and stat everything first so the budget can be split in input order
+    stats = await run_blocking('read_multiple_files', _stat_allowed, window)
+    
+    remaining = total_budget
+    total_size = 0
+    reads = []
+    for path, stat_info in zip(window, stats):
+        if stat_info is None:
+            results[path] = f"Error: Access to path '{path}' is not allowed."
+            continue
+        if isinstance(stat_info, Exception):
+            results[path] = f"Error reading file: {str(stat_info)}"
+            continue
+        total_size += stat_info.st_size
+        if remaining <= 0 and stat_info.st_size > 0:
+            skipped.append(path)
+        else:
+            limit = min(stat_info.st_size, file_cap, remaining)
+            remaining -= limit
+            reads.append((path, limit, stat_info))
+    
+    contents = await asyncio.gather(
+        *(run_blocking('read_multiple_files', _read_prefix, path, limit, stat_info)
+          for path, limit, stat_info in reads),
+        return_exceptions=True)
+    
+    for (path, _, _), content in zip(reads, contents):
+        if isinstance(content, Exception):
+            results[path] = f"Error reading file: {str(content)}"
+        else:
+            results[path], was_truncated = content
+            if was_truncated:
+                truncated.append(path)
+    
+    # Resume from the first file that was skipped, or after this window
+    next_offset = start + len(window) if start + len(window) < len(paths) else None
+    if skipped:
+        next_offset = start + window.index(skipped[0])
+    files = {path: results[path] for path in window if path in results}
+    if (next_offset is None and not truncated and max_total_bytes is None and max_file_bytes is None
+            and max_entries is None and not continuation):
+        return files
+    return {
+        'files': files,
+        'truncated': truncated,
+        'skipped': skipped,
+        'bytes_read': total_budget - remaining,
+        'total_estimate': total_size,
+        'continuation': None if next_offset is None else str(next_offset)
+    }
+
+def _write_text(path, dir_path, content):
+    """Create the parent directory if needed and write ``content`` as UTF-8."""
+    os.makedirs(dir_path, exist_ok=True)
+    try:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+    finally:
+        invalidate_cached(path)
 
 @mcp.tool()
 async def write_file(path: str, content: str) -> str:
@@ -80,78 +777,485 @@ async def write_file(path: str, content: str) -> str:
         content: File content
     """
     try:
-        if not is_path_allowed(path):
+        if not await run_blocking('write_file', is_path_allowed, path):
             return f"Error: Access to path '{path}' is not allowed."
             
         # Check if the directory is also in allowed paths
         dir_path = os.path.dirname(os.path.abspath(path))
-        if not is_path_allowed(dir_path):
+        if not await run_blocking('write_file', is_path_allowed, dir_path):
             return f"Error: Access to directory '{dir_path}' is not allowed."
             
-        os.makedirs(dir_path, exist_ok=True)
-        with open(path, 'w', encoding='utf-8') as f:
-            f.write(content)
+        await run_blocking('write_file', _write_text, path, dir_path, content)
         return f"Successfully wrote to {path}"
     except Exception as e:
         return f"Error writing to file: {str(e)}"
 
-@mcp.tool()
-async def edit_file(path: str, edits: List[Dict[str, Any]], dry_run: bool = False) -> str:
-    """Make selective edits using pattern matching.
-    
-    Args:
-        path: File to edit
-        edits: List of edit operations with oldText and newText
-        dry_run: Preview changes without applying
+DIFF_CONTEXT_LINES = 3
+
+def _anchor_texts(edits):
+    """Return each literal edit's oldText, rejecting empty and duplicate anchors."""
+    olds = [edit.get('oldText', '') for edit in edits]
+    if any(not old for old in olds):
+        raise ValueError("oldText must not be empty")
+    if len(set(olds)) != len(olds):
+        raise ValueError("The same oldText is used by more than one edit")
+    return olds
+
+def _claim_anchors(content, olds, edits):
+    """Find each anchor's positions in ``content``.
+
+    Returns ``(positions, seen)``: the claimed start positions per edit, and
+    whether the anchor occurs at all, claimed or not.
     """
-    try:
-        if not is_path_allowed(path):
-            return f"Error: Access to path '{path}' is not allowed."
+    # str.find per anchor is far cheaper than one regex alternation, which
+    # tries every anchor at every position. Overlapping occurrences count
+    # towards an anchor's ambiguity, but replaceAll replaces them left to
+    # right without overlap, like str.replace. Where anchors start at the
+    # same position the longest one claims it, so an anchor that is a
+    # prefix of another cannot shadow it.
+    claimed = {}
+    seen = [False] * len(olds)
+    for i, old in enumerate(olds):
+        step = len(old) if edits[i].get('replaceAll', False) else 1
+        pos = content.find(old)
+        seen[i] = pos >= 0
+        while pos >= 0:
+            if pos not in claimed or len(olds[claimed[pos]]) < len(old):
+                claimed[pos] = i
+            pos = content.find(old, pos + step)
+    positions = [[] for _ in olds]
+    for pos in sorted(claimed):
+        positions[claimed[pos]].append(pos)
+    return positions, seen
+
+def _anchor_spans(positions, olds, edits):
+    """Turn claimed positions into sorted ``(start, end, newText)`` spans.
+
+    Raises ValueError if two edits' anchors overlap.
+    """
+    spans = []
+    for i, found in enumerate(positions):
+        new_text = edits[i].get('newText', '')
+        spans.extend((start, start + len(olds[i]), new_text) for start in found)
+    spans.sort()
+    for (_, prev_end, _), (start, _, _) in zip(spans, spans[1:]):
+        if start < prev_end:
+            raise ValueError("Edits overlap; combine them into one edit")
+    return spans
+
+def _check_anchor_counts(edits, counts, seen):
+    """Reject anchors shadowed by another edit's, or found more than once without replaceAll."""
+    for i, edit in enumerate(edits):
+        if 'pattern' in edit:
+            continue
+        if not counts[i] and seen[i]:
+            raise ValueError(f"Edit {i + 1}: oldText overlaps another edit's oldText")
+        if counts[i] > 1 and not edit.get('replaceAll', False):
+            raise ValueError(f"Edit {i + 1}: oldText matches {counts[i]} locations; "
+                             "add more context or set replaceAll")
+
+def plan_edits(content, edits):
+    """Locate every edit anchor in ``content``.
+
+    Each edit's ``oldText`` must occur exactly once unless the edit sets
+    ``replaceAll``. Returns ``(spans, changes)`` where spans is a sorted list
+    of ``(start, end, newText)``. Raises ValueError for empty, duplicate,
+    ambiguous or overlapping anchors.
+    """
+    olds = _anchor_texts(edits)
+    positions, seen = _claim_anchors(content, olds, edits)
+    _check_anchor_counts(edits, [len(found) for found in positions], seen)
+        
+    # Line numbers of first occurrences, counted in one sweep
+    lines = {}
+    line, prev = 1, 0
+    for pos, i in sorted((found[0], i) for i, found in enumerate(positions) if found):
+        line += content.count('\n', prev, pos)
+        prev = pos
+        lines[i] = line
+        
+    changes = [{
+        'oldText': olds[i],
+        'newText': edit.get('newText', ''),
+        'found': bool(positions[i]),
+        'occurrences': len(positions[i]),
+        'line': lines.get(i)
+    } for i, edit in enumerate(edits)]
+    return _anchor_spans(positions, olds, edits), changes
+
+def apply_edits(content, spans):
+    """Build the edited text from sorted, non-overlapping spans in one pass."""
+    parts = []
+    pos = 0
+    for start, end, new_text in spans:
+        parts.append(content[pos:start])
+        parts.append(new_text)
+        pos = end
+    parts.append(content[pos:])
+    return ''.join(parts)
+
+def _diff_lines(prefix, lines):
+    """Prefix diff lines, marking a final line that lacks a newline."""
+    return [prefix + line if line.endswith('\n') else prefix + line + '\n\\ No newline at end of file\n'
+            for line in lines]
+
+def unified_diff(path, content, spans, context=DIFF_CONTEXT_LINES):
+    """Render a unified diff for ``spans`` without diffing the whole file.
+
+    Only the lines touched by an edit, plus ``context`` lines around them,
+    are visited, so the cost follows the size of the change.
+    """
+    if not spans:
+        return ''
+    line_starts = [0] + [m.end() for m in re.finditer('\n', content)]
+    if line_starts[-1] == len(content) and len(line_starts) > 1:
+        line_starts.pop()
+    line_count = len(line_starts)
+    
+    def line_text(index):
+        end = line_starts[index + 1] if index + 1 < line_count else len(content)
+        return content[line_starts[index]:end]
+    
+    # Group edits that touch the same or adjacent lines: [first, last_excl, spans]
+    groups = []
+    for span in spans:
+        first = bisect.bisect_right(line_starts, span[0]) - 1
+        last = bisect.bisect_right(line_starts, span[1] - 1)
+        if groups and first < groups[-1][1]:
+            groups[-1][1] = max(groups[-1][1], last)
+            groups[-1][2].append(span)
+        else:
+            groups.append([first, last, [span]])
             
-        if not os.path.exists(path):
-            return f"Error: File {path} does not exist"
+    out = [f'--- {path}\n', f'+++ {path}\n']
+    delta = 0
+    i = 0
+    while i < len(groups):
+        # Merge groups whose context windows touch into one hunk
+        j = i
+        while j + 1 < len(groups) and groups[j + 1][0] - groups[j][1] <= 2 * context:
+            j += 1
+        hunk_start = max(groups[i][0] - context, 0)
+        hunk_end = min(groups[j][1] + context, line_count)
+        body = []
+        old_len = hunk_end - hunk_start
+        new_len = old_len
+        cursor = hunk_start
+        for first, last, group_spans in groups[i:j + 1]:
+            body.extend(_diff_lines(' ', [line_text(k) for k in range(cursor, first)]))
+            seg_start = line_starts[first] if first < line_count else len(content)
+            seg_end = line_starts[last] if last < line_count else len(content)
+            segment = content[seg_start:seg_end]
+            shifted = [(s - seg_start, e - seg_start, t) for s, e, t in group_spans]
+            old_lines = segment.splitlines(keepends=True)
+            new_lines = apply_edits(segment, shifted).splitlines(keepends=True)
+            body.extend(_diff_lines('-', old_lines))
+            body.extend(_diff_lines('+', new_lines))
+            new_len += len(new_lines) - len(old_lines)
+            cursor = last
+        body.extend(_diff_lines(' ', [line_text(k) for k in range(cursor, hunk_end)]))
+        old_from = hunk_start + 1 if old_len else hunk_start
+        new_from = hunk_start + delta + 1 if new_len else hunk_start + delta
+        out.append(f'@@ -{old_from},{old_len} +{new_from},{new_len} @@\n')
+        out.extend(body)
+        delta += new_len - old_len
+        i = j + 1
+    return ''.join(out)
+
+# Files larger than this are edited line by line through a temp file
+STREAM_EDIT_THRESHOLD = 16 * 1024 * 1024
+
+class StreamingDiff:
+    """Build a unified diff incrementally from per-line replacements.
+
+    Lines are fed in file order; only the last few unchanged lines are kept
+    for context, so memory stays bounded by the diff output itself. Output
+    is paged by whole hunks: hunks before byte ``skip`` of the full diff are
+    dropped, and ``resume`` is where the next page starts once ``max_bytes``
+    is used up.
+    """
+    
+    def __init__(self, path, context=DIFF_CONTEXT_LINES, max_bytes=RESPONSE_BUDGET_BYTES, skip=0):
+        self.context = context
+        self.max_bytes = max_bytes
+        self.skip = skip
+        self.size = 0
+        self.truncated = False
+        self.resume = None
+        self.out = [f'--- {path}\n', f'+++ {path}\n']
+        self.total = len(self.out[0]) + len(self.out[1])
+        self.before = deque(maxlen=context)
+        self.hunk = None
+        self.old_line = 0
+        self.new_line = 0
+        
+    def _close_hunk(self):
+        hunk = self.hunk
+        self.hunk = None
+        keep = len(hunk['body']) - max(hunk['trailing'] - self.context, 0)
+        tail = hunk['body'][keep:]
+        body = hunk['body'][:keep]
+        old_len = hunk['old_len'] - len(tail)
+        new_len = hunk['new_len'] - len(tail)
+        new_start = hunk['new_start'] if new_len else hunk['new_start'] - 1
+        text = (f"@@ -{hunk['old_start']},{old_len} +{new_start},{new_len} @@\n"
+                + ''.join(body))
+        position = self.total
+        self.total += len(text)
+        if position < self.skip:
+            pass
+        elif self.truncated or (self.size + len(text) > self.max_bytes and self.size):
+            if not self.truncated:
+                self.truncated = True
+                self.resume = position
+        else:
+            self.out.append(text)
+            self.size += len(text)
+        for line in tail[-self.context:] if self.context else []:
+            self.before.append(line[1:])
             
-        with open(path, 'r', encoding='utf-8') as f:
-            content = f.read()
+    def unchanged(self, line):
+        self.old_line += 1
+        self.new_line += 1
+        if self.hunk is None:
+            self.before.append(line)
+            return
+        self.hunk['body'].extend(_diff_lines(' ', [line]))
+        self.hunk['old_len'] += 1
+        self.hunk['new_len'] += 1
+        self.hunk['trailing'] += 1
+        if self.hunk['trailing'] > 2 * self.context:
+            self._close_hunk()
             
-        new_content = content
-        changes = []
+    def changed(self, old, new_lines):
+        if self.hunk is None:
+            context = list(self.before)
+            self.before.clear()
+            self.hunk = {
+                'old_start': self.old_line - len(context) + 1,
+                'new_start': self.new_line - len(context) + 1,
+                'old_len': len(context),
+                'new_len': len(context),
+                'trailing': 0,
+                'body': _diff_lines(' ', context)
+            }
+        self.hunk['body'].extend(_diff_lines('-', [old]))
+        self.hunk['body'].extend(_diff_lines('+', new_lines))
+        self.hunk['old_len'] += 1
+        self.hunk['new_len'] += len(new_lines)
+        self.hunk['trailing'] = 0
+        self.old_line += 1
+        self.new_line += len(new_lines)
         
-        for edit in edits:
-            old_text = edit.get('oldText', '')
-            new_text = edit.get('newText', '')
+    def finish(self):
+        if self.hunk is not None:
+            self._close_hunk()
+        return ''.join(self.out) if len(self.out) > 2 else ''
+
+def _crlf_edit(edit):
+    """Give an edit's bare ``\\n`` line breaks a ``\\r`` to match a CRLF file."""
+    return {**edit, **{key: re.sub(r'(?<!\r)\n', '\r\n', edit[key])
+                       for key in ('oldText', 'newText') if key in edit}}
+
+def _compile_line_edits(edits):
+    """Split edits into literal anchors and regexes for the streaming editor.
+
+    Returns ``(literal, olds, regexes)``: the indices of the literal edits
+    (oldText/newText), their anchors, and ``(index, regex, replacement)`` for
+    each regex edit. Literal anchors must not span lines; regex edits replace
+    every match on a line and are run on the line without its terminator, so
+    ``$`` and ``\\s`` behave the same on LF and CRLF files and never eat the
+    newline.
+    """
+    literal = [i for i, edit in enumerate(edits) if 'pattern' not in edit]
+    olds = _anchor_texts([edits[i] for i in literal])
+    for i, old in zip(literal, olds):
+        if '\n' in old:
+            raise ValueError(f"Edit {i + 1}: streaming edits need a single-line oldText")
+    regexes = [(i, re.compile(edit['pattern']), edit.get('replacement', ''))
+               for i, edit in enumerate(edits) if 'pattern' in edit]
+    return literal, olds, regexes
+
+def stream_edit_file(path, edits, dry_run=False, cancel=None, max_bytes=RESPONSE_BUDGET_BYTES, skip=0):
+    """Apply line-oriented edits to a file without loading it into memory.
+
+    The file is read line by line and the result written to a temporary file
+    in the same directory, which atomically replaces the original once every
+    literal edit is confirmed to have matched exactly once (or replaceAll is
+    set). Literal anchors are claimed and checked for overlap as in
+    plan_edits, then regex edits run on the result. Each line's terminator
+    is split off before the edits run and put back afterwards, so line
+    endings are preserved as-is. Dry runs return the diff paged by
+    ``max_bytes`` and ``skip``.
+    """
+    start = time.perf_counter()
+    literal, olds, regexes = _compile_line_edits(edits)
+    literal_edits = [edits[i] for i in literal]
+    crlf_edits = [_crlf_edit(edit) for edit in literal_edits]
+    counts = [0] * len(edits)
+    seen = [False] * len(edits)
+    diff = StreamingDiff(path, max_bytes=max_bytes, skip=skip) if dry_run else None
+    dir_path = os.path.dirname(os.path.abspath(path))
+    processed = 0
+    
+    tmp = None
+    try:
+        if not dry_run:
+            tmp = tempfile.NamedTemporaryFile('wb', dir=dir_path,
+                                              prefix='.' + os.path.basename(path) + '.',
+                                              suffix='.tmp', delete=False)
+        with open(path, 'rb') as src:
+            for line_count, raw in enumerate(src):
+                if not line_count % 4096:
+                    check_cancelled(cancel)
+                processed += len(raw)
+                line = raw.decode('utf-8')
+                body = line.rstrip('\r\n')
+                new_body = body
+                if literal:
+                    # Anchors are claimed and checked for overlap the same way plan_edits does
+                    positions, line_seen = _claim_anchors(body, olds, literal_edits)
+                    for k, i in enumerate(literal):
+                        counts[i] += len(positions[k])
+                        seen[i] = seen[i] or line_seen[k]
+                    if any(positions):
+                        spans = _anchor_spans(positions, olds, crlf_edits if line.endswith('\r\n')
+                                              else literal_edits)
+                        new_body = apply_edits(body, spans)
+                for i, regex, replacement in regexes:
+                    new_body, n = regex.subn(replacement, new_body)
+                    counts[i] += n
+                new_line = line if new_body == body else new_body + line[len(body):]
+                if tmp is not None:
+                    tmp.write(new_line.encode('utf-8') if new_line is not line else raw)
+                elif new_line != line:
+                    diff.changed(line, new_line.splitlines(keepends=True))
+                else:
+                    diff.unchanged(line)
+                    
+        _check_anchor_counts(edits, counts, seen)
+        changes = [{'edit': i + 1, 'found': counts[i] > 0, 'occurrences': counts[i]}
+                   for i in range(len(edits))]
             
-            if old_text in new_content:
-                changes.append({
-                    'oldText': old_text,
-                    'newText': new_text,
-                    'found': True
-                })
-                new_content = new_content.replace(old_text, new_text)
-            else:
-                changes.append({
-                    'oldText': old_text,
-                    'newText': new_text,
-                    'found': False
-                })
-        
+        result = {'changes': changes, 'applied': False, 'streamed': True}
         if dry_run:
+            result['diff'] = diff.finish()
+            result.update(budget_info(diff.total, diff.resume))
+        elif any(counts):
+            tmp.close()
+            shutil.copymode(path, tmp.name)
+            os.replace(tmp.name, path)
+            tmp = None
+            result['applied'] = True
+        result['bytes_processed'] = processed
+        result['elapsed_seconds'] = round(time.perf_counter() - start, 3)
+        return result
+    finally:
+        if tmp is not None:
+            tmp.close()
+            os.unlink(tmp.name)
+
+def _page_diff(diff, offset, max_bytes):
+    """Cut a page of at most ``max_bytes`` out of a diff, ending on a whole line."""
+    page = diff[offset:offset + max_bytes]
+    if offset + len(page) < len(diff):
+        cut = page.rfind('\n') + 1
+        if cut:
+            page = page[:cut]
+    next_offset = offset + len(page)
+    return page, next_offset if next_offset < len(diff) else None
+
+def _edit_file(path, edits, dry_run, threshold, max_bytes=RESPONSE_BUDGET_BYTES, offset=0,
+               cancel=None):
+    """Blocking part of edit_file; returns the tool's response string."""
+    if not os.path.exists(path):
+        return f"Error: File {path} does not exist"
+        
+    multi_line = any('\n' in edit.get('oldText', '') for edit in edits if 'pattern' not in edit)
+    if any('pattern' in edit for edit in edits):
+        if multi_line:
+            raise ValueError("Regex edits cannot be combined with a multi-line oldText")
+        stream = True
+    else:
+        # Multi-line anchors need the whole text, whatever the file size
+        stream = not multi_line and os.path.getsize(path) > threshold
+    if stream:
+        try:
+            return json.dumps(stream_edit_file(path, edits, dry_run, cancel, max_bytes, offset))
+        finally:
+            if not dry_run:
+                invalidate_cached(path)
+        
+    # Keep the file's line endings, as the streaming editor does
+    content = read_cached_bytes(path).decode('utf-8')
+    first_newline = content.find('\n')
+    if first_newline > 0 and content[first_newline - 1] == '\r':
+        spans, changes = plan_edits(content, [_crlf_edit(edit) for edit in edits])
+        for change, edit in zip(changes, edits):
+            change.update(oldText=edit.get('oldText', ''), newText=edit.get('newText', ''))
+    else:
+        spans, changes = plan_edits(content, edits)
+    
+    if dry_run:
+        diff = unified_diff(path, content, spans)
+        page, next_offset = _page_diff(diff, offset, max_bytes)
+        return json.dumps({
+            'diff': page,
+            'changes': changes,
+            'applied': False,
+            **budget_info(len(diff), next_offset)
+        })
+    else:
+        new_content = apply_edits(content, spans)
+        if content != new_content:
+            try:
+                with open(path, 'w', encoding='utf-8', newline='') as f:
+                    f.write(new_content)
+            finally:
+                invalidate_cached(path)
             return json.dumps({
-                'originalContent': content,
-                'newContent': new_content,
                 'changes': changes,
-                'applied': False
+                'applied': True
             })
         else:
-            if content != new_content:
-                with open(path, 'w', encoding='utf-8') as f:
-                    f.write(new_content)
-                return json.dumps({
-                    'changes': changes,
-                    'applied': True
-                })
-            else:
-                return "No changes were made to the file"
+            return "No changes were made to the file"
+
+@mcp.tool()
+async def edit_file(path: str, edits: List[Dict[str, Any]], dry_run: bool = False,
+                    stream_threshold: Optional[int] = None, max_bytes: Optional[int] = None,
+                    continuation: Optional[str] = None) -> str:
+    """Make selective edits using pattern matching.
+    
+    Every oldText must match exactly one location (or set replaceAll on the
+    edit); overlapping or ambiguous edits are rejected and nothing is written.
+    A dry run returns a unified diff instead of the full file contents,
+    cut to the response budget; pass "continuation" back with the same
+    edits to get the next part of a truncated diff.
+    
+    Files larger than stream_threshold, and any call using regex edits
+    (pattern/replacement), are edited line by line through a temporary file
+    that atomically replaces the original, keeping memory use flat. Edits
+    with a multi-line oldText always load the whole file. Either way the
+    same anchor checks apply and the file keeps its line endings; on a CRLF
+    file a "\n" in oldText or newText stands for "\r\n".
+    
+    Args:
+        path: File to edit
+        edits: List of edit operations with oldText, newText and optional replaceAll,
+            or pattern and replacement for line-by-line regex edits
+        dry_run: Preview changes without applying
+        stream_threshold: File size in bytes above which edits are streamed
+        max_bytes: Maximum size of the dry-run diff returned by this call
+        continuation: Token from a previous dry run to continue its diff
+    """
+    try:
+        if not await run_blocking('edit_file', is_path_allowed, path):
+            return f"Error: Access to path '{path}' is not allowed."
+            
+        threshold = STREAM_EDIT_THRESHOLD if stream_threshold is None else stream_threshold
+        max_bytes, _ = response_budget(max_bytes)
+        return await run_blocking('edit_file', _edit_file, path, edits, dry_run, threshold,
+                                  max_bytes, decode_continuation(continuation), cancellable=True)
     except Exception as e:
         return f"Error editing file: {str(e)}"
 
@@ -163,41 +1267,219 @@ async def create_directory(path: str) -> str:
         path: Directory path to create
     """
     try:
-        if not is_path_allowed(path):
+        if not await run_blocking('create_directory', is_path_allowed, path):
             return f"Error: Access to path '{path}' is not allowed."
             
-        os.makedirs(path, exist_ok=True)
+        await run_blocking('create_directory', os.makedirs, path, exist_ok=True)
         return f"Directory {path} created or already exists"
     except Exception as e:
         return f"Error creating directory: {str(e)}"
 
+LIST_SORT_KEYS = ('name', 'type', 'size', 'mtime')
+TREE_MAX_DEPTH = 3
+TREE_MAX_ENTRIES_PER_DIR = 100
+
+def _describe_entry(entry, include_size=False, include_mtime=False):
+    """Build a listing row from a DirEntry, stat'ing only when asked to."""
+    is_dir = entry.is_dir()
+    row = {"name": entry.name, "type": "directory" if is_dir else "file"}
+    if include_size or include_mtime:
+        try:
+            stat_info = entry.stat()
+        except OSError:
+            stat_info = None
+        if include_size:
+            row["size"] = None if stat_info is None or is_dir else stat_info.st_size
+        if include_mtime:
+            row["modified"] = None if stat_info is None else \
+                datetime.datetime.fromtimestamp(stat_info.st_mtime).isoformat()
+    return row
+
+def _list_directory(path, cursor=None, limit=None, include_size=False, include_mtime=False,
+                    sort_by=None, reverse=False, max_bytes=None):
+    """Blocking part of list_directory; returns the tool's response string."""
+    if not os.path.isdir(path):
+        return f"Error: Path {path} does not exist"
+        
+    if sort_by is not None and sort_by not in LIST_SORT_KEYS:
+        return f"Error: sort_by must be one of {list(LIST_SORT_KEYS)}"
+    # Legacy format: one [DIR]/[FILE] string per entry, type taken from scandir
+    legacy = (cursor is None and limit is None and max_bytes is None and not include_size
+              and not include_mtime and sort_by is None)
+    budget_bytes, budget_entries = response_budget(max_bytes, limit)
+    offset = decode_continuation(cursor)
+    
+    with os.scandir(path) as it:
+        if sort_by is None:
+            # Unsorted pages stop reading the directory once the page is full
+            stop = offset + budget_entries + 1
+            entries = list(itertools.islice(it, stop))
+            complete = len(entries) < stop
+            total = len(entries)
+            if legacy:
+                rows = [f"[DIR] {entry.name}" if entry.is_dir() else f"[FILE] {entry.name}"
+                        for entry in entries[offset:]]
+            else:
+                rows = [_describe_entry(entry, include_size, include_mtime)
+                        for entry in entries[offset:]]
+        else:
+            rows = [_describe_entry(entry, include_size or sort_by == 'size',
+                                    include_mtime or sort_by == 'mtime') for entry in it]
+            complete = True
+            total = len(rows)
+            
+    if sort_by is not None:
+        key = {
+            'name': lambda row: row['name'].lower(),
+            'type': lambda row: (row['type'] != 'directory', row['name'].lower()),
+            'size': lambda row: (row.get('size') or 0, row['name'].lower()),
+            'mtime': lambda row: (row.get('modified') or '', row['name'].lower()),
+        }[sort_by]
+        rows.sort(key=key, reverse=reverse)
+        rows = rows[offset:]
+        for row in rows:
+            if not include_size:
+                row.pop('size', None)
+            if not include_mtime:
+                row.pop('modified', None)
+                
+    count = take_within_budget(rows, budget_bytes, budget_entries)
+    next_offset = offset + count if count < len(rows) else None
+    if legacy and next_offset is None:
+        return json.dumps(rows)
+        
+    result = {
+        "path": path,
+        "entries": rows[:count],
+        "next_cursor": None if next_offset is None else str(next_offset)
+    }
+    if complete:
+        result["total"] = total
+    result.update(budget_info(total, next_offset))
+    return json.dumps(result)
+
 @mcp.tool()
-async def list_directory(path: str) -> str:
+async def list_directory(path: str, cursor: Optional[str] = None, limit: Optional[int] = None,
+                         include_size: bool = False, include_mtime: bool = False,
+                         sort_by: Optional[str] = None, reverse: bool = False,
+                         max_bytes: Optional[int] = None) -> str:
     """List directory contents with [FILE] or [DIR] prefixes.
     
+    Without options the result is a JSON list of "[DIR] name" / "[FILE] name"
+    strings. With any option, or when the listing does not fit the response
+    budget, it is a JSON object with "entries", "truncated", "total_estimate"
+    and a "continuation" (also "next_cursor") to pass back as cursor for the
+    next page. Unsorted pages stop reading the directory as soon as they are full.
+    
     Args:
         path: Directory path to list
+        cursor: Cursor returned by a previous call to continue listing
+        limit: Maximum number of entries to return
+        include_size: Include file sizes
+        include_mtime: Include modification times
+        sort_by: Sort by "name", "type", "size" or "mtime" (reads the whole directory)
+        reverse: Reverse the sort order
+        max_bytes: Maximum size of the entries returned by this call
     """
     try:
-        if not is_path_allowed(path):
+        if not await run_blocking('list_directory', is_path_allowed, path):
             return f"Error: Access to path '{path}' is not allowed."
             
-        if not os.path.exists(path):
+        return await run_blocking('list_directory', _list_directory, path, cursor, limit,
+                                  include_size, include_mtime, sort_by, reverse, max_bytes)
+    except Exception as e:
+        return f"Error listing directory: {str(e)}"
+
+def _directory_tree(path, max_depth, max_entries, include_size, budget, depth=1, cancel=None):
+    """Build a nested listing of ``path`` with depth, per-directory and response caps.
+
+    ``budget`` holds the bytes and entries the response may still use and is
+    shared by the whole walk. A directory is listed in full before any of
+    its subdirectories, so once the budget runs out the upper levels are
+    complete and deeper listings are the ones cut short.
+    """
+    check_cancelled(cancel)
+    children = []
+    subdirs = []
+    truncated = False
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                if len(children) >= max_entries:
+                    truncated = True
+                    break
+                row = _describe_entry(entry, include_size)
+                cost = len(json.dumps(row)) + 2
+                if budget["entries"] < 1 or budget["bytes"] < cost:
+                    budget["exhausted"] = truncated = True
+                    break
+                budget["entries"] -= 1
+                budget["bytes"] -= cost
+                if row["type"] == "directory" and not entry.is_symlink() and depth < max_depth:
+                    subdirs.append((entry.path, row))
+                children.append(row)
+    except OSError as e:
+        return {"error": e.strerror or str(e)}
+    for dir_path, row in subdirs:
+        row.update(_directory_tree(dir_path, max_depth, max_entries, include_size, budget,
+                                   depth + 1, cancel))
+    children.sort(key=lambda row: (row["type"] != "directory", row["name"].lower()))
+    node = {"children": children}
+    if truncated:
+        node["truncated"] = True
+    return node
+
+@mcp.tool()
+async def directory_tree(path: str, max_depth: int = TREE_MAX_DEPTH,
+                         max_entries_per_dir: int = TREE_MAX_ENTRIES_PER_DIR,
+                         include_size: bool = False, max_bytes: Optional[int] = None,
+                         max_entries: Optional[int] = None) -> str:
+    """Get a recursive tree of a directory as nested JSON.
+    
+    Directories listed beyond max_entries_per_dir are cut off and marked
+    "truncated". Symlinked directories are shown but not followed. The
+    whole tree is also held to the response budget: once it is used up the
+    directories still being listed are marked "truncated" and the result
+    has "budget_exhausted"; ask for a subdirectory to see more of it.
+    
+    Args:
+        path: Directory to start from
+        max_depth: How many levels to descend (1 = direct children only)
+        max_entries_per_dir: Maximum entries listed per directory
+        include_size: Include file sizes
+        max_bytes: Maximum size of the tree returned by this call
+        max_entries: Maximum number of entries in the whole tree
+    """
+    try:
+        if not await run_blocking('directory_tree', is_path_allowed, path):
+            return f"Error: Access to path '{path}' is not allowed."
+            
+        if not os.path.isdir(path):
             return f"Error: Path {path} does not exist"
             
-        items = os.listdir(path)
-        result = []
-        
-        for item in items:
-            full_path = os.path.join(path, item)
-            if os.path.isdir(full_path):
-                result.append(f"[DIR] {item}")
-            else:
-                result.append(f"[FILE] {item}")
-                
-        return json.dumps(result)
+        budget_bytes, budget_entries = response_budget(max_bytes, max_entries)
+        budget = {"bytes": budget_bytes, "entries": budget_entries, "exhausted": False}
+        tree = await run_blocking('directory_tree', _directory_tree, path, max(max_depth, 1),
+                                  max(max_entries_per_dir, 0), include_size, budget, cancellable=True)
+        return json.dumps({"name": os.path.basename(os.path.normpath(path)) or path,
+                           "type": "directory", **tree, "budget_exhausted": budget["exhausted"]})
     except Exception as e:
-        return f"Error listing directory: {str(e)}"
+        return f"Error building directory tree: {str(e)}"
+
+def _move_file(source, destination):
+    """Blocking part of move_file; returns the tool's response string."""
+    if not os.path.exists(source):
+        return f"Error: Source {source} does not exist"
+        
+    if os.path.exists(destination):
+        return f"Error: Destination {destination} already exists"
+        
+    try:
+        shutil.move(source, destination)
+    finally:
+        invalidate_cached(source)
+        invalidate_cached(destination)
+    return f"Successfully moved {source} to {destination}"
 
 @mcp.tool()
 async def move_file(source: str, destination: str) -> str:
@@ -208,96 +1490,2083 @@ async def move_file(source: str, destination: str) -> str:
         destination: Destination path
     """
     try:
-        if not is_path_allowed(source):
+        if not await run_blocking('move_file', is_path_allowed, source):
             return f"Error: Access to source path '{source}' is not allowed."
             
-        if not is_path_allowed(destination):
+        if not await run_blocking('move_file', is_path_allowed, destination):
             return f"Error: Access to destination path '{destination}' is not allowed."
             
-        if not os.path.exists(source):
-            return f"Error: Source {source} does not exist"
-            
-        if os.path.exists(destination):
-            return f"Error: Destination {destination} already exists"
-            
-        shutil.move(source, destination)
-        return f"Successfully moved {source} to {destination}"
+        return await run_blocking('move_file', _move_file, source, destination)
     except Exception as e:
         return f"Error moving file: {str(e)}"
 
-@mcp.tool()
-async def search_files(path: str, pattern: str, exclude_patterns: Optional[List[str]] = None) -> str:
-    """Recursively search for files/directories.
-    
-    Args:
-        path: Starting directory
-        pattern: Search pattern
-        exclude_patterns: Patterns to exclude
+# Settings for copy_file/copy_tree
+COPY_BUFFER_BYTES = 1024 * 1024
+COPY_CHUNK_BYTES = 64 * 1024 * 1024
+COPY_BATCH_FILES = 32
+COPY_BATCH_BYTES = 256 * 1024 * 1024
+# errnos meaning "this kernel copy call is not supported for these files"
+COPY_FALLBACK_ERRNOS = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP,
+                        errno.ENOTSOCK, errno.EBADF, errno.ETXTBSY, errno.EPERM}
+
+def size_batches(items, size_of, max_files, max_bytes):
+    """Group items so small files share a worker task and big files get one each."""
+    batches = []
+    batch, batch_bytes = [], 0
+    for item in items:
+        batch.append(item)
+        batch_bytes += size_of(item)
+        if len(batch) >= max_files or batch_bytes >= max_bytes:
+            batches.append(batch)
+            batch, batch_bytes = [], 0
+    if batch:
+        batches.append(batch)
+    return batches
+
+def _copy_data(source, destination, cancel=None):
+    """Copy file contents, in the kernel where the platform allows it.
+
+    Tries ``os.copy_file_range`` and then ``os.sendfile``, falling back to
+    ``shutil.copyfileobj`` with a large buffer. Returns ``(bytes, method)``.
     """
+    with open(source, 'rb') as fsrc, open(destination, 'wb') as fdst:
+        src_fd, dst_fd = fsrc.fileno(), fdst.fileno()
+        copied = 0
+        for method in ('copy_file_range', 'sendfile'):
+            if not hasattr(os, method):
+                continue
+            try:
+                while True:
+                    check_cancelled(cancel)
+                    if method == 'copy_file_range':
+                        n = os.copy_file_range(src_fd, dst_fd, COPY_CHUNK_BYTES)
+                    else:
+                        n = os.sendfile(dst_fd, src_fd, copied, COPY_CHUNK_BYTES)
+                    if not n:
+                        return copied, method
+                    copied += n
+            except OSError as e:
+                # Only switch methods before anything was written
+                if copied or e.errno not in COPY_FALLBACK_ERRNOS:
+                    raise
+        shutil.copyfileobj(fsrc, fdst, COPY_BUFFER_BYTES)
+        return fdst.tell(), 'copyfileobj'
+
+def _copy_one(source, destination, preserve_metadata, cancel=None):
+    """Copy one regular file and, optionally, its mode and timestamps."""
     try:
-        if not is_path_allowed(path):
-            return f"Error: Access to path '{path}' is not allowed."
-            
-        if not os.path.exists(path):
-            return f"Error: Path {path} does not exist"
-            
-        matches = []
-        exclude_patterns = exclude_patterns or []
+        copied, method = _copy_data(source, destination, cancel)
+        if preserve_metadata:
+            shutil.copystat(source, destination)
+    finally:
+        invalidate_cached(destination)
+    return copied, method
+
+def _copy_batch(items, preserve_metadata, cancel=None):
+    """Copy a batch of ``(source, destination, size)`` files on one worker thread."""
+    results = []
+    for source, destination, _ in items:
+        try:
+            results.append(_copy_one(source, destination, preserve_metadata, cancel) + (None,))
+        except OSError as e:
+            results.append((0, None, e.strerror or str(e)))
+    return results
+
+def _copy_file(source, destination, overwrite, preserve_metadata, cancel=None):
+    """Blocking part of copy_file; returns the tool's response string."""
+    if not os.path.isfile(source):
+        return f"Error: Source {source} does not exist or is not a file"
         
-        for root, dirnames, filenames in os.walk(path):
-            # Check if current directory should be excluded
-            if any(glob.fnmatch.fnmatch(root.lower(), p.lower()) for p in exclude_patterns):
-                continue
-                
-            # Process directories
-            for dirname in dirnames:
-                full_path = os.path.join(root, dirname)
-                if glob.fnmatch.fnmatch(dirname.lower(), pattern.lower()):
-                    if not any(glob.fnmatch.fnmatch(full_path.lower(), p.lower()) for p in exclude_patterns):
-                        if is_path_allowed(full_path):
-                            matches.append(full_path)
-                        
-            # Process files
-            for filename in filenames:
-                full_path = os.path.join(root, filename)
-                if glob.fnmatch.fnmatch(filename.lower(), pattern.lower()):
-                    if not any(glob.fnmatch.fnmatch(full_path.lower(), p.lower()) for p in exclude_patterns):
-                        if is_path_allowed(full_path):
-                            matches.append(full_path)
-                        
-        return json.dumps(matches)
-    except Exception as e:
-        return f"Error searching files: {str(e)}"
+    if os.path.exists(destination) and not overwrite:
+        return f"Error: Destination {destination} already exists"
+        
+    start = time.perf_counter()
+    copied, method = _copy_one(source, destination, preserve_metadata, cancel)
+    elapsed = time.perf_counter() - start
+    return json.dumps({
+        "source": source,
+        "destination": destination,
+        "bytes": copied,
+        "method": method,
+        "elapsed_seconds": round(elapsed, 3),
+        "bytes_per_second": round(copied / elapsed) if elapsed > 0 else None
+    })
 
 @mcp.tool()
-async def get_file_info(path: str) -> str:
-    """Get detailed file/directory metadata.
+async def copy_file(source: str, destination: str, overwrite: bool = False,
+                    preserve_metadata: bool = True) -> str:
+    """Copy a file without sending its contents through the client.
+    
+    Uses copy_file_range or sendfile where available so data stays in the
+    kernel, otherwise a buffered copy.
     
     Args:
-        path: Path to file or directory
+        source: File to copy
+        destination: Path of the new file
+        overwrite: Replace the destination if it already exists
+        preserve_metadata: Copy permission bits and timestamps as well
     """
     try:
-        if not is_path_allowed(path):
-            return f"Error: Access to path '{path}' is not allowed."
+        if not await run_blocking('copy_file', is_path_allowed, source):
+            return f"Error: Access to source path '{source}' is not allowed."
             
-        if not os.path.exists(path):
-            return f"Error: Path {path} does not exist"
+        if not await run_blocking('copy_file', is_path_allowed, destination):
+            return f"Error: Access to destination path '{destination}' is not allowed."
+            
+        return await run_blocking('copy_file', _copy_file, source, destination, overwrite,
+                                  preserve_metadata, cancellable=True)
+    except Exception as e:
+        return f"Error copying file: {str(e)}"
+
+def _plan_tree_copy(source, destination, excludes, overwrite, cancel=None):
+    """Create the destination directories and list what copy_tree must copy.
+
+    Returns ``(dirs, files, links, skipped)``, where ``dirs`` pairs every
+    copied directory with its source and ``files`` holds
+    ``(source, destination, size)`` tuples.
+    """
+    os.makedirs(destination, exist_ok=True)
+    dirs = [(source, destination)]
+    files = []
+    links = []
+    skipped = []
+    for entry, _ in walk_entries(source, excludes, cancel=cancel):
+        target = os.path.join(destination, os.path.relpath(entry.path, source))
+        if entry.is_symlink():
+            links.append((entry.path, target))
+        elif entry.is_dir(follow_symlinks=False):
+            os.makedirs(target, exist_ok=True)
+            dirs.append((entry.path, target))
+        elif entry.is_file(follow_symlinks=False):
+            if not overwrite and os.path.lexists(target):
+                skipped.append(target)
+            else:
+                files.append((entry.path, target, entry.stat(follow_symlinks=False).st_size))
+    return dirs, files, links, skipped
+
+def _finish_tree_copy(dirs, links, overwrite, preserve_metadata):
+    """Recreate symlinks and, deepest first, copy directory metadata."""
+    errors = []
+    for source, target in links:
+        try:
+            if os.path.lexists(target):
+                if not overwrite:
+                    continue
+                os.unlink(target)
+            os.symlink(os.readlink(source), target, target_is_directory=os.path.isdir(source))
+        except OSError as e:
+            errors.append({"path": source, "error": e.strerror or str(e)})
+    if preserve_metadata:
+        # Copying files into a directory bumps its mtime, so directories go last
+        for source, target in reversed(dirs):
+            try:
+                shutil.copystat(source, target)
+            except OSError as e:
+                errors.append({"path": source, "error": e.strerror or str(e)})
+    return errors
+
+def _is_within(path, root):
+    """Check whether ``path`` is ``root`` or below it; paths on different drives never are."""
+    try:
+        return os.path.commonpath([os.path.normcase(path), os.path.normcase(root)]) == os.path.normcase(root)
+    except ValueError:
+        # Windows raises for paths on different drives (C: and D:)
+        return False
+
+@mcp.tool()
+async def copy_tree(source: str, destination: str, exclude_patterns: Optional[List[str]] = None,
+                    overwrite: bool = False, preserve_metadata: bool = True) -> str:
+    """Copy a directory tree, copying files in parallel.
+    
+    Symlinks are recreated rather than followed. Existing destination files
+    are skipped unless overwrite is set.
+    
+    Args:
+        source: Directory to copy
+        destination: Directory to copy into (created if missing)
+        exclude_patterns: Patterns to exclude; matching directories are not descended into
+        overwrite: Allow copying into an existing directory and replace existing files
+        preserve_metadata: Copy permission bits and timestamps as well
+    """
+    try:
+        if not await run_blocking('copy_tree', is_path_allowed, source):
+            return f"Error: Access to source path '{source}' is not allowed."
+            
+        if not await run_blocking('copy_tree', is_path_allowed, destination):
+            return f"Error: Access to destination path '{destination}' is not allowed."
+            
+        if not os.path.isdir(source):
+            return f"Error: Source {source} is not a directory"
+            
+        if os.path.exists(destination) and not overwrite:
+            return f"Error: Destination {destination} already exists"
+            
+        source_real = os.path.realpath(source)
+        destination_real = os.path.realpath(destination)
+        if _is_within(destination_real, source_real):
+            return f"Error: Cannot copy {source} into itself"
+            
+        start = time.perf_counter()
+        dirs, files, links, skipped = await run_blocking(
+            'copy_tree', _plan_tree_copy, source, destination, compile_excludes(exclude_patterns),
+            overwrite, cancellable=True)
+        batches = size_batches(files, lambda item: item[2], COPY_BATCH_FILES, COPY_BATCH_BYTES)
+        copied = await asyncio.gather(*(
+            run_blocking('copy_tree', _copy_batch, batch, preserve_metadata, cancellable=True)
+            for batch in batches))
+        errors = await run_blocking('copy_tree', _finish_tree_copy, dirs, links, overwrite,
+                                    preserve_metadata)
+                                    
+        files_copied = 0
+        total_bytes = 0
+        methods = set()
+        for batch, results in zip(batches, copied):
+            for (path, _, _), (size, method, error) in zip(batch, results):
+                if error is not None:
+                    errors.append({"path": path, "error": error})
+                else:
+                    files_copied += 1
+                    total_bytes += size
+                    methods.add(method)
+        elapsed = time.perf_counter() - start
+        return json.dumps({
+            "source": source,
+            "destination": destination,
+            "files_copied": files_copied,
+            "directories": len(dirs),
+            "symlinks": len(links),
+            "skipped": skipped,
+            "bytes": total_bytes,
+            "methods": sorted(methods),
+            "elapsed_seconds": round(elapsed, 3),
+            "bytes_per_second": round(total_bytes / elapsed) if elapsed > 0 else None,
+            "errors": errors
+        })
+    except Exception as e:
+        return f"Error copying directory: {str(e)}"
+
+def compile_patterns(patterns):
+    """Compile glob patterns into one case-insensitive regex, or None if empty."""
+    if not patterns:
+        return None
+    return re.compile('|'.join(fnmatch.translate(p) for p in patterns), re.IGNORECASE)
+
+def compile_excludes(patterns):
+    """Compile exclude globs into ``(name_re, path_re)``.
+
+    Patterns without a path separator are matched against entry names only,
+    which is enough to prune a whole subtree and avoids matching every full
+    path; patterns containing a separator are matched against the full path.
+    """
+    seps = tuple(sep for sep in (os.sep, os.altsep, '/') if sep)
+    patterns = patterns or []
+    return (compile_patterns([p for p in patterns if not any(sep in p for sep in seps)]),
+            compile_patterns([p for p in patterns if any(sep in p for sep in seps)]))
+
+def walk_entries(path, excludes=(None, None), max_depth=None, cancel=None):
+    """Yield ``(DirEntry, depth)`` for everything below ``path`` using scandir.
+
+    Entries matching the compiled ``excludes`` are skipped and, for
+    directories, not descended into. Symlinked directories are reported but
+    not followed. Unreadable directories are skipped like ``os.walk`` does.
+    The ``cancel`` event is checked before each directory is listed.
+    """
+    name_re, path_re = excludes
+    stack = [(path, 1)]
+    while stack:
+        check_cancelled(cancel)
+        dir_path, depth = stack.pop()
+        try:
+            with os.scandir(dir_path) as it:
+                entries = list(it)
+        except OSError:
+            continue
+        for entry in entries:
+            if name_re is not None and name_re.match(entry.name):
+                continue
+            if path_re is not None and path_re.match(entry.path):
+                continue
+            yield entry, depth
+            try:
+                descend = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                descend = False
+            if descend and (max_depth is None or depth < max_depth):
+                stack.append((entry.path, depth + 1))
+
+# Optional on-disk metadata index used by search_files(use_index=True)
+INDEX_DB_PATH = os.path.join(os.environ['APPDATA'], 'Claude', 'fs_index.sqlite3')
+
+def _index_key(path):
+    """Absolute path used as the index primary key, case-folded where the OS folds case."""
+    return os.path.normcase(os.path.abspath(path))
+
+def _key_range(key):
+    """Bounds of all keys strictly below ``key`` in the directory tree."""
+    prefix = key if key.endswith(os.sep) else key + os.sep
+    return prefix, prefix[:-1] + chr(ord(os.sep) + 1)
+
+# Bump when the key format changes; older databases are dropped and rebuilt
+INDEX_SCHEMA_VERSION = 2
+
+def _open_index():
+    """Open the index database, creating its schema on first use."""
+    os.makedirs(os.path.dirname(INDEX_DB_PATH), exist_ok=True)
+    conn = sqlite3.connect(INDEX_DB_PATH, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    if conn.execute("PRAGMA user_version").fetchone()[0] != INDEX_SCHEMA_VERSION:
+        # Version 1 lowercased keys on every OS, merging README and readme on case-sensitive ones
+        conn.executescript(f"""
+            DROP TABLE IF EXISTS entries; DROP TABLE IF EXISTS dirs;
+            DROP TABLE IF EXISTS roots; DROP TABLE IF EXISTS changes;
+            PRAGMA user_version = {INDEX_SCHEMA_VERSION};
+        """)
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS entries (
+            key TEXT PRIMARY KEY, parent TEXT NOT NULL, path TEXT NOT NULL,
+            name TEXT NOT NULL, is_dir INTEGER NOT NULL, size INTEGER, mtime_ns INTEGER
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS entries_parent ON entries(parent, is_dir);
+        CREATE TABLE IF NOT EXISTS dirs (key TEXT PRIMARY KEY, path TEXT NOT NULL,
+            mtime_ns INTEGER NOT NULL) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS roots (key TEXT PRIMARY KEY, path TEXT NOT NULL,
+            built_at REAL, refreshed_at REAL);
+        CREATE TABLE IF NOT EXISTS changes (seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            key TEXT NOT NULL, path TEXT NOT NULL, kind TEXT NOT NULL, is_dir INTEGER NOT NULL);
+    """)
+    return conn
+
+def _index_root_for(path):
+    """Return the allowed directory that contains ``path`` (the deepest one).
+
+    Allowed directories are matched the way is_path_allowed matches them,
+    through the compiled trie, so a path allowed by case-folding or via an
+    allowed directory's real path still finds its root. The root is spelled
+    as in ``path`` so its index keys line up with the searched subtree's.
+    """
+    path = os.path.abspath(path)
+    node = allowed_matcher()
+    parts = path.split(os.sep)
+    depth = 0 if None in node else None
+    for i, part in enumerate(parts):
+        if not part:
+            continue
+        node = node.get(part.lower())
+        if node is None:
+            break
+        if None in node:
+            depth = i + 1
+    if depth is None:
+        raise ValueError(f"Path {path} is not inside an allowed directory")
+    root = os.sep.join(parts[:depth])
+    # A bare drive or an empty POSIX prefix still needs its separator
+    return root if os.path.splitdrive(root)[1] else root + os.sep
+
+def _index_drop_subtree(conn, key, log=False):
+    """Remove a directory and everything indexed below it."""
+    low, high = _key_range(key)
+    if log:
+        conn.execute("INSERT INTO changes (key, path, kind, is_dir) SELECT key, path, 'deleted', is_dir"
+                     " FROM entries WHERE key = ? OR (key >= ? AND key < ?) ORDER BY key DESC",
+                     (key, low, high))
+    conn.execute("DELETE FROM entries WHERE key = ? OR (key >= ? AND key < ?)", (key, low, high))
+    conn.execute("DELETE FROM dirs WHERE key = ? OR (key >= ? AND key < ?)", (key, low, high))
+
+def _index_scan_dir(conn, dir_path, dir_key, mtime_ns, log=False):
+    """Re-list one directory and reconcile its direct children in the index.
+
+    With ``log`` every child that was created, modified or deleted since the
+    last scan is also appended to the change log read by changes_since.
+    """
+    known = {key: (path, is_dir, size, mtime) for key, path, is_dir, size, mtime in conn.execute(
+        "SELECT key, path, is_dir, size, mtime_ns FROM entries WHERE parent = ?", (dir_key,))}
+    rows = []
+    changes = []
+    with os.scandir(dir_path) as it:
+        for entry in it:
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+                stat_info = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            key = os.path.normcase(entry.path)
+            old = known.pop(key, None)
+            if old is not None and bool(old[1]) != is_dir:
+                # Replaced by an entry of the other type: report it as deleted and re-created
+                if old[1]:
+                    _index_drop_subtree(conn, key, log)
+                elif log:
+                    changes.append((key, old[0], 'deleted', 0))
+                old = None
+            if log:
+                if old is None:
+                    changes.append((key, entry.path, 'created', int(is_dir)))
+                elif not is_dir and (old[2], old[3]) != (stat_info.st_size, stat_info.st_mtime_ns):
+                    changes.append((key, entry.path, 'modified', 0))
+            if old is None or (old[2], old[3]) != (stat_info.st_size, stat_info.st_mtime_ns):
+                rows.append((key, dir_key, entry.path, entry.name, int(is_dir),
+                             stat_info.st_size, stat_info.st_mtime_ns))
+    for key, (path, was_dir, _, _) in known.items():
+        if was_dir:
+            _index_drop_subtree(conn, key, log)
+        else:
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            if log:
+                changes.append((key, path, 'deleted', 0))
+    conn.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+    conn.execute("INSERT OR REPLACE INTO dirs VALUES (?, ?, ?)", (dir_key, dir_path, mtime_ns))
+    conn.executemany("INSERT INTO changes (key, path, kind, is_dir) VALUES (?, ?, ?, ?)", changes)
+
+def refresh_index(conn, path, cancel=None, rescan='changed'):
+    """Bring the index for ``path`` up to date.
+
+    ``rescan`` picks which directories are listed again: ``'changed'`` only
+    those whose mtime moved since the last scan, ``'all'`` every directory
+    (which also catches files modified in place), and ``'new'`` the start
+    directory plus any directory below it that is not indexed yet. Changes
+    are logged for every directory that was already indexed, or that is new
+    inside one that was. Returns the number of directories that were re-scanned.
+    """
+    rescanned = 0
+    stack = [(path, _index_key(path), False)]
+    while stack:
+        check_cancelled(cancel)
+        dir_path, dir_key, parent_logged = stack.pop()
+        row = conn.execute("SELECT mtime_ns FROM dirs WHERE key = ?", (dir_key,)).fetchone()
+        log = parent_logged or row is not None
+        try:
+            mtime_ns = os.stat(dir_path).st_mtime_ns
+        except OSError:
+            _index_drop_subtree(conn, dir_key, log)
+            continue
+        if rescan != 'changed' or row is None or row[0] != mtime_ns:
+            try:
+                _index_scan_dir(conn, dir_path, dir_key, mtime_ns, log)
+            except OSError:
+                continue
+            rescanned += 1
+        if rescan == 'new':
+            children = conn.execute(
+                "SELECT path, key FROM entries e WHERE parent = ? AND is_dir = 1"
+                " AND NOT EXISTS (SELECT 1 FROM dirs d WHERE d.key = e.key)", (dir_key,))
+        else:
+            children = conn.execute(
+                "SELECT path, key FROM entries WHERE parent = ? AND is_dir = 1", (dir_key,))
+        stack.extend((child_path, child_key, log) for child_path, child_key in children)
+    conn.commit()
+    return rescanned
+
+def _update_root(conn, root, rebuilt=False):
+    """Record when the index for an allowed root was built or refreshed."""
+    now = time.time()
+    key = _index_key(root)
+    if rebuilt:
+        conn.execute("INSERT OR REPLACE INTO roots VALUES (?, ?, ?, ?)", (key, root, now, now))
+    else:
+        conn.execute("INSERT OR IGNORE INTO roots VALUES (?, ?, ?, ?)", (key, root, now, now))
+        conn.execute("UPDATE roots SET refreshed_at = ? WHERE key = ?", (now, key))
+    conn.commit()
+
+def _glob_to_like(pattern):
+    """Translate a glob into a SQL LIKE pattern, or None if it uses [] classes."""
+    if '[' in pattern:
+        return None
+    escaped = pattern.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return escaped.replace('*', '%').replace('?', '_')
+
+def search_index(path, pattern, pattern_re, excludes, max_depth=None, max_results=None, cancel=None):
+    """Answer a name search from the index after refreshing the searched subtree."""
+    name_re, path_re = excludes
+    root = _index_root_for(path)
+    matcher = allowed_matcher()
+    resolved_dirs = {}
+    matches = []
+    conn = _open_index()
+    try:
+        refresh_index(conn, os.path.abspath(path), cancel)
+        _update_root(conn, root)
+        low, high = _key_range(_index_key(path))
+        query = "SELECT path, name FROM entries WHERE key >= ? AND key < ?"
+        params = [low, high]
+        like = _glob_to_like(pattern)
+        if like is not None:
+            # Let SQLite pre-filter names; the regex below still has the final say
+            query += " AND name LIKE ? ESCAPE '\\'"
+            params.append(like)
+        cursor = conn.execute(query + " ORDER BY key", params)
+        base_len = len(low)
+        for entry_path, name in cursor:
+            if not pattern_re.match(name):
+                continue
+            parts = entry_path[base_len:].split(os.sep)
+            if max_depth is not None and len(parts) > max_depth:
+                continue
+            if name_re is not None and any(name_re.match(part) for part in parts):
+                continue
+            if path_re is not None:
+                ancestor = entry_path[:base_len - 1]
+                excluded = False
+                for part in parts:
+                    ancestor = os.path.join(ancestor, part)
+                    if path_re.match(ancestor):
+                        excluded = True
+                        break
+                if excluded:
+                    continue
+            if is_path_allowed(entry_path, matcher, resolved_dirs):
+                matches.append(entry_path)
+                if max_results is not None and len(matches) >= max_results:
+                    break
+    finally:
+        conn.close()
+    return matches
+
+def _search_walk(path, pattern_re, excludes, max_depth, max_results, matcher, cancel=None):
+    """Walk ``path`` and collect entries whose names match ``pattern_re``."""
+    matches = []
+    for entry, _ in walk_entries(path, excludes, max_depth, cancel):
+        if pattern_re.match(entry.name) and is_entry_allowed(entry, matcher):
+            matches.append(entry.path)
+            if max_results is not None and len(matches) >= max_results:
+                break
+    return matches
+
+@mcp.tool()
+async def search_files(path: str, pattern: str, exclude_patterns: Optional[List[str]] = None,
+                       max_results: Optional[int] = None, max_depth: Optional[int] = None,
+                       use_index: bool = False, max_bytes: Optional[int] = None,
+                       max_entries: Optional[int] = None, continuation: Optional[str] = None) -> str:
+    """Recursively search for files/directories.
+    
+    Returns a JSON list of matching paths. When the matches do not fit the
+    response budget, or a budget or continuation is passed, the result is an
+    object with "matches", "truncated", "total_estimate" (a lower bound when
+    the search stopped early) and a "continuation" for the next page.
+    
+    Args:
+        path: Starting directory
+        pattern: Search pattern
+        exclude_patterns: Patterns to exclude; matching directories are not descended into.
+            Patterns without a path separator are matched against entry names.
+        max_results: Stop after this many matches
+        max_depth: Maximum directory depth to search (1 = direct children only)
+        use_index: Answer from the on-disk metadata index, refreshing only changed directories
+        max_bytes: Maximum size of the matches returned by this call
+        max_entries: Maximum number of matches returned by this call
+        continuation: Token from a previous call to get the next page of matches
+    """
+    try:
+        if not await run_blocking('search_files', is_path_allowed, path):
+            return f"Error: Access to path '{path}' is not allowed."
+            
+        if not os.path.exists(path):
+            return f"Error: Path {path} does not exist"
+            
+        pattern_re = compile_patterns([pattern])
+        excludes = compile_excludes(exclude_patterns)
+        budget_bytes, budget_entries = response_budget(max_bytes, max_entries)
+        offset = decode_continuation(continuation)
+        # One match past the page tells whether there is more
+        limit = offset + budget_entries + 1
+        if max_results is not None:
+            limit = min(limit, max_results)
+        
+        if use_index:
+            matches = await run_blocking('search_files', search_index, path, pattern, pattern_re,
+                                         excludes, max_depth, limit, cancellable=True)
+        else:
+            matches = await run_blocking('search_files', _search_walk, path, pattern_re, excludes,
+                                         max_depth, limit, allowed_matcher(), cancellable=True)
+                                         
+        page = matches[offset:]
+        count = take_within_budget(page, budget_bytes, budget_entries)
+        next_offset = offset + count if count < len(page) else None
+        if next_offset is None and max_bytes is None and max_entries is None and not continuation:
+            return json.dumps(page)
+            
+        return json.dumps({"matches": page[:count], **budget_info(len(matches), next_offset)})
+    except Exception as e:
+        return f"Error searching files: {str(e)}"
+
+# Content search settings for grep_files
+GREP_WORKERS = os.cpu_count() or 1
+GREP_BATCH_FILES = 64
+GREP_MMAP_THRESHOLD = 1024 * 1024
+GREP_CHUNK_BYTES = 1024 * 1024
+GREP_SNIFF_BYTES = 8192
+GREP_MAX_MATCHES = 1000
+# Matches forwarded in one progress notification; the rest only come back in the result
+GREP_PROGRESS_MATCHES = 20
+GREP_PROGRESS_LINE_CHARS = 200
+_grep_executor = None
+
+def _get_grep_executor():
+    """Create the grep process pool on first use."""
+    global _grep_executor
+    if _grep_executor is None:
+        _grep_executor = ProcessPoolExecutor(max_workers=GREP_WORKERS)
+    return _grep_executor
+
+def _decode_line(line):
+    """Decode one line, tolerating bad UTF-8 and CRLF endings."""
+    if isinstance(line, str):
+        return line.rstrip('\r')
+    return line.decode('utf-8', errors='replace').rstrip('\r')
+
+def _column(line, offset):
+    """1-based character column of a match starting ``offset`` into ``line``."""
+    if isinstance(line, str):
+        return offset + 1
+    return len(line[:offset].decode('utf-8', errors='replace')) + 1
+
+def _grep_data(path, data, regex, context_lines, limit):
+    """Find matching lines in a bytes-like buffer (bytes or mmap).
+
+    The buffer is processed in line-aligned chunks; a chunk without any match
+    is skipped after a single regex scan. Without context only the candidate
+    lines of a matching chunk are examined; with context the chunk is split
+    into lines so ``before``/``after`` can span chunk boundaries. A ``str``
+    regex is run on each chunk decoded as UTF-8, so classes like ``\\w`` and
+    case folding work on non-ASCII text.
+    """
+    decode = isinstance(regex.pattern, str)
+    newline = '\n' if decode else b'\n'
+    matches = []
+    pending = []
+    before = deque(maxlen=context_lines)
+    line_no = 0
+    size = len(data)
+    start = 0
+    while start < size:
+        end = min(start + GREP_CHUNK_BYTES, size)
+        if end < size:
+            cut = data.rfind(b'\n', start, end)
+            if cut < 0:
+                cut = data.find(b'\n', end)
+            end = size if cut < 0 else cut + 1
+        chunk = data[start:end]
+        start = end
+        if decode:
+            # Chunks end on a newline, so no character is split between them
+            chunk = chunk.decode('utf-8', errors='replace')
+        
+        if not pending and regex.search(chunk) is None:
+            line_no += chunk.count(newline) + (not chunk.endswith(newline))
+            if context_lines:
+                tail = chunk[:-1] if chunk.endswith(newline) else chunk
+                before.extend(tail.rsplit(newline, context_lines)[-context_lines:])
+            continue
+            
+        if not context_lines:
+            # Jump straight to candidate lines instead of testing every line
+            pos = 0
+            counted_to = 0
+            while len(matches) < limit:
+                candidate = regex.search(chunk, pos)
+                if candidate is None:
+                    break
+                line_start = chunk.rfind(newline, 0, candidate.start()) + 1
+                line_end = chunk.find(newline, candidate.start())
+                if line_end < 0:
+                    line_end = len(chunk)
+                line_no += chunk.count(newline, counted_to, line_start)
+                counted_to = line_start
+                line = chunk[line_start:line_end]
+                m = regex.search(line)
+                if m is not None:
+                    matches.append({
+                        'path': path,
+                        'line': line_no + 1,
+                        'column': _column(line, m.start()),
+                        'text': _decode_line(line)
+                    })
+                pos = line_end + 1
+            if len(matches) >= limit:
+                return matches
+            line_no += chunk.count(newline, counted_to) + (not chunk.endswith(newline))
+            continue
+            
+        lines = chunk.split(newline)
+        if chunk.endswith(newline):
+            lines.pop()
+        for line in lines:
+            line_no += 1
+            if pending:
+                for item in pending:
+                    item[0]['after'].append(_decode_line(line))
+                    item[1] -= 1
+                pending = [item for item in pending if item[1] > 0]
+            if len(matches) < limit:
+                m = regex.search(line)
+                if m is not None:
+                    match = {
+                        'path': path,
+                        'line': line_no,
+                        'column': _column(line, m.start()),
+                        'text': _decode_line(line)
+                    }
+                    if context_lines:
+                        match['before'] = [_decode_line(prev) for prev in before]
+                        match['after'] = []
+                        pending.append([match, context_lines])
+                    matches.append(match)
+            elif not pending:
+                return matches
+            if context_lines:
+                before.append(line)
+    return matches
+
+def compile_grep_pattern(pattern, is_regex, ignore_case):
+    """Compile a grep pattern, as bytes only where that matches like text would.
+
+    A literal can be searched in the raw bytes unless it needs non-ASCII case
+    folding. Regexes are always compiled as ``str``: a bytes regex treats
+    ``[가-힣]`` as a set of bytes and never matches ``\\w`` or ``.`` against a
+    multi-byte character.
+    """
+    flags = (re.IGNORECASE if ignore_case else 0) | re.MULTILINE
+    if is_regex:
+        return re.compile(pattern, flags)
+    if ignore_case and not pattern.isascii():
+        return re.compile(re.escape(pattern), flags)
+    return re.compile(re.escape(pattern.encode('utf-8')), flags)
+
+def grep_batch(paths, pattern, is_regex, ignore_case, context_lines, limit):
+    """Search a batch of files; runs inside a grep worker process.
+
+    Returns ``(matches, searched, binary)``. Files whose first bytes contain a
+    NUL are treated as binary and skipped; large files are memory-mapped.
+    """
+    regex = compile_grep_pattern(pattern, is_regex, ignore_case)
+    matches = []
+    searched = 0
+    binary = []
+    for path in paths:
+        if len(matches) >= limit:
+            break
+        try:
+            with open(path, 'rb') as f:
+                if b'\0' in f.read(GREP_SNIFF_BYTES):
+                    binary.append(path)
+                    continue
+                f.seek(0)
+                size = os.fstat(f.fileno()).st_size
+                searched += 1
+                if size == 0:
+                    continue
+                if size >= GREP_MMAP_THRESHOLD:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        matches.extend(_grep_data(path, mm, regex, context_lines, limit - len(matches)))
+                else:
+                    matches.extend(_grep_data(path, f.read(), regex, context_lines, limit - len(matches)))
+        except OSError:
+            continue
+    return matches, searched, binary
+
+def _grep_progress_message(matches):
+    """Format a batch's first matches as ``path:line: text`` lines for a progress notification."""
+    if not matches:
+        return None
+    lines = [f"{m['path']}:{m['line']}: {m['text'][:GREP_PROGRESS_LINE_CHARS]}"
+             for m in matches[:GREP_PROGRESS_MATCHES]]
+    if len(matches) > GREP_PROGRESS_MATCHES:
+        lines.append(f"[{len(matches) - GREP_PROGRESS_MATCHES} more matches in this batch]")
+    return '\n'.join(lines)
+
+def _grep_candidates(path, include_re, excludes, matcher, cancel=None):
+    """List the regular files under ``path`` that grep_files should search."""
+    return [entry.path for entry, _ in walk_entries(path, excludes, cancel=cancel)
+            if entry.is_file(follow_symlinks=False)
+            and (include_re is None or include_re.match(entry.name))
+            and is_entry_allowed(entry, matcher)]
+
+@mcp.tool()
+async def grep_files(path: str, pattern: str, is_regex: bool = False, ignore_case: bool = False,
+                     include_patterns: Optional[List[str]] = None,
+                     exclude_patterns: Optional[List[str]] = None,
+                     context_lines: int = 0, max_matches: int = GREP_MAX_MATCHES,
+                     ctx: Context = None) -> str:
+    """Search file contents for a literal string or regular expression.
+    
+    Files are searched in parallel worker processes; binary files are skipped.
+    As batches of files finish, their first matches are sent as progress
+    notifications so results show up before the whole search is done.
+    
+    Args:
+        path: Starting directory (or a single file)
+        pattern: Text or regular expression to search for
+        is_regex: Treat pattern as a regular expression
+        ignore_case: Case-insensitive matching
+        include_patterns: Only search files whose names match one of these globs
+        exclude_patterns: Patterns to exclude; matching directories are not descended into
+        context_lines: Number of lines of context before and after each match
+        max_matches: Stop after this many matches
+    """
+    try:
+        if not await run_blocking('grep_files', is_path_allowed, path):
+            return f"Error: Access to path '{path}' is not allowed."
+            
+        if not os.path.exists(path):
+            return f"Error: Path {path} does not exist"
+            
+        if is_regex:
+            re.compile(pattern)
+            
+        if os.path.isfile(path):
+            files = [path]
+        else:
+            files = await run_blocking('grep_files', _grep_candidates, path,
+                                       compile_patterns(include_patterns),
+                                       compile_excludes(exclude_patterns), allowed_matcher(),
+                                       cancellable=True)
+            
+        executor = _get_grep_executor()
+        futures = [
+            asyncio.wrap_future(executor.submit(grep_batch, files[i:i + GREP_BATCH_FILES], pattern,
+                                                is_regex, ignore_case, context_lines, max_matches))
+            for i in range(0, len(files), GREP_BATCH_FILES)
+        ]
+        
+        matches = []
+        searched = 0
+        binary = []
+        try:
+            for done, future in enumerate(asyncio.as_completed(futures), 1):
+                batch_matches, batch_searched, batch_binary = await future
+                matches.extend(batch_matches)
+                searched += batch_searched
+                binary.extend(batch_binary)
+                if ctx is not None:
+                    await ctx.report_progress(done, len(futures), _grep_progress_message(batch_matches))
+                if len(matches) >= max_matches:
+                    break
+        finally:
+            for future in futures:
+                future.cancel()
+                
+        return json.dumps({
+            'matches': matches[:max_matches],
+            'files_searched': searched,
+            'binary_skipped': len(binary),
+            'truncated': len(matches) >= max_matches
+        })
+    except Exception as e:
+        return f"Error searching file contents: {str(e)}"
+
+def _index_status(root):
+    """Blocking part of index_status; returns the status dict."""
+    key = _index_key(root)
+    low, high = _key_range(key)
+    conn = _open_index()
+    try:
+        row = conn.execute("SELECT built_at, refreshed_at FROM roots WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return {"root": root, "indexed": False}
+        entries = conn.execute(
+            "SELECT COUNT(*) FROM entries WHERE key >= ? AND key < ?", (low, high)).fetchone()[0]
+        dirs = conn.execute(
+            "SELECT path, mtime_ns FROM dirs WHERE key = ? OR (key >= ? AND key < ?)",
+            (key, low, high)).fetchall()
+    finally:
+        conn.close()
+        
+    # Directories whose mtime moved on since they were last scanned
+    stale = 0
+    for dir_path, mtime_ns in dirs:
+        try:
+            if os.stat(dir_path).st_mtime_ns != mtime_ns:
+                stale += 1
+        except OSError:
+            stale += 1
+            
+    return {
+        "root": root,
+        "indexed": True,
+        "entries": entries,
+        "directories": len(dirs),
+        "stale_directories": stale,
+        "built_at": datetime.datetime.fromtimestamp(row[0]).isoformat(),
+        "refreshed_at": datetime.datetime.fromtimestamp(row[1]).isoformat()
+    }
+
+@mcp.tool()
+async def index_status(path: str) -> str:
+    """Report how fresh the metadata index is for the allowed root containing a path.
+    
+    Args:
+        path: Any path inside an allowed directory
+    """
+    try:
+        if not await run_blocking('index_status', is_path_allowed, path):
+            return f"Error: Access to path '{path}' is not allowed."
+            
+        return json.dumps(await run_blocking('index_status', _index_status, _index_root_for(path)))
+    except Exception as e:
+        return f"Error getting index status: {str(e)}"
+
+def _rebuild_index(root, cancel=None):
+    """Blocking part of rebuild_index; returns the number of indexed entries."""
+    conn = _open_index()
+    try:
+        _index_drop_subtree(conn, _index_key(root))
+        # Changes since the previous index are lost, so change-feed cursors must start over
+        conn.execute("INSERT INTO changes (key, path, kind, is_dir) VALUES (?, ?, 'reset', 1)",
+                     (_index_key(root), root))
+        refresh_index(conn, root, cancel)
+        _update_root(conn, root, rebuilt=True)
+        low, high = _key_range(_index_key(root))
+        return conn.execute(
+            "SELECT COUNT(*) FROM entries WHERE key >= ? AND key < ?", (low, high)).fetchone()[0]
+    finally:
+        conn.close()
+
+@mcp.tool()
+async def rebuild_index(path: str) -> str:
+    """Drop and rebuild the metadata index for the allowed root containing a path.
+    
+    Args:
+        path: Any path inside an allowed directory
+    """
+    try:
+        if not await run_blocking('rebuild_index', is_path_allowed, path):
+            return f"Error: Access to path '{path}' is not allowed."
+            
+        root = _index_root_for(path)
+        start = time.perf_counter()
+        entries = await run_blocking('rebuild_index', _rebuild_index, root, cancellable=True)
+            
+        return json.dumps({
+            "root": root,
+            "entries": entries,
+            "elapsed_seconds": round(time.perf_counter() - start, 3)
+        })
+    except Exception as e:
+        return f"Error rebuilding index: {str(e)}"
+
+# Change feed settings for changes_since
+CHANGE_LOG_MAX_ROWS = 200000
+CHANGES_MAX_RESULTS = 1000
+
+# inotify constants (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE
+              | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR | IN_DONT_FOLLOW)
+INOTIFY_EVENT = struct.Struct('iIII')
+
+class TreeWatcher:
+    """Track which directories and files under a root changed, via Linux inotify.
+
+    Events only mark paths as dirty; changes_since re-lists dirty directories
+    and re-stats dirty files against the index, so the log stays the single
+    source of truth. Directory moves and queue overflows mark the watcher as
+    stale, after which the caller does one full rescan and starts a new watcher.
+    """
+    
+    def __init__(self, root):
+        self.root = root
+        self.lock = threading.Lock()
+        self.dirty_dirs = set()
+        self.dirty_files = set()
+        self.stale = False
+        self.closed = False
+        self.watches = {}
+        self.libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+        try:
+            self.add_tree(root)
+        except OSError:
+            os.close(self.fd)
+            raise
+        threading.Thread(target=self._run, name='fs-watch', daemon=True).start()
+        
+    def add_tree(self, path):
+        """Watch ``path`` and every directory below it (symlinks are not followed)."""
+        self._add_watch(path)
+        for entry, _ in walk_entries(path):
+            if entry.is_dir(follow_symlinks=False):
+                self._add_watch(entry.path)
+                
+    def _add_watch(self, path):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            # A directory that vanished before it could be watched is already reported by its parent
+            if error in (errno.ENOENT, errno.ENOTDIR):
+                return
+            raise OSError(error, os.strerror(error), path)
+        self.watches[wd] = path
+        
+    def take(self):
+        """Return and clear the ``(dirty_dirs, dirty_files)`` sets."""
+        with self.lock:
+            dirty = self.dirty_dirs, self.dirty_files
+            self.dirty_dirs, self.dirty_files = set(), set()
+            return dirty
+            
+    def close(self):
+        self.closed = True
+        
+    def _run(self):
+        try:
+            while not self.closed:
+                ready, _, _ = select.select([self.fd], [], [], 1.0)
+                if ready:
+                    self._handle(os.read(self.fd, 64 * 1024))
+        except OSError:
+            with self.lock:
+                self.stale = True
+        finally:
+            os.close(self.fd)
+            
+    def _handle(self, data):
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, name_len = INOTIFY_EVENT.unpack_from(data, offset)
+            name = data[offset + INOTIFY_EVENT.size:offset + INOTIFY_EVENT.size + name_len]
+            offset += INOTIFY_EVENT.size + name_len
+            name = os.fsdecode(name.rstrip(b'\0'))
+            
+            if mask & IN_Q_OVERFLOW or mask & IN_MOVE_SELF or (mask & IN_MOVED_FROM and mask & IN_ISDIR):
+                # Watch paths can no longer be trusted
+                with self.lock:
+                    self.stale = True
+                continue
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+            dir_path = self.watches.get(wd)
+            if dir_path is None or not name:
+                continue
+            path = os.path.join(dir_path, name)
+            if mask & (IN_CREATE | IN_MOVED_TO) and mask & IN_ISDIR:
+                try:
+                    self.add_tree(path)
+                except OSError:
+                    with self.lock:
+                        self.stale = True
+            with self.lock:
+                if mask & (IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO):
+                    self.dirty_dirs.add(dir_path)
+                else:
+                    self.dirty_files.add(path)
+
+# After inotify fails for a root, poll for this long before trying again,
+# doubling up to the maximum while it keeps failing
+WATCH_RETRY_SECONDS = 60
+WATCH_RETRY_MAX_SECONDS = 3600
+_watchers = {}
+_watch_failures = {}
+_watchers_lock = threading.Lock()
+
+def _watcher_for(root):
+    """Return ``(watcher, fresh)`` for an allowed root, or ``(None, False)`` to poll.
+
+    A fresh watcher has only just started, so the caller must do one full
+    rescan to pick up anything that changed while nobody was watching. A
+    root whose watcher could not be set up is polled until its retry time,
+    so each call does not walk the whole tree adding watches only to fail.
+    """
+    if not sys.platform.startswith('linux'):
+        return None, False
+    with _watchers_lock:
+        watcher = _watchers.get(root)
+        if watcher is not None and not watcher.stale:
+            return watcher, False
+        if watcher is not None:
+            watcher.close()
+            del _watchers[root]
+        failure = _watch_failures.get(root)
+        if failure is not None and time.monotonic() < failure[0]:
+            return None, False
+        try:
+            watcher = TreeWatcher(root)
+        except OSError as e:
+            # e.g. ENOSPC when fs.inotify.max_user_watches is too low for the tree
+            delay = WATCH_RETRY_SECONDS if failure is None else min(failure[1] * 2, WATCH_RETRY_MAX_SECONDS)
+            _watch_failures[root] = (time.monotonic() + delay, delay)
+            print(f"Warning: inotify unavailable for {root} ({e}). Polling; retrying in {delay} s.",
+                  file=sys.stderr)
+            return None, False
+        _watch_failures.pop(root, None)
+        _watchers[root] = watcher
+        return watcher, True
+
+def _index_restat(conn, path):
+    """Re-stat one indexed file and log it as modified if its size or mtime moved.
+
+    Files that appeared or disappeared are left to the scan of their parent
+    directory, which the watcher marks dirty for those events.
+    """
+    key = os.path.normcase(path)
+    row = conn.execute("SELECT is_dir, size, mtime_ns FROM entries WHERE key = ?", (key,)).fetchone()
+    if row is None or row[0]:
+        return
+    try:
+        stat_info = os.lstat(path)
+    except OSError:
+        return
+    if (row[1], row[2]) != (stat_info.st_size, stat_info.st_mtime_ns):
+        conn.execute("UPDATE entries SET size = ?, mtime_ns = ? WHERE key = ?",
+                     (stat_info.st_size, stat_info.st_mtime_ns, key))
+        conn.execute("INSERT INTO changes (key, path, kind, is_dir) VALUES (?, ?, 'modified', 0)",
+                     (key, path))
+
+def _collapse_changes(rows):
+    """Merge the logged events for each path into one net change, in log order."""
+    net = OrderedDict()
+    for key, path, kind, is_dir in rows:
+        previous = net.pop(key, None)
+        if previous is not None:
+            first = previous[1]
+            if first == 'created' and kind == 'deleted':
+                continue
+            if first == 'created':
+                kind = 'created'
+            elif first == 'deleted' and kind == 'created':
+                kind = 'modified'
+        net[key] = (path, kind, is_dir)
+    return [{"path": path, "type": "directory" if is_dir else "file", "change": kind}
+            for path, kind, is_dir in net.values()]
+
+def _changes_since(path, cursor, max_changes, cancel=None):
+    """Blocking part of changes_since; returns the response dict."""
+    root = _index_root_for(path)
+    path = os.path.abspath(path)
+    watcher, fresh = _watcher_for(root)
+    conn = _open_index()
+    try:
+        if watcher is None:
+            refresh_index(conn, path, cancel, rescan='all')
+        elif fresh:
+            watcher.take()
+            refresh_index(conn, root, cancel, rescan='all')
+        else:
+            dirty_dirs, dirty_files = watcher.take()
+            for dir_path in sorted(dirty_dirs, key=lambda d: d.count(os.sep)):
+                if conn.execute("SELECT 1 FROM dirs WHERE key = ?", (os.path.normcase(dir_path),)).fetchone():
+                    refresh_index(conn, dir_path, cancel, rescan='new')
+            for file_path in dirty_files:
+                _index_restat(conn, file_path)
+            conn.commit()
+        _update_root(conn, root)
+        
+        # Keep the log bounded; cursors older than what is kept get a reset
+        conn.execute("DELETE FROM changes WHERE seq <= (SELECT MAX(seq) FROM changes) - ?",
+                     (CHANGE_LOG_MAX_ROWS,))
+        conn.commit()
+        latest = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+        result = {"path": path, "mode": "polling" if watcher is None else "inotify"}
+        if cursor is None:
+            return {**result, "cursor": str(latest), "changes": [], "baseline": True}
+            
+        since = int(cursor)
+        oldest = conn.execute("SELECT MIN(seq) FROM changes").fetchone()[0]
+        key = _index_key(path)
+        root_key = _index_key(root)
+        reset = (oldest is not None and oldest > since + 1) or conn.execute(
+            "SELECT 1 FROM changes WHERE seq > ? AND kind = 'reset' AND key = ?",
+            (since, root_key)).fetchone() is not None
+        if reset:
+            return {**result, "cursor": str(latest), "changes": [], "reset": True}
+            
+        low, high = _key_range(key)
+        rows = conn.execute(
+            "SELECT seq, key, path, kind, is_dir FROM changes WHERE seq > ? AND kind != 'reset'"
+            " AND key >= ? AND key < ? ORDER BY seq LIMIT ?",
+            (since, low, high, max_changes + 1)).fetchall()
+    finally:
+        conn.close()
+        
+    truncated = len(rows) > max_changes
+    rows = rows[:max_changes]
+    matcher = allowed_matcher()
+    resolved_dirs = {}
+    changes = [change for change in _collapse_changes(row[1:] for row in rows)
+               if is_path_allowed(change["path"], matcher, resolved_dirs)]
+    return {**result, "cursor": str(rows[-1][0] if truncated else latest), "changes": changes,
+            "truncated": truncated}
+
+@mcp.tool()
+async def changes_since(path: str, cursor: Optional[str] = None,
+                        max_changes: int = CHANGES_MAX_RESULTS) -> str:
+    """List files and directories created, modified or deleted under a path since a cursor.
+    
+    Call without a cursor to get a starting cursor, then pass the returned
+    cursor back on the next call. On Linux inotify marks what changed, so a
+    call only re-reads the directories and files that were touched; elsewhere
+    (or if inotify is unavailable) the subtree is re-scanned. A result with
+    "reset": true means changes were lost and the caller should re-list.
+    
+    Args:
+        path: Directory to watch (inside an allowed directory)
+        cursor: Cursor returned by a previous call
+        max_changes: Maximum changes per call; "truncated" results continue from the returned cursor
+    """
+    try:
+        if not await run_blocking('changes_since', is_path_allowed, path):
+            return f"Error: Access to path '{path}' is not allowed."
+            
+        if not os.path.isdir(path):
+            return f"Error: Path {path} is not a directory"
+            
+        return json.dumps(await run_blocking('changes_since', _changes_since, path, cursor,
+                                             max_changes, cancellable=True))
+    except Exception as e:
+        return f"Error reading changes: {str(e)}"
+
+def _file_info(path):
+    """Blocking part of get_file_info; returns the tool's response string."""
+    try:
+        stat_info = os.stat(path)
+    except FileNotFoundError:
+        return f"Error: Path {path} does not exist"
+    
+    info = {
+        "path": path,
+        "size": stat_info.st_size,
+        "created": datetime.datetime.fromtimestamp(stat_info.st_ctime).isoformat(),
+        "modified": datetime.datetime.fromtimestamp(stat_info.st_mtime).isoformat(),
+        "accessed": datetime.datetime.fromtimestamp(stat_info.st_atime).isoformat(),
+        "type": "directory" if stat.S_ISDIR(stat_info.st_mode) else "file",
+        "permissions": oct(stat_info.st_mode)[-3:]
+    }
+    
+    return json.dumps(info)
+
+# Fields get_files_info can return; "realpath" costs extra syscalls so is opt-in
+FILE_INFO_FIELDS = ["size", "created", "modified", "accessed", "type", "permissions",
+                    "is_symlink", "target", "realpath"]
+DEFAULT_FILE_INFO_FIELDS = [field for field in FILE_INFO_FIELDS if field != "realpath"]
+FILES_INFO_BATCH = 64
+
+def _entry_type(mode):
+    """Name the file type encoded in an ``st_mode``."""
+    if stat.S_ISDIR(mode):
+        return "directory"
+    if stat.S_ISREG(mode):
+        return "file"
+    if stat.S_ISLNK(mode):
+        return "symlink"
+    return "other"
+
+def _lstat_info(path, fields):
+    """Describe one path from a single ``lstat``, keeping only ``fields``."""
+    try:
+        stat_info = os.lstat(path)
+    except OSError as e:
+        return {"path": path, "error": e.strerror or str(e)}
+    is_symlink = stat.S_ISLNK(stat_info.st_mode)
+    info = {"path": path}
+    for field in fields:
+        if field == "size":
+            info["size"] = stat_info.st_size
+        elif field == "created":
+            info["created"] = datetime.datetime.fromtimestamp(stat_info.st_ctime).isoformat()
+        elif field == "modified":
+            info["modified"] = datetime.datetime.fromtimestamp(stat_info.st_mtime).isoformat()
+        elif field == "accessed":
+            info["accessed"] = datetime.datetime.fromtimestamp(stat_info.st_atime).isoformat()
+        elif field == "type":
+            info["type"] = _entry_type(stat_info.st_mode)
+        elif field == "permissions":
+            info["permissions"] = oct(stat_info.st_mode)[-3:]
+        elif field == "is_symlink":
+            info["is_symlink"] = is_symlink
+        elif field in ("target", "realpath"):
+            # A link that cannot be read only fails its own entry, not the batch
+            try:
+                if field == "realpath":
+                    info["realpath"] = os.path.realpath(path)
+                elif is_symlink:
+                    info["target"] = os.readlink(path)
+            except OSError as e:
+                info[field] = None
+                info["error"] = e.strerror or str(e)
+    return info
+
+def _lstat_batch(paths, fields, matcher):
+    """Check and stat a batch of paths on one worker thread."""
+    resolved_dirs = {}
+    return [_lstat_info(path, fields) if is_path_allowed(path, matcher, resolved_dirs)
+            else {"path": path, "error": "Access to path is not allowed"} for path in paths]
+
+@mcp.tool()
+async def get_file_info(path: str) -> str:
+    """Get detailed file/directory metadata.
+    
+    Args:
+        path: Path to file or directory
+    """
+    try:
+        if not await run_blocking('get_file_info', is_path_allowed, path):
+            return f"Error: Access to path '{path}' is not allowed."
+            
+        return await run_blocking('get_file_info', _file_info, path)
+    except Exception as e:
+        return f"Error getting file info: {str(e)}"
+
+@mcp.tool()
+async def get_files_info(paths: List[str], fields: Optional[List[str]] = None) -> str:
+    """Get metadata for many paths in one call.
+    
+    Each path costs a single lstat, so symlinks are reported as such rather
+    than followed; stats run in parallel and results keep the input order.
+    
+    Args:
+        paths: List of paths to describe
+        fields: Fields to include (size, created, modified, accessed, type, permissions,
+            is_symlink, target, realpath); defaults to all but realpath
+    """
+    try:
+        fields = DEFAULT_FILE_INFO_FIELDS if fields is None else fields
+        unknown = [field for field in fields if field not in FILE_INFO_FIELDS]
+        if unknown:
+            return f"Error: Unknown fields {unknown}. Valid fields: {FILE_INFO_FIELDS}"
             
+        matcher = allowed_matcher()
+        batches = await asyncio.gather(*(
+            run_blocking('get_files_info', _lstat_batch, paths[i:i + FILES_INFO_BATCH], fields, matcher)
+            for i in range(0, len(paths), FILES_INFO_BATCH)))
+        return json.dumps([info for batch in batches for info in batch])
+    except Exception as e:
+        return f"Error getting file info: {str(e)}"
+
+# Persistent per-file hash cache used by hash_files and tree_digest
+HASH_CACHE_PATH = os.path.join(os.environ['APPDATA'], 'Claude', 'fs_hash_cache.sqlite3')
+HASH_CACHE_MAX_ENTRIES = 200000
+HASH_ALGORITHMS = ('sha256', 'sha1', 'md5', 'blake2b')
+HASH_CHUNK_BYTES = 1024 * 1024
+HASH_BATCH_FILES = 32
+HASH_BATCH_BYTES = 64 * 1024 * 1024
+
+def _open_hash_cache():
+    """Open the hash cache database, creating its schema on first use."""
+    os.makedirs(os.path.dirname(HASH_CACHE_PATH), exist_ok=True)
+    conn = sqlite3.connect(HASH_CACHE_PATH, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS hashes (
+            dev INTEGER NOT NULL, ino INTEGER NOT NULL, size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL, algorithm TEXT NOT NULL, digest TEXT NOT NULL,
+            used_at REAL NOT NULL,
+            PRIMARY KEY (dev, ino, size, mtime_ns, algorithm)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS hashes_used ON hashes(used_at);
+    """)
+    return conn
+
+def _stat_key(path, stat_info=None):
+    """Return the (device, inode, size, mtime_ns) cache key for a file.
+
+    ``DirEntry.stat`` leaves the inode and device at zero on Windows, so
+    those entries are stat'ed again by path.
+    """
+    if stat_info is None or not stat_info.st_ino:
         stat_info = os.stat(path)
+    return (stat_info.st_dev, stat_info.st_ino, stat_info.st_size, stat_info.st_mtime_ns)
+
+def _cache_lookup(keys, algorithm):
+    """Return cached digests for ``keys`` and mark them as recently used."""
+    found = {}
+    conn = _open_hash_cache()
+    try:
+        for key in keys:
+            row = conn.execute(
+                "SELECT digest FROM hashes WHERE dev = ? AND ino = ? AND size = ? AND mtime_ns = ?"
+                " AND algorithm = ?", (*key, algorithm)).fetchone()
+            if row is not None:
+                found[key] = row[0]
+        if found:
+            now = time.time()
+            conn.executemany(
+                "UPDATE hashes SET used_at = ? WHERE dev = ? AND ino = ? AND size = ?"
+                " AND mtime_ns = ? AND algorithm = ?",
+                [(now, *key, algorithm) for key in found])
+            conn.commit()
+    finally:
+        conn.close()
+    return found
+
+def _cache_store(digests, algorithm):
+    """Record new digests, evicting the least recently used beyond the size cap."""
+    if not digests:
+        return
+    now = time.time()
+    conn = _open_hash_cache()
+    try:
+        conn.executemany("INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         [(*key, algorithm, digest, now) for key, digest in digests.items()])
+        excess = conn.execute("SELECT COUNT(*) FROM hashes").fetchone()[0] - HASH_CACHE_MAX_ENTRIES
+        if excess > 0:
+            conn.execute("DELETE FROM hashes WHERE (dev, ino, size, mtime_ns, algorithm) IN ("
+                         "SELECT dev, ino, size, mtime_ns, algorithm FROM hashes"
+                         " ORDER BY used_at LIMIT ?)", (excess,))
+        conn.commit()
+    finally:
+        conn.close()
+
+def _hash_file(path, algorithm, cancel=None):
+    """Hash a file in fixed-size chunks without holding it in memory."""
+    hasher = hashlib.new(algorithm)
+    buffer = bytearray(HASH_CHUNK_BYTES)
+    view = memoryview(buffer)
+    with open(path, 'rb', buffering=0) as f:
+        while True:
+            check_cancelled(cancel)
+            n = f.readinto(buffer)
+            if not n:
+                break
+            hasher.update(view[:n])
+    return hasher.hexdigest()
+
+def _hash_batch(items, algorithm, cancel=None):
+    """Hash a batch of ``(path, key)`` pairs on one worker thread."""
+    results = []
+    for path, key in items:
+        try:
+            digest = _hash_file(path, algorithm, cancel)
+            # A file modified while it was read must not be cached under its old key
+            results.append((digest, _stat_key(path) == key, None))
+        except OSError as e:
+            results.append((None, False, e.strerror or str(e)))
+    return results
+
+async def hash_stat_keyed(files, algorithm):
+    """Hash ``(path, key)`` pairs, reading only files missing from the cache.
+
+    Returns a dict mapping each path to ``(digest, cached, error)`` and the
+    number of bytes that had to be read.
+    """
+    cached = await run_blocking('hash_files', _cache_lookup, {key for _, key in files}, algorithm)
+    results = {}
+    pending = []
+    for path, key in files:
+        if key in cached:
+            results[path] = (cached[key], True, None)
+        else:
+            pending.append((path, key))
+            
+    batches = size_batches(pending, lambda item: item[1][2], HASH_BATCH_FILES, HASH_BATCH_BYTES)
+    hashed = await asyncio.gather(*(
+        run_blocking('hash_files', _hash_batch, batch, algorithm, cancellable=True)
+        for batch in batches))
+        
+    fresh = {}
+    bytes_hashed = 0
+    for batch, batch_results in zip(batches, hashed):
+        for (path, key), (digest, stable, error) in zip(batch, batch_results):
+            results[path] = (digest, False, error)
+            if digest is not None:
+                bytes_hashed += key[2]
+                if stable:
+                    fresh[key] = digest
+    await run_blocking('hash_files', _cache_store, fresh, algorithm)
+    return results, bytes_hashed
+
+def _stat_keys(paths, matcher):
+    """Check and stat files for hash_files, returning ``(path, key_or_error)`` pairs."""
+    keyed = []
+    resolved_dirs = {}
+    for path in paths:
+        if not is_path_allowed(path, matcher, resolved_dirs):
+            keyed.append((path, "Access to path is not allowed"))
+            continue
+        try:
+            stat_info = os.stat(path)
+            if not stat.S_ISREG(stat_info.st_mode):
+                keyed.append((path, "Not a regular file"))
+            else:
+                keyed.append((path, _stat_key(path, stat_info)))
+        except OSError as e:
+            keyed.append((path, e.strerror or str(e)))
+    return keyed
+
+@mcp.tool()
+async def hash_files(paths: List[str], algorithm: str = 'sha256') -> str:
+    """Compute content hashes for a list of files.
+    
+    Files are hashed in parallel and streamed in chunks. Hashes are cached on
+    disk keyed by device, inode, size and mtime, so unchanged files are not
+    read again, even after a server restart.
+    
+    Args:
+        paths: List of file paths to hash
+        algorithm: Hash algorithm (sha256, sha1, md5 or blake2b)
+    """
+    try:
+        if algorithm not in HASH_ALGORITHMS:
+            return f"Error: Unsupported algorithm '{algorithm}'. Valid algorithms: {list(HASH_ALGORITHMS)}"
+            
+        keyed = await run_blocking('hash_files', _stat_keys, paths, allowed_matcher())
+        digests, _ = await hash_stat_keyed(
+            [(path, key) for path, key in keyed if isinstance(key, tuple)], algorithm)
+        keys = dict(keyed)
         
-        info = {
+        results = []
+        for path in paths:
+            if not isinstance(keys[path], tuple):
+                results.append({"path": path, "error": keys[path]})
+            else:
+                digest, cached, error = digests[path]
+                if error is not None:
+                    results.append({"path": path, "error": error})
+                else:
+                    results.append({"path": path, "hash": digest, "size": keys[path][2],
+                                    "cached": cached})
+        return json.dumps(results)
+    except Exception as e:
+        return f"Error hashing files: {str(e)}"
+
+def _collect_tree(path, excludes, cancel=None):
+    """Walk ``path`` for tree_digest, gathering directories, files and symlinks."""
+    dirs = [path]
+    files = []
+    links = {}
+    errors = []
+    for entry, _ in walk_entries(path, excludes, cancel=cancel):
+        try:
+            if entry.is_symlink():
+                links[entry.path] = os.readlink(entry.path)
+            elif entry.is_dir(follow_symlinks=False):
+                dirs.append(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                files.append((entry.path, _stat_key(entry.path, entry.stat(follow_symlinks=False))))
+        except OSError as e:
+            errors.append({"path": entry.path, "error": e.strerror or str(e)})
+    return dirs, files, links, errors
+
+def _merkle_digests(root, dirs, file_digests, links, algorithm):
+    """Fold file digests into one digest per directory, deepest first.
+
+    A directory's digest is the hash of its sorted children, one
+    ``"<kind> <digest> <name>"`` line each, so any change below a directory
+    changes the digest of every directory above it.
+    """
+    children = {dir_path: [] for dir_path in dirs}
+    for child, digest in file_digests.items():
+        children[os.path.dirname(child)].append(('file', digest, os.path.basename(child)))
+    for child, target in links.items():
+        digest = hashlib.new(algorithm, target.encode('utf-8', 'surrogateescape')).hexdigest()
+        children[os.path.dirname(child)].append(('link', digest, os.path.basename(child)))
+        
+    digests = {}
+    for dir_path in sorted(dirs, key=lambda d: d.count(os.sep), reverse=True):
+        hasher = hashlib.new(algorithm)
+        for kind, digest, name in sorted(children[dir_path], key=lambda child: child[2]):
+            hasher.update(f"{kind} {digest} {name}\n".encode('utf-8', 'surrogateescape'))
+        digests[dir_path] = hasher.hexdigest()
+        if dir_path != root:
+            children[os.path.dirname(dir_path)].append(
+                ('dir', digests[dir_path], os.path.basename(dir_path)))
+    return digests
+
+@mcp.tool()
+async def tree_digest(path: str, exclude_patterns: Optional[List[str]] = None,
+                      algorithm: str = 'sha256', include_files: bool = False,
+                      max_bytes: Optional[int] = None, max_entries: Optional[int] = None,
+                      continuation: Optional[str] = None) -> str:
+    """Compute a Merkle-style digest for a directory tree.
+    
+    Every directory gets a digest covering the names and contents of
+    everything below it, so comparing digests between calls shows which
+    subtrees changed. File hashes come from the same cache as hash_files;
+    only new or modified files are read.
+    
+    The per-directory (and per-file) digests are cut to the response budget;
+    pass "continuation" back to get the next page. The root digest is in
+    every page.
+    
+    Args:
+        path: Directory to digest
+        exclude_patterns: Patterns to exclude; matching directories are not descended into
+        algorithm: Hash algorithm (sha256, sha1, md5 or blake2b)
+        include_files: Also return the digest of every file
+        max_bytes: Maximum size of the digests returned by this call
+        max_entries: Maximum number of digests returned by this call
+        continuation: Token from a previous call to get the next page of digests
+    """
+    try:
+        if not await run_blocking('tree_digest', is_path_allowed, path):
+            return f"Error: Access to path '{path}' is not allowed."
+            
+        if not os.path.isdir(path):
+            return f"Error: Path {path} is not a directory"
+            
+        if algorithm not in HASH_ALGORITHMS:
+            return f"Error: Unsupported algorithm '{algorithm}'. Valid algorithms: {list(HASH_ALGORITHMS)}"
+            
+        budget_bytes, budget_entries = response_budget(max_bytes, max_entries)
+        offset = decode_continuation(continuation)
+        start = time.perf_counter()
+        root = os.path.normpath(path)
+        dirs, files, links, errors = await run_blocking(
+            'tree_digest', _collect_tree, root, compile_excludes(exclude_patterns), cancellable=True)
+        results, bytes_hashed = await hash_stat_keyed(files, algorithm)
+        
+        file_digests = {}
+        cache_hits = 0
+        for file_path, (digest, cached, error) in results.items():
+            if error is not None:
+                errors.append({"path": file_path, "error": error})
+            else:
+                file_digests[file_path] = digest
+                cache_hits += cached
+        dir_digests = await run_blocking('tree_digest', _merkle_digests, root, dirs, file_digests,
+                                         links, algorithm)
+                                         
+        relative = lambda p: os.path.relpath(p, root).replace(os.sep, '/')
+        # Directories first, then files, in a stable order so pages line up between calls
+        rows = [("directories", relative(d), digest) for d, digest in sorted(dir_digests.items())]
+        if include_files:
+            rows.extend(("files", relative(f), digest) for f, digest in sorted(file_digests.items()))
+        page = rows[offset:]
+        count = take_within_budget([row[1:] for row in page], budget_bytes, budget_entries)
+        next_offset = offset + count if count < len(page) else None
+        result = {
             "path": path,
-            "size": stat_info.st_size,
-            "created": datetime.datetime.fromtimestamp(stat_info.st_ctime).isoformat(),
-            "modified": datetime.datetime.fromtimestamp(stat_info.st_mtime).isoformat(),
-            "accessed": datetime.datetime.fromtimestamp(stat_info.st_atime).isoformat(),
-            "type": "directory" if os.path.isdir(path) else "file",
-            "permissions": oct(stat_info.st_mode)[-3:]
+            "algorithm": algorithm,
+            "digest": dir_digests[root],
+            "directories": {},
+            "files_total": len(file_digests),
+            "cache_hits": cache_hits,
+            "bytes_hashed": bytes_hashed,
+            "elapsed_seconds": round(time.perf_counter() - start, 3),
+            "errors": errors
         }
+        if include_files:
+            result["files"] = {}
+        for kind, name, digest in page[:count]:
+            result[kind][name] = digest
+        result.update(budget_info(len(rows), next_offset))
+        return json.dumps(result)
+    except Exception as e:
+        return f"Error computing tree digest: {str(e)}"
+
+# Parallel tree walks used by disk_usage and find_duplicates
+WALK_SPLIT_MAX_LEVELS = 3
+WALK_SPLIT_MIN_SUBTREES = 16
+WALK_MAX_TASKS = 64
+USAGE_DEFAULT_DEPTH = 2
+DUPLICATE_EDGE_BYTES = 64 * 1024
+DUPLICATE_BATCH_FILES = 256
+DUPLICATE_ROUND_BYTES = 256 * 1024 * 1024
+
+def _split_walk(root, excludes, visit, cancel=None):
+    """List ``root`` level by level until it fans out into enough subtrees.
+
+    Returns the visitor's result for the entries listed so far and the
+    directories below them that still have to be walked.
+    """
+    listed = []
+    frontier = [root]
+    for _ in range(WALK_SPLIT_MAX_LEVELS):
+        subdirs = []
+        for dir_path in frontier:
+            for entry, _ in walk_entries(dir_path, excludes, max_depth=1, cancel=cancel):
+                listed.append(entry)
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                except OSError:
+                    pass
+        frontier = subdirs
+        if len(frontier) >= WALK_SPLIT_MIN_SUBTREES:
+            break
+    return visit(listed), frontier
+
+def _walk_subtrees(dirs, excludes, visit, cancel=None):
+    """Walk a group of subtrees on one worker, feeding every entry to ``visit``."""
+    return visit(entry for dir_path in dirs
+                 for entry, _ in walk_entries(dir_path, excludes, cancel=cancel))
+
+async def walk_in_parallel(tool, root, excludes, visit, timeout=None, report=None):
+    """Walk ``root`` with its subtrees spread over the shared worker pool.
+
+    ``visit`` turns an iterable of ``DirEntry`` objects into a partial result;
+    ``report(partial, done, total)`` is awaited as each group of subtrees
+    finishes. Returns the partial results and the directories that were not
+    walked because ``timeout`` ran out.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    first, subtrees = await run_blocking(tool, _split_walk, root, excludes, visit, cancellable=True)
+    partials = [first]
+    groups = [subtrees[i::WALK_MAX_TASKS] for i in range(min(len(subtrees), WALK_MAX_TASKS))]
+    tasks = {
+        asyncio.ensure_future(run_blocking(tool, _walk_subtrees, group, excludes, visit,
+                                           cancellable=True)): group
+        for group in groups
+    }
+    pending = set(tasks)
+    unfinished = []
+    if report is not None:
+        await report(first, 0, len(groups))
+    try:
+        while pending:
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            done, pending = await asyncio.wait(pending, timeout=remaining,
+                                               return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                break
+            for task in done:
+                partials.append(task.result())
+                if report is not None:
+                    await report(partials[-1], len(partials) - 1, len(groups))
+    finally:
+        for task in pending:
+            task.cancel()
+            unfinished.extend(tasks[task])
+    return partials, sorted(unfinished)
+
+if hasattr(os.stat_result, 'st_blocks'):
+    _allocated_bytes = lambda stat_info: stat_info.st_blocks * 512
+else:
+    _allocated_bytes = lambda stat_info: stat_info.st_size
+
+def _usage_visit(entries, matcher):
+    """Sum sizes per containing directory: ``{dir: [bytes, allocated, files, dirs]}``.
+
+    Files with several hard links are left out of the sums and returned
+    separately by inode, so the caller can count each of them once.
+    """
+    usage = {}
+    links = {}
+    for entry in entries:
+        try:
+            stat_info = entry.stat(follow_symlinks=False)
+        except OSError:
+            continue
+        # Nothing is followed, so only symlinks can lead outside the checked root
+        if stat.S_ISLNK(stat_info.st_mode) and not is_path_allowed(entry.path, matcher):
+            continue
+        parent = entry.path[:-len(entry.name) - 1]
+        totals = usage.get(parent)
+        if totals is None:
+            totals = usage[parent] = [0, 0, 0, 0]
+        if stat.S_ISDIR(stat_info.st_mode):
+            totals[3] += 1
+        elif stat_info.st_nlink > 1 and stat_info.st_ino:
+            links.setdefault((stat_info.st_dev, stat_info.st_ino),
+                             (parent, stat_info.st_size, _allocated_bytes(stat_info)))
+        else:
+            totals[0] += stat_info.st_size
+            totals[1] += _allocated_bytes(stat_info)
+            totals[2] += 1
+    return usage, links
+
+def _roll_up_usage(root, partials, depth):
+    """Add each directory's own totals to its ancestors up to ``depth`` below ``root``."""
+    usages = [usage for usage, _ in partials]
+    links = {}
+    for _, partial_links in partials:
+        for inode, counted in partial_links.items():
+            links.setdefault(inode, counted)
+    for parent, size, allocated in links.values():
+        usages.append({parent: [size, allocated, 1, 0]})
         
-        return json.dumps(info)
+    rolled = {}
+    # A filesystem or drive root ('/', 'C:\\') is the one path that ends in a separator
+    root_key = root.rstrip(os.sep)
+    prefix = len(root_key) + 1
+    for usage in usages:
+        for dir_path, totals in usage.items():
+            parts = [] if dir_path.rstrip(os.sep) == root_key else dir_path[prefix:].split(os.sep)
+            for level in range(min(len(parts), depth) + 1):
+                key = '/'.join(parts[:level]) or '.'
+                summed = rolled.get(key)
+                if summed is None:
+                    rolled[key] = list(totals)
+                else:
+                    for i, value in enumerate(totals):
+                        summed[i] += value
+    return rolled
+
+def _usage_row(path, totals):
+    return {"path": path, "bytes": totals[0], "allocated_bytes": totals[1],
+            "files": totals[2], "directories": totals[3]}
+
+@mcp.tool()
+async def disk_usage(path: str, depth: int = USAGE_DEFAULT_DEPTH,
+                     exclude_patterns: Optional[List[str]] = None,
+                     timeout: Optional[float] = None, max_bytes: Optional[int] = None,
+                     max_entries: Optional[int] = None, continuation: Optional[str] = None,
+                     ctx: Context = None) -> str:
+    """Summarize how much space a directory tree uses, per subdirectory.
+    
+    Subtrees are walked in parallel and each directory down to ``depth`` is
+    listed with the totals of everything below it, largest first. Symlinks
+    are counted but not followed, and a file with several hard links is
+    counted once. Progress notifications carry the running total (hard-linked
+    files are added at the end). If ``timeout`` runs out, the totals cover
+    what was walked and "unfinished" lists the directories that were skipped.
+    
+    Args:
+        path: Directory to summarize
+        depth: How many levels of subdirectories to report (0 = total only)
+        exclude_patterns: Patterns to exclude; matching directories are not descended into
+        timeout: Seconds to walk before returning partial totals
+        max_bytes: Maximum size of the directory list returned by this call
+        max_entries: Maximum number of directories returned by this call
+        continuation: Token from a previous call to get the next page of directories
+    """
+    try:
+        if not await run_blocking('disk_usage', is_path_allowed, path):
+            return f"Error: Access to path '{path}' is not allowed."
+            
+        if not os.path.isdir(path):
+            return f"Error: Path {path} is not a directory"
+            
+        budget_bytes, budget_entries = response_budget(max_bytes, max_entries)
+        offset = decode_continuation(continuation)
+        start = time.perf_counter()
+        root = os.path.normpath(path)
+        running = [0, 0]
+        
+        async def report(partial, done, total):
+            for totals in partial[0].values():
+                running[0] += totals[0]
+                running[1] += totals[2]
+            if ctx is not None:
+                await ctx.report_progress(done, total, f"{running[1]} files, {running[0]} bytes so far")
+                
+        visit = functools.partial(_usage_visit, matcher=allowed_matcher())
+        partials, unfinished = await walk_in_parallel(
+            'disk_usage', root, compile_excludes(exclude_patterns), visit, timeout, report)
+        rolled = await run_blocking('disk_usage', _roll_up_usage, root, partials, max(depth, 0))
+        
+        total = rolled.pop('.', [0, 0, 0, 0])
+        rows = [_usage_row(key, totals) for key, totals
+                in sorted(rolled.items(), key=lambda item: (-item[1][0], item[0]))]
+        page = rows[offset:]
+        count = take_within_budget(page, budget_bytes, budget_entries)
+        next_offset = offset + count if count < len(page) else None
+        return json.dumps({
+            "path": path,
+            "total": _usage_row('.', total),
+            "directories": page[:count],
+            "complete": not unfinished,
+            "unfinished": [os.path.relpath(d, root).replace(os.sep, '/') for d in unfinished],
+            "elapsed_seconds": round(time.perf_counter() - start, 3),
+            **budget_info(len(rows), next_offset)
+        })
     except Exception as e:
-        return f"Error getting file info: {str(e)}"
+        return f"Error computing disk usage: {str(e)}"
+
+def _duplicate_visit(entries, include_re, min_size):
+    """Collect ``(path, stat key)`` for the regular files find_duplicates compares.
+
+    Symlinks are skipped, so every file found lies inside the checked root.
+    """
+    files = []
+    for entry in entries:
+        try:
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            if include_re is not None and not include_re.match(entry.name):
+                continue
+            stat_info = entry.stat(follow_symlinks=False)
+            if stat_info.st_size >= min_size:
+                files.append((entry.path, _stat_key(entry.path, stat_info)))
+        except OSError:
+            continue
+    return files
+
+def _colliding(groups):
+    """Keep only the groups that still have more than one member."""
+    return [members for members in groups.values() if len(members) > 1]
+
+def _edge_digest(path, size):
+    """Hash the first and last DUPLICATE_EDGE_BYTES of a file."""
+    hasher = hashlib.blake2b()
+    with open(path, 'rb') as f:
+        hasher.update(f.read(DUPLICATE_EDGE_BYTES))
+        f.seek(max(size - DUPLICATE_EDGE_BYTES, DUPLICATE_EDGE_BYTES))
+        hasher.update(f.read(DUPLICATE_EDGE_BYTES))
+    return hasher.digest()
+
+def _edge_batch(items, cancel=None):
+    """Edge-hash a batch of ``(path, key)`` pairs, with None for unreadable files."""
+    digests = []
+    for path, key in items:
+        check_cancelled(cancel)
+        try:
+            digests.append(_edge_digest(path, key[2]))
+        except OSError:
+            digests.append(None)
+    return digests
+
+@mcp.tool()
+async def find_duplicates(path: str, exclude_patterns: Optional[List[str]] = None,
+                          include_patterns: Optional[List[str]] = None, min_size: int = 1,
+                          algorithm: str = 'sha256', timeout: Optional[float] = None,
+                          max_bytes: Optional[int] = None, max_entries: Optional[int] = None,
+                          continuation: Optional[str] = None, ctx: Context = None) -> str:
+    """Find files with identical contents under a directory.
+    
+    Files are first grouped by size; only sizes shared by several files are
+    read. Large files are then compared on their first and last blocks, and
+    only files that still collide are hashed in full, using the same cache as
+    hash_files. Hard links to one file are reported once. Groups are sorted by
+    reclaimable bytes. Progress notifications carry the groups confirmed so
+    far; if ``timeout`` runs out, the groups found until then are returned.
+    
+    Args:
+        path: Directory to search
+        exclude_patterns: Patterns to exclude; matching directories are not descended into
+        include_patterns: Only compare files whose names match one of these globs
+        min_size: Ignore files smaller than this many bytes
+        algorithm: Hash algorithm for the full-content hash (sha256, sha1, md5 or blake2b)
+        timeout: Seconds to search before returning the groups found so far
+        max_bytes: Maximum size of the groups returned by this call
+        max_entries: Maximum number of groups returned by this call
+        continuation: Token from a previous call to get the next page of groups
+    """
+    try:
+        if not await run_blocking('find_duplicates', is_path_allowed, path):
+            return f"Error: Access to path '{path}' is not allowed."
+            
+        if not os.path.isdir(path):
+            return f"Error: Path {path} is not a directory"
+            
+        if algorithm not in HASH_ALGORITHMS:
+            return f"Error: Unsupported algorithm '{algorithm}'. Valid algorithms: {list(HASH_ALGORITHMS)}"
+            
+        budget_bytes, budget_entries = response_budget(max_bytes, max_entries)
+        offset = decode_continuation(continuation)
+        start = time.perf_counter()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        remaining = lambda: None if deadline is None else max(deadline - time.monotonic(), 0)
+        
+        visit = functools.partial(_duplicate_visit, include_re=compile_patterns(include_patterns),
+                                  min_size=max(min_size, 1))
+        partials, unfinished = await walk_in_parallel(
+            'find_duplicates', os.path.normpath(path), compile_excludes(exclude_patterns), visit,
+            timeout)
+            
+        # Stage 1: bucket by size, counting each inode once
+        by_size = {}
+        inodes = set()
+        scanned = 0
+        for files in partials:
+            for path_key in files:
+                inode = path_key[1][:2]
+                if inode in inodes:
+                    continue
+                inodes.add(inode)
+                scanned += 1
+                by_size.setdefault(path_key[1][2], []).append(path_key)
+        candidates = _colliding(by_size)
+        
+        # Stage 2: files too large to hash whole are compared on their edges first
+        small = [members for members in candidates if members[0][1][2] <= 2 * DUPLICATE_EDGE_BYTES]
+        large = [item for members in candidates if members[0][1][2] > 2 * DUPLICATE_EDGE_BYTES
+                 for item in members]
+        batches = size_batches(large, lambda item: 2 * DUPLICATE_EDGE_BYTES,
+                               DUPLICATE_BATCH_FILES, HASH_BATCH_BYTES)
+        tasks = [asyncio.ensure_future(run_blocking('find_duplicates', _edge_batch, batch,
+                                                    cancellable=True))
+                 for batch in batches]
+        by_edges = {}
+        unverified = 0
+        if tasks:
+            try:
+                done, _ = await asyncio.wait(tasks, timeout=remaining())
+            finally:
+                # No-op for finished batches; stops the rest on timeout or cancellation
+                for task in tasks:
+                    task.cancel()
+            for batch, task in zip(batches, tasks):
+                if task not in done:
+                    unverified += len(batch)
+                    continue
+                for item, digest in zip(batch, task.result()):
+                    if digest is not None:
+                        by_edges.setdefault((item[1][2], digest), []).append(item)
+        bytes_read = 2 * DUPLICATE_EDGE_BYTES * (len(large) - unverified)
+        
+        # Stage 3: full hashes, most reclaimable space first, in rounds so a
+        # timeout still returns whole groups
+        candidates = small + _colliding(by_edges)
+        candidates.sort(key=lambda members: members[0][1][2] * (len(members) - 1), reverse=True)
+        rounds = size_batches(candidates, lambda members: members[0][1][2] * len(members),
+                              len(candidates) or 1, DUPLICATE_ROUND_BYTES)
+        groups = []
+        for done_rounds, members_list in enumerate(rounds):
+            if deadline is not None and remaining() <= 0:
+                unverified += sum(len(members) for later in rounds[done_rounds:]
+                                  for members in later)
+                break
+            files = [item for members in members_list for item in members]
+            digests, bytes_hashed = await hash_stat_keyed(files, algorithm)
+            bytes_read += bytes_hashed
+            by_digest = {}
+            for file_path, key in files:
+                digest, _, error = digests[file_path]
+                if error is None:
+                    by_digest.setdefault((key[2], digest), []).append(file_path)
+            for (size, digest), paths in by_digest.items():
+                if len(paths) > 1:
+                    groups.append({"size": size, "hash": digest, "paths": sorted(paths)})
+            if ctx is not None:
+                reclaimable = sum(g["size"] * (len(g["paths"]) - 1) for g in groups)
+                await ctx.report_progress(done_rounds + 1, len(rounds),
+                                          f"{len(groups)} duplicate groups, {reclaimable} bytes reclaimable so far")
+                                          
+        groups.sort(key=lambda g: (-g["size"] * (len(g["paths"]) - 1), g["paths"][0]))
+        page = groups[offset:]
+        count = take_within_budget(page, budget_bytes, budget_entries)
+        next_offset = offset + count if count < len(page) else None
+        return json.dumps({
+            "path": path,
+            "algorithm": algorithm,
+            "groups": page[:count],
+            "duplicate_files": sum(len(g["paths"]) - 1 for g in groups),
+            "reclaimable_bytes": sum(g["size"] * (len(g["paths"]) - 1) for g in groups),
+            "files_scanned": scanned,
+            "bytes_read": bytes_read,
+            "complete": not unfinished and not unverified,
+            "unfinished": unfinished,
+            "unverified_files": unverified,
+            "elapsed_seconds": round(time.perf_counter() - start, 3),
+            **budget_info(len(groups), next_offset)
+        })
+    except Exception as e:
+        return f"Error finding duplicates: {str(e)}"
+
+@mcp.tool()
+async def cache_stats(clear: bool = False) -> str:
+    """Report content cache counters to help size MCP_FS_CACHE_BYTES.
+    
+    Args:
+        clear: Empty the cache and reset the counters after reporting them
+    """
+    with _content_cache_lock:
+        stats = dict(_content_cache_stats)
+        stats['entries'] = len(_content_cache)
+        if clear:
+            _content_cache.clear()
+            for counter in _content_cache_stats:
+                _content_cache_stats[counter] = 0
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else None
+    stats['max_bytes'] = CONTENT_CACHE_MAX_BYTES
+    stats['max_file_bytes'] = CONTENT_CACHE_MAX_FILE_BYTES
+    return json.dumps(stats)
 
 @mcp.tool()
 async def list_allowed_directories() -> str:
@@ -306,7 +3575,7 @@ async def list_allowed_directories() -> str:
     Returns:
         List of allowed directories
     """
-    return json.dumps(ALLOWED_DIRS)
+    return json.dumps(list(load_allowed_dirs()[0]))
 
 if __name__ == "__main__":
     # Initialize and run the server
@@ -1,62 +1,1262 @@
+import asyncio
+import atexit
+import codecs
+import datetime
+import itertools
+import json
+import locale
+import os
+import secrets
+import signal
 import subprocess
+import sys
+import tempfile
+import time
+from collections import OrderedDict
 from typing import Optional
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import FastMCP, Context
 
 # Initialize FastMCP server
 mcp = FastMCP("terminal")
 
+# Default wall-clock limit for one command in seconds; 0 (the default) means
+# no limit, as before commands ran on asyncio. Set MCP_TERMINAL_TIMEOUT to cap them.
+COMMAND_TIMEOUT = float(os.environ.get('MCP_TERMINAL_TIMEOUT', 0))
+READ_CHUNK_BYTES = 64 * 1024
+# Output is forwarded as progress notifications at most this often
+PROGRESS_INTERVAL = 0.25
+PROGRESS_MAX_CHARS = 8192
+# How long to wait for the pipes to close after killing a timed-out command
+KILL_GRACE_SECONDS = 2
+# Decode output the way subprocess.run(text=True) did
+OUTPUT_ENCODING = locale.getpreferredencoding(False)
+
+def _process_group_kwargs():
+    """Start the child in its own process group so the whole tree can be killed."""
+    if sys.platform == 'win32':
+        return {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {'start_new_session': True}
+
+async def kill_process_group(proc):
+    """Kill a child started with _process_group_kwargs and everything it spawned."""
+    try:
+        if sys.platform == 'win32':
+            killer = await asyncio.create_subprocess_exec(
+                'taskkill', '/F', '/T', '/PID', str(proc.pid),
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            await killer.wait()
+        else:
+            os.killpg(proc.pid, signal.SIGKILL)
+    except OSError:
+        pass
+    if proc.returncode is None:
+        try:
+            proc.kill()
+        except OSError:
+            pass
+    await proc.wait()
+
+class ProgressForwarder:
+    """Forward command output to the client as throttled progress notifications.
+
+    Chunks are batched for PROGRESS_INTERVAL seconds; if more than
+    PROGRESS_MAX_CHARS arrive in that window only the newest are sent.
+    Progress counts the characters received so far.
+    """
+
+    def __init__(self, ctx):
+        self.ctx = ctx
+        self.pending = {'stdout': [], 'stderr': []}
+        self.received = 0
+        self.sent_at = 0.0
+
+    async def add(self, stream, text):
+        if self.ctx is None:
+            return
+        self.pending[stream].append(text)
+        self.received += len(text)
+        if time.monotonic() - self.sent_at >= PROGRESS_INTERVAL:
+            await self.flush()
+
+    async def flush(self):
+        if self.ctx is None:
+            return
+        self.sent_at = time.monotonic()
+        message = ''
+        for stream, chunks in self.pending.items():
+            if not chunks:
+                continue
+            text = ''.join(chunks).replace('\r\n', '\n')
+            chunks.clear()
+            if not text.strip():
+                continue
+            if len(text) > PROGRESS_MAX_CHARS:
+                skipped = len(text) - PROGRESS_MAX_CHARS
+                text = f"[{skipped} characters skipped]\n" + text[-PROGRESS_MAX_CHARS:]
+            message += "[stderr] " + text if stream == 'stderr' else text
+        if message:
+            await self.ctx.report_progress(self.received, None, message)
+
+# Captured output per stream: the first OUTPUT_HEAD_BYTES and the last
+# OUTPUT_TAIL_BYTES are kept; what lies between is counted and dropped, or
+# spilled to a temp file on request
+OUTPUT_HEAD_BYTES = int(os.environ.get('MCP_TERMINAL_OUTPUT_HEAD', 64 * 1024))
+OUTPUT_TAIL_BYTES = int(os.environ.get('MCP_TERMINAL_OUTPUT_TAIL', 192 * 1024))
+SPILL_DIR = os.path.join(tempfile.gettempdir(), 'mcp_terminal_output')
+SPILL_MAX_FILES = 32
+SPILL_MAX_BYTES = int(os.environ.get('MCP_TERMINAL_SPILL_MAX_MB', 1024)) * 1024 * 1024
+SPILL_READ_BYTES = 64 * 1024
+_spills = OrderedDict()
+_spill_ids = itertools.count(1)
+
+class OutputRing:
+    """Keep the newest ``capacity`` bytes of a stream, addressed by absolute offset.
+
+    Writes and reads copy only the bytes involved, so reading a slice costs
+    O(requested bytes) however much the job has printed.
+    """
+
+    def __init__(self, capacity):
+        self.buffer = bytearray(capacity)
+        self.capacity = capacity
+        self.total = 0
+
+    @property
+    def start(self):
+        """Offset of the oldest byte still held."""
+        return max(self.total - self.capacity, 0)
+
+    def write(self, data):
+        if len(data) > self.capacity:
+            self.total += len(data) - self.capacity
+            data = data[-self.capacity:]
+        pos = self.total % self.capacity
+        first = min(len(data), self.capacity - pos)
+        self.buffer[pos:pos + first] = data[:first]
+        self.buffer[:len(data) - first] = data[first:]
+        self.total += len(data)
+
+    def read(self, offset, size):
+        """Return ``(data, offset)``, moving ``offset`` up to the oldest byte held."""
+        offset = min(max(offset, self.start), self.total)
+        size = min(size, self.total - offset)
+        pos = offset % self.capacity
+        first = min(size, self.capacity - pos)
+        return bytes(self.buffer[pos:pos + first]) + bytes(self.buffer[:size - first]), offset
+
+def _register_spill(path):
+    """Make a spill file readable through read_output, deleting the oldest beyond SPILL_MAX_FILES."""
+    spill_id = str(next(_spill_ids))
+    _spills[spill_id] = path
+    while len(_spills) > SPILL_MAX_FILES:
+        _, old_path = _spills.popitem(last=False)
+        try:
+            os.remove(old_path)
+        except OSError:
+            pass
+    return spill_id
+
+@atexit.register
+def _remove_spills():
+    for path in _spills.values():
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+class BoundedCapture:
+    """Capture one output stream in constant memory.
+
+    The head is kept until it is full, then everything else goes through an
+    OutputRing that keeps the tail. With ``spill`` the whole stream is also
+    written to a temp file, but only once it outgrows the head, so short
+    outputs never touch the disk.
+    """
+
+    def __init__(self, spill=False):
+        self.head = bytearray()
+        self.tail = OutputRing(OUTPUT_TAIL_BYTES)
+        self.spill = spill
+        self.spill_file = None
+        self.spill_id = None
+        self.spilled = 0
+
+    @property
+    def total(self):
+        return len(self.head) + self.tail.total
+
+    @property
+    def dropped(self):
+        return self.tail.start
+
+    def write(self, data):
+        room = OUTPUT_HEAD_BYTES - len(self.head)
+        if room > 0:
+            self.head += data[:room]
+            data = data[room:]
+        if not data:
+            return
+        self.tail.write(data)
+        if self.spill:
+            self._spill(data)
+
+    def _spill(self, data):
+        if self.spill_file is None:
+            os.makedirs(SPILL_DIR, exist_ok=True)
+            fd, path = tempfile.mkstemp(dir=SPILL_DIR, suffix='.log')
+            self.spill_file = os.fdopen(fd, 'wb')
+            self.spill_id = _register_spill(path)
+            self.spill_file.write(self.head)
+            self.spilled = len(self.head)
+        data = data[:max(SPILL_MAX_BYTES - self.spilled, 0)]
+        self.spill_file.write(data)
+        self.spilled += len(data)
+
+    def close(self):
+        if self.spill_file is not None:
+            self.spill_file.close()
+
+    def text(self):
+        """Decode what was kept, marking the dropped middle."""
+        tail, _ = self.tail.read(self.tail.start, self.tail.capacity)
+        if self.dropped:
+            text = (self.head.decode(OUTPUT_ENCODING, errors='replace')
+                    + f"\n... [{self.dropped} bytes omitted] ...\n"
+                    + tail.decode(OUTPUT_ENCODING, errors='replace'))
+        else:
+            text = (self.head + tail).decode(OUTPUT_ENCODING, errors='replace')
+        return text.replace('\r\n', '\n')
+
+    def spill_note(self, stream):
+        if self.spill_id is None:
+            return ""
+        note = f"\n[Full {stream} ({self.total} bytes) saved as output '{self.spill_id}'"
+        if self.spilled < self.total:
+            note += f", first {self.spilled} bytes only"
+        return note + "; read it with read_output.]"
+
+def combine_output(stdout, stderr):
+    """Build a tool result from the stdout and stderr captures."""
+    output = stdout.text()
+    errors = stderr.text()
+    if errors:
+        output += "\nErrors:\n" + errors
+    return output + stdout.spill_note('stdout') + stderr.spill_note('stderr')
+
+async def _pump(reader, capture, stream, forwarder):
+    """Read one pipe to EOF into ``capture``, forwarding decoded chunks as progress."""
+    decoder = codecs.getincrementaldecoder(OUTPUT_ENCODING)(errors='replace')
+    while True:
+        data = await reader.read(READ_CHUNK_BYTES)
+        capture.write(data)
+        if forwarder.ctx is not None:
+            text = decoder.decode(data, final=not data)
+            if text:
+                await forwarder.add(stream, text)
+        if not data:
+            return
+
+async def _discard(future):
+    """Cancel a helper future and collect its outcome so it is not logged as lost."""
+    future.cancel()
+    await asyncio.gather(future, return_exceptions=True)
+
+async def run_streaming(program, shell=False, timeout=COMMAND_TIMEOUT, ctx=None, spill=False):
+    """Run a command without blocking the event loop and return its output.
+
+    ``program`` is a command line when ``shell`` is true, otherwise an argv
+    list. Output is streamed to ``ctx`` while the command runs and captured
+    with BoundedCapture (``spill`` keeps all of it in temp files). When
+    ``timeout`` (seconds; None or 0 for no limit) runs out, or the tool call
+    is cancelled, the command's whole process group is killed.
+    """
+    kwargs = dict(stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                  **_process_group_kwargs())
+    if shell:
+        proc = await asyncio.create_subprocess_shell(program, **kwargs)
+    else:
+        proc = await asyncio.create_subprocess_exec(*program, **kwargs)
+
+    forwarder = ProgressForwarder(ctx)
+    stdout, stderr = BoundedCapture(spill), BoundedCapture(spill)
+    finished = asyncio.ensure_future(asyncio.gather(
+        _pump(proc.stdout, stdout, 'stdout', forwarder),
+        _pump(proc.stderr, stderr, 'stderr', forwarder),
+        proc.wait()))
+    timed_out = False
+    try:
+        done, _ = await asyncio.wait([finished], timeout=timeout or None)
+        if done:
+            finished.result()
+        else:
+            timed_out = True
+            await kill_process_group(proc)
+            # A process that left the group may still hold the pipes open
+            await asyncio.wait([finished], timeout=KILL_GRACE_SECONDS)
+    except asyncio.CancelledError:
+        await kill_process_group(proc)
+        raise
+    finally:
+        await _discard(finished)
+        stdout.close()
+        stderr.close()
+    await forwarder.flush()
+
+    output = combine_output(stdout, stderr)
+    if timed_out:
+        output += f"\nError: Command timed out after {timeout} seconds and was killed."
+    return output
+
+# Persistent shells for run_command(session=...), closed after sitting idle
+SESSION_IDLE_SECONDS = float(os.environ.get('MCP_TERMINAL_SESSION_IDLE', 900))
+# A hung command in a session blocks every later command sent to it, so
+# session commands keep a finite default limit even though one-shot
+# commands have none. Set MCP_TERMINAL_SESSION_TIMEOUT to 0 to lift it.
+SESSION_COMMAND_TIMEOUT = float(os.environ.get('MCP_TERMINAL_SESSION_TIMEOUT', 600))
+SESSION_REAP_INTERVAL = 30
+SESSION_MAX = 16
+SESSION_SHELL = ['cmd.exe', '/Q'] if sys.platform == 'win32' else ['/bin/sh']
+_sessions = {}
+_reaper = None
+
+# Run once in each POSIX session: keep copies of the pipes the server reads
+# on fds 8 and 9, so the framing can restore them after every command
+_SESSION_SETUP = "exec 8>&1 9>&2\n"
+
+def _frame_command(command, token):
+    """Follow ``command`` with lines that print ``token`` on stdout and stderr once it finishes.
+
+    The token is preceded by a newline so it always starts a line, even
+    after output without a trailing newline. On POSIX the command is passed
+    to ``eval`` as one single-quoted word, so an unbalanced quote or brace
+    is reported as a syntax error instead of swallowing the framing lines;
+    ``command eval`` keeps that error from ending the shell. Its stdin is
+    /dev/null, and stdout and stderr are restored from fds 8 and 9 before
+    the token is printed, so a command that redirects them with ``exec``
+    cannot hide the token either.
+    """
+    if sys.platform == 'win32':
+        return (f"{command}\r\n"
+                f"echo.\r\necho {token}\r\n"
+                f"1>&2 echo.\r\n1>&2 echo {token}\r\n")
+    quoted = "'" + command.replace("'", "'\\''") + "'"
+    return (f"command eval {quoted} </dev/null\n"
+            "exec 1>&8 2>&9\n"
+            f"printf '\\n%s\\n' {token}\n"
+            f"printf '\\n%s\\n' {token} >&2\n")
+
+class FramedProcess:
+    """A long-lived child that answers requests on its stdout and stderr.
+
+    Each request makes the child print a token line on both streams once it
+    is done. Requests run one at a time. Output is read until the token
+    appears; bytes printed after it (e.g. by background processes) are
+    kept for the next request.
+    """
+
+    def __init__(self, proc):
+        self.proc = proc
+        self.lock = asyncio.Lock()
+        self.leftover = {'stdout': bytearray(), 'stderr': bytearray()}
+
+    @property
+    def alive(self):
+        return self.proc.returncode is None
+
+    async def _collect(self, stream, reader, marker, capture, forwarder):
+        """Read one pipe up to the ``marker`` line into ``capture``.
+
+        Returns the rest of the marker line, or None if the child exited
+        first. Output is forwarded as it arrives, holding back only a tail
+        that could be the start of the marker. A trailing newline is kept
+        out of ``capture`` until more output follows, so the one the framing
+        prints before the marker is never captured.
+        """
+        decoder = codecs.getincrementaldecoder(OUTPUT_ENCODING)(errors='replace')
+        buffer = self.leftover[stream]
+        newline = b''
+        
+        async def emit(data, final=False):
+            nonlocal newline
+            data = bytes(data)
+            if forwarder.ctx is not None:
+                text = decoder.decode(data, final=final)
+                if text:
+                    await forwarder.add(stream, text)
+            data = newline + data
+            cut = len(data) - (2 if data.endswith(b'\r\n') else 1 if data.endswith(b'\n') else 0)
+            capture.write(data[:cut])
+            newline = data[cut:]
+                
+        while True:
+            found = buffer.find(marker)
+            if found >= 0:
+                line_end = buffer.find(b'\n', found + len(marker))
+                if line_end >= 0:
+                    await emit(buffer[:found], final=True)
+                    status = bytes(buffer[found + len(marker):line_end]).strip()
+                    del buffer[:line_end + 1]
+                    return status
+            else:
+                held = next((n for n in range(min(len(marker) - 1, len(buffer)), 0, -1)
+                             if buffer.endswith(marker[:n])), 0)
+                if len(buffer) > held:
+                    await emit(buffer[:len(buffer) - held])
+                    del buffer[:len(buffer) - held]
+            data = await reader.read(READ_CHUNK_BYTES)
+            if not data:
+                await emit(buffer, final=True)
+                capture.write(newline)
+                buffer.clear()
+                return None
+            buffer += data
+
+    async def exchange(self, request, token, timeout=COMMAND_TIMEOUT, ctx=None, spill=False):
+        """Send ``request`` and read the output it produces up to ``token``.
+
+        Returns ``(output, status, timed_out)``: the combine_output text,
+        the rest of the stdout token line (None if the child exited or was
+        killed) and whether ``timeout`` ran out. On timeout or cancellation
+        the child is killed, since the request is still running in it.
+        """
+        async with self.lock:
+            self.proc.stdin.write(request)
+            await self.proc.stdin.drain()
+            
+            marker = token.encode('ascii')
+            forwarder = ProgressForwarder(ctx)
+            stdout, stderr = BoundedCapture(spill), BoundedCapture(spill)
+            finished = asyncio.ensure_future(asyncio.gather(
+                self._collect('stdout', self.proc.stdout, marker, stdout, forwarder),
+                self._collect('stderr', self.proc.stderr, marker, stderr, forwarder)))
+            try:
+                done, _ = await asyncio.wait([finished], timeout=timeout or None)
+                timed_out = not done
+                status = None
+                if timed_out:
+                    await _discard(finished)
+                    await self.close()
+                else:
+                    status, stderr_status = finished.result()
+                    if status is None or stderr_status is None:
+                        status = None
+                        await self.close()
+            except asyncio.CancelledError:
+                await _discard(finished)
+                await self.close()
+                raise
+            finally:
+                stdout.close()
+                stderr.close()
+            await forwarder.flush()
+        return combine_output(stdout, stderr), status, timed_out
+
+    async def close(self):
+        if self.alive:
+            try:
+                self.proc.stdin.close()
+            except OSError:
+                pass
+            await kill_process_group(self.proc)
+
+class ShellSession(FramedProcess):
+    """A long-lived shell that keeps its cwd and environment between commands."""
+
+    def __init__(self, name, proc):
+        super().__init__(proc)
+        self.name = name
+        self.last_used = time.monotonic()
+        self.commands_run = 0
+
+    async def run(self, command, timeout=COMMAND_TIMEOUT, ctx=None, spill=False):
+        """Run ``command`` in the session and return its output like run_streaming."""
+        self.last_used = time.monotonic()
+        token = f"__mcp_done_{secrets.token_hex(8)}"
+        output, status, timed_out = await self.exchange(
+            _frame_command(command, token).encode(OUTPUT_ENCODING), token, timeout, ctx, spill)
+        self.commands_run += 1
+        self.last_used = time.monotonic()
+        
+        if timed_out:
+            output += (f"\nError: Command timed out after {timeout} seconds; "
+                       f"session '{self.name}' was killed and its state lost.")
+        elif status is None:
+            output += f"\nError: Session '{self.name}' exited; the next command starts a new shell."
+        return output
+
+    async def close(self):
+        if _sessions.get(self.name) is self:
+            del _sessions[self.name]
+        await super().close()
+
+async def _get_session(name):
+    """Return the named session, starting a shell for it if needed."""
+    session = _sessions.get(name)
+    if session is not None and session.alive:
+        return session
+    if session is not None:
+        await session.close()
+    if len(_sessions) >= SESSION_MAX:
+        idle = [s for s in _sessions.values() if not s.lock.locked()]
+        if not idle:
+            raise RuntimeError(f"All {SESSION_MAX} sessions are busy")
+        await min(idle, key=lambda s: s.last_used).close()
+        
+    proc = await asyncio.create_subprocess_exec(
+        *SESSION_SHELL, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        **_process_group_kwargs())
+    if sys.platform != 'win32':
+        proc.stdin.write(_SESSION_SETUP.encode('ascii'))
+    session = _sessions[name] = ShellSession(name, proc)
+    
+    global _reaper
+    if _reaper is None:
+        _reaper = asyncio.ensure_future(_reap_sessions())
+    return session
+
+async def _reap_sessions():
+    """Close sessions that have been idle for SESSION_IDLE_SECONDS."""
+    global _reaper
+    try:
+        while _sessions:
+            await asyncio.sleep(SESSION_REAP_INTERVAL)
+            now = time.monotonic()
+            for session in list(_sessions.values()):
+                if not session.lock.locked() and now - session.last_used > SESSION_IDLE_SECONDS:
+                    await session.close()
+    finally:
+        _reaper = None
+
 @mcp.tool()
-async def run_command(command: str) -> str:
+async def run_command(command: str, timeout: Optional[float] = None,
+                      session: Optional[str] = None, spill_output: bool = False,
+                      ctx: Context = None) -> str:
     """Run a command in the Windows command prompt.
     
+    The server keeps handling other calls while the command runs. Output is
+    sent as progress notifications as it arrives; stderr chunks are prefixed
+    with "[stderr]". Cancelling the call kills the command and any processes
+    it started.
+    
+    The result keeps the first MCP_TERMINAL_OUTPUT_HEAD and last
+    MCP_TERMINAL_OUTPUT_TAIL bytes of each stream (64 KB and 192 KB by
+    default) and says how many bytes in between were omitted. With
+    ``spill_output`` the full output is also saved to a temp file that
+    read_output can page through.
+    
+    With ``session``, the command runs in a named shell that is kept open,
+    so the working directory and environment variables carry over to the
+    next command in that session and no new shell is started. Commands in
+    one session run one at a time. Sessions close after sitting idle for
+    MCP_TERMINAL_SESSION_IDLE seconds (15 minutes by default). A session
+    command that runs past its timeout (MCP_TERMINAL_SESSION_TIMEOUT, 10
+    minutes by default) kills the session so later commands are not stuck
+    behind it.
+    
     Args:
         command: Command to execute
+        timeout: Seconds to let the command run before killing it (0 for no limit).
+            Defaults to no limit for one-shot commands unless MCP_TERMINAL_TIMEOUT
+            is set, and to MCP_TERMINAL_SESSION_TIMEOUT in a session
+        session: Name of a persistent shell session to run the command in
+        spill_output: Save the full output for read_output when it is too long to return
     """
     try:
-        # Execute the command and capture output
-        result = subprocess.run(
-            command, 
-            shell=True, 
-            capture_output=True, 
-            text=True
-        )
-        
-        # Combine stdout and stderr
-        output = result.stdout
-        if result.stderr:
-            output += "\nErrors:\n" + result.stderr
-            
-        return output
+        if session is not None:
+            shell = await _get_session(session)
+            return await shell.run(command, SESSION_COMMAND_TIMEOUT if timeout is None else timeout,
+                                   ctx, spill_output)
+        return await run_streaming(command, shell=True,
+                                   timeout=COMMAND_TIMEOUT if timeout is None else timeout,
+                                   ctx=ctx, spill=spill_output)
     except Exception as e:
         return f"Error executing command: {str(e)}"
 
 @mcp.tool()
-async def run_python_script(script: str, args: Optional[str] = None) -> str:
+async def list_sessions() -> str:
+    """List the open shell sessions used by run_command(session=...)."""
+    now = time.monotonic()
+    return json.dumps([{
+        "session": session.name,
+        "pid": session.proc.pid,
+        "busy": session.lock.locked(),
+        "commands_run": session.commands_run,
+        "idle_seconds": round(now - session.last_used, 1)
+    } for session in _sessions.values()])
+
+@mcp.tool()
+async def close_session(session: str) -> str:
+    """Close a shell session, killing anything still running in it.
+    
+    Args:
+        session: Name of the session to close
+    """
+    try:
+        shell = _sessions.get(session)
+        if shell is None:
+            return f"Error: Session '{session}' not found."
+        await shell.close()
+        return f"Session '{session}' closed."
+    except Exception as e:
+        return f"Error closing session: {str(e)}"
+
+# Warm interpreters for run_python_script. The pool is opt-in: it stays off
+# while MCP_TERMINAL_PY_WORKERS is 0.
+PY_WORKERS = int(os.environ.get('MCP_TERMINAL_PY_WORKERS', 0))
+PY_PRELOAD = [name.strip() for name in os.environ.get('MCP_TERMINAL_PY_PRELOAD', '').split(',')
+              if name.strip()]
+PY_MAX_RUNS = int(os.environ.get('MCP_TERMINAL_PY_MAX_RUNS', 50))
+PY_MAX_RSS_GROWTH = int(os.environ.get('MCP_TERMINAL_PY_MAX_RSS_MB', 512)) * 1024 * 1024
+_py_workers = set()
+_py_idle = []
+_py_slots = None
+_py_starting = set()
+
+# Runs inside each worker: ``python -c _WORKER_SOURCE <preload modules...>``.
+# Requests arrive as JSON lines on the original stdin; scripts see an empty
+# stdin and write to the worker's real stdout/stderr, which the server reads
+# up to the request's token line like a shell session.
+_WORKER_SOURCE = r'''
+import json, os, runpy, sys, traceback
+
+def rss():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    if sys.platform == 'win32':
+        import ctypes
+        from ctypes import wintypes
+        class Counters(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD)] + [
+                (name, ctypes.c_size_t) for name in (
+                    'PeakWorkingSetSize', 'WorkingSetSize', 'QuotaPeakPagedPoolUsage',
+                    'QuotaPagedPoolUsage', 'QuotaPeakNonPagedPoolUsage',
+                    'QuotaNonPagedPoolUsage', 'PagefileUsage', 'PeakPagefileUsage')]
+        counters = Counters()
+        counters.cb = ctypes.sizeof(counters)
+        kernel32 = ctypes.windll.kernel32
+        kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+        if kernel32.K32GetProcessMemoryInfo(kernel32.GetCurrentProcess(), ctypes.byref(counters),
+                                            counters.cb):
+            return counters.WorkingSetSize
+        return 0
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def exit_code(code):
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code
+    print(code, file=sys.stderr)
+    return 1
+
+def run(request):
+    script = os.path.abspath(request['script'])
+    script_dir = os.path.dirname(script)
+    cwd, argv, path = os.getcwd(), sys.argv, list(sys.path)
+    environ, modules = dict(os.environ), set(sys.modules)
+    sys.argv = [request['script']] + request['args']
+    sys.path[0] = script_dir
+    try:
+        runpy.run_path(script, run_name='__main__')
+        return 0
+    except SystemExit as e:
+        return exit_code(e.code)
+    except BaseException as e:
+        # Start the traceback at the script, as a fresh interpreter would
+        tb = e.__traceback__
+        while tb is not None and tb.tb_frame.f_code.co_filename != script:
+            tb = tb.tb_next
+        traceback.print_exception(type(e), e, tb)
+        return 1
+    finally:
+        for stream in (sys.stdout, sys.stderr):
+            try:
+                stream.flush()
+            except Exception:
+                pass
+        sys.stdout, sys.stderr = stdout, stderr
+        os.chdir(cwd)
+        sys.argv, sys.path[:] = argv, path
+        os.environ.clear()
+        os.environ.update(environ)
+        # Forget the script's own modules so edits are picked up next run
+        for name in set(sys.modules) - modules:
+            file = getattr(sys.modules[name], '__file__', None) or ''
+            if os.path.abspath(file).startswith(script_dir + os.sep):
+                del sys.modules[name]
+
+control = os.fdopen(os.dup(0), 'rb')
+os.dup2(os.open(os.devnull, os.O_RDONLY), 0)
+sys.stdin = open(os.devnull)
+stdout, stderr = sys.stdout, sys.stderr
+for name in sys.argv[1:]:
+    try:
+        __import__(name)
+    except Exception:
+        pass
+baseline = rss()
+for line in control:
+    request = json.loads(line)
+    code = run(request)
+    stdout.flush()
+    stderr.flush()
+    token = request['token']
+    os.write(1, f"\n{token} {code} {rss() - baseline}\n".encode('ascii'))
+    os.write(2, f"\n{token}\n".encode('ascii'))
+'''
+
+class PythonWorker(FramedProcess):
+    """A warm interpreter from the pool that runs scripts with runpy."""
+
+    def __init__(self, proc):
+        super().__init__(proc)
+        self.runs = 0
+
+    async def run(self, script, args, timeout=COMMAND_TIMEOUT, ctx=None, spill=False):
+        """Run ``script`` and return ``(output, recycle)``.
+
+        ``recycle`` is true once the worker has served PY_MAX_RUNS scripts,
+        grown by more than PY_MAX_RSS_GROWTH since it started, or exited.
+        """
+        token = f"__mcp_done_{secrets.token_hex(8)}"
+        request = json.dumps({"token": token, "script": script, "args": args}) + '\n'
+        output, status, timed_out = await self.exchange(
+            request.encode('utf-8'), token, timeout, ctx, spill)
+        self.runs += 1
+        
+        if timed_out:
+            output += f"\nError: Script timed out after {timeout} seconds and was killed."
+            return output, True
+        if status is None:
+            output += "\nError: The Python worker exited while running the script."
+            return output, True
+        growth = int(status.split()[1])
+        return output, self.runs >= PY_MAX_RUNS or growth > PY_MAX_RSS_GROWTH
+
+    async def close(self):
+        _py_workers.discard(self)
+        await super().close()
+
+async def _start_python_worker():
+    proc = await asyncio.create_subprocess_exec(
+        'python', '-c', _WORKER_SOURCE, *PY_PRELOAD, stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, **_process_group_kwargs())
+    worker = PythonWorker(proc)
+    _py_workers.add(worker)
+    return worker
+
+def _warm_python_workers():
+    """Start workers in the background until the pool is full again."""
+    missing = PY_WORKERS - len(_py_workers) - len(_py_starting)
+    for _ in range(max(missing, 0)):
+        task = asyncio.ensure_future(_start_python_worker())
+        _py_starting.add(task)
+        task.add_done_callback(_worker_started)
+
+def _worker_started(task):
+    _py_starting.discard(task)
+    if not task.cancelled() and task.exception() is None:
+        _py_idle.append(task.result())
+
+async def run_pooled_script(script, args, timeout=COMMAND_TIMEOUT, ctx=None, spill=False):
+    """Run a script on a warm worker, recycling the worker when it is worn out."""
+    global _py_slots
+    if _py_slots is None:
+        _py_slots = asyncio.Semaphore(PY_WORKERS)
+    async with _py_slots:
+        worker = None
+        while _py_idle and worker is None:
+            candidate = _py_idle.pop()
+            if candidate.alive:
+                worker = candidate
+            else:
+                await candidate.close()
+        if worker is None:
+            worker = await _start_python_worker()
+        _warm_python_workers()
+        
+        recycle = True
+        try:
+            output, recycle = await worker.run(script, args, timeout, ctx, spill)
+        finally:
+            if recycle:
+                await worker.close()
+                _warm_python_workers()
+            else:
+                _py_idle.append(worker)
+        return output
+
+@mcp.tool()
+async def run_python_script(script: str, args: Optional[str] = None,
+                            timeout: Optional[float] = COMMAND_TIMEOUT,
+                            fresh_process: bool = False, spill_output: bool = False,
+                            ctx: Context = None) -> str:
     """Run a Python script.
     
+    Output is captured like run_command: long output keeps its head and
+    tail, and ``spill_output`` saves all of it for read_output.
+    
+    When the server is started with MCP_TERMINAL_PY_WORKERS > 0, scripts run
+    on a pool of warm interpreters that have already imported the modules in
+    MCP_TERMINAL_PY_PRELOAD, so interpreter startup and heavy imports are
+    paid once per worker. Each script gets a fresh __main__ namespace,
+    sys.argv, working directory and environment. Workers are replaced after
+    MCP_TERMINAL_PY_MAX_RUNS scripts or MCP_TERMINAL_PY_MAX_RSS_MB of memory
+    growth. Use ``fresh_process`` for scripts that need a clean interpreter,
+    e.g. ones that change global state of imported modules.
+    
     Args:
         script: Path to the Python script to run
         args: Optional arguments to pass to the script
+        timeout: Seconds to let the script run before killing it (0 for no limit,
+            the default unless MCP_TERMINAL_TIMEOUT is set)
+        fresh_process: Run in a new interpreter even when the worker pool is enabled
+        spill_output: Save the full output for read_output when it is too long to return
+    """
+    try:
+        arg_list = args.split() if args else []
+        if PY_WORKERS > 0 and not fresh_process:
+            return await run_pooled_script(script, arg_list, timeout, ctx, spill_output)
+            
+        return await run_streaming(["python", script] + arg_list, timeout=timeout, ctx=ctx,
+                                   spill=spill_output)
+    except Exception as e:
+        return f"Error executing Python script: {str(e)}"
+
+@mcp.tool()
+async def read_output(output_id: str, offset: int = 0, max_bytes: int = SPILL_READ_BYTES) -> str:
+    """Read output saved by run_command or run_python_script with spill_output.
+    
+    Pass the returned "next_offset" as ``offset`` to continue. Only the
+    newest saved outputs are kept, and all of them are deleted when the
+    server exits.
+    
+    Args:
+        output_id: Output id named in the command result
+        offset: Byte offset to read from
+        max_bytes: Maximum number of bytes to return
     """
     try:
-        cmd = ["python", script]
-        if args:
-            cmd.extend(args.split())
+        path = _spills.get(output_id)
+        if path is None:
+            return f"Error: Output '{output_id}' not found."
             
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True
-        )
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            offset = min(max(offset, 0), size)
+            f.seek(offset)
+            data = f.read(max(max_bytes, 0))
+        eof = offset + len(data) >= size
+        decoder = codecs.getincrementaldecoder(OUTPUT_ENCODING)(errors='replace')
+        text = decoder.decode(data, final=eof)
+        # Leave a character split at the end of the slice for the next read
+        pending = len(decoder.getstate()[0])
+        return json.dumps({
+            "output_id": output_id,
+            "output": text.replace('\r\n', '\n'),
+            "offset": offset,
+            "next_offset": offset + len(data) - pending,
+            "total_bytes": size,
+            "eof": eof
+        })
+    except Exception as e:
+        return f"Error reading output: {str(e)}"
+
+# Background jobs: newest output kept per job, finished jobs kept for inspection
+JOB_BUFFER_BYTES = int(os.environ.get('MCP_TERMINAL_JOB_BUFFER', 1024 * 1024))
+JOB_MAX_FINISHED = 64
+JOB_SAMPLE_INTERVAL = 2.0
+JOB_TAIL_BYTES = 64 * 1024
+JOB_WAIT_TIMEOUT = 30
+_jobs = {}
+_job_ids = itertools.count(1)
+_sampler = None
+
+if sys.platform.startswith('linux'):
+    _CLOCK_TICKS = os.sysconf('SC_CLK_TCK')
+    _PAGE_BYTES = os.sysconf('SC_PAGE_SIZE')
+elif sys.platform == 'win32':
+    import ctypes
+    from ctypes import wintypes
+
+    _TH32CS_SNAPPROCESS = 0x2
+    _PROCESS_QUERY_ACCESS = 0x1000 | 0x0010  # QUERY_LIMITED_INFORMATION | VM_READ
+    _INVALID_HANDLE_VALUE = wintypes.HANDLE(-1).value
+
+    class _ProcessEntry(ctypes.Structure):
+        _fields_ = [('dwSize', wintypes.DWORD), ('cntUsage', wintypes.DWORD),
+                    ('th32ProcessID', wintypes.DWORD), ('th32DefaultHeapID', ctypes.c_size_t),
+                    ('th32ModuleID', wintypes.DWORD), ('cntThreads', wintypes.DWORD),
+                    ('th32ParentProcessID', wintypes.DWORD), ('pcPriClassBase', wintypes.LONG),
+                    ('dwFlags', wintypes.DWORD), ('szExeFile', wintypes.WCHAR * 260)]
+
+    class _MemoryCounters(ctypes.Structure):
+        _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD)] + [
+            (name, ctypes.c_size_t) for name in (
+                'PeakWorkingSetSize', 'WorkingSetSize', 'QuotaPeakPagedPoolUsage',
+                'QuotaPagedPoolUsage', 'QuotaPeakNonPagedPoolUsage',
+                'QuotaNonPagedPoolUsage', 'PagefileUsage', 'PeakPagefileUsage')]
+
+    _kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+    _kernel32.CreateToolhelp32Snapshot.restype = wintypes.HANDLE
+    _kernel32.CreateToolhelp32Snapshot.argtypes = [wintypes.DWORD, wintypes.DWORD]
+    _kernel32.Process32FirstW.argtypes = [wintypes.HANDLE, ctypes.POINTER(_ProcessEntry)]
+    _kernel32.Process32NextW.argtypes = [wintypes.HANDLE, ctypes.POINTER(_ProcessEntry)]
+    _kernel32.OpenProcess.restype = wintypes.HANDLE
+    _kernel32.OpenProcess.argtypes = [wintypes.DWORD, wintypes.BOOL, wintypes.DWORD]
+    _kernel32.GetProcessTimes.argtypes = [wintypes.HANDLE] + [ctypes.POINTER(ctypes.c_uint64)] * 4
+    _kernel32.K32GetProcessMemoryInfo.argtypes = [wintypes.HANDLE, ctypes.POINTER(_MemoryCounters),
+                                                  wintypes.DWORD]
+    _kernel32.CloseHandle.argtypes = [wintypes.HANDLE]
+
+def _windows_children():
+    """Map each live process id to the ids of the processes it started."""
+    children = {}
+    snapshot = _kernel32.CreateToolhelp32Snapshot(_TH32CS_SNAPPROCESS, 0)
+    if snapshot == _INVALID_HANDLE_VALUE:
+        return children
+    try:
+        entry = _ProcessEntry()
+        entry.dwSize = ctypes.sizeof(entry)
+        more = _kernel32.Process32FirstW(snapshot, ctypes.byref(entry))
+        while more:
+            children.setdefault(entry.th32ParentProcessID, []).append(entry.th32ProcessID)
+            more = _kernel32.Process32NextW(snapshot, ctypes.byref(entry))
+    finally:
+        _kernel32.CloseHandle(snapshot)
+    return children
+
+def _windows_process_usage(pid):
+    """Return ``(created, cpu_seconds, working_set_bytes)`` for a process, or None."""
+    handle = _kernel32.OpenProcess(_PROCESS_QUERY_ACCESS, False, pid)
+    if not handle:
+        return None
+    try:
+        created, exited, kernel, user = (ctypes.c_uint64() for _ in range(4))
+        if not _kernel32.GetProcessTimes(handle, ctypes.byref(created), ctypes.byref(exited),
+                                         ctypes.byref(kernel), ctypes.byref(user)):
+            return None
+        counters = _MemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        if not _kernel32.K32GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+            counters.WorkingSetSize = 0
+        # FILETIME counts 100 ns intervals
+        return created.value, (kernel.value + user.value) / 1e7, counters.WorkingSetSize
+    finally:
+        _kernel32.CloseHandle(handle)
+
+def _sample_usage_windows(roots):
+    """Windows counterpart of the /proc scan: walk each job's process tree by parent id.
+
+    Parent ids are not cleared when a parent exits and may be reused, so a
+    process only counts as a child if it started after its parent.
+    """
+    usage = {}
+    children = _windows_children()
+    for root in roots:
+        root_usage = _windows_process_usage(root)
+        if root_usage is None:
+            continue
+        cpu, rss = root_usage[1:]
+        stack = [(root, root_usage[0])]
+        seen = {root}
+        while stack:
+            pid, created = stack.pop()
+            for child in children.get(pid, ()):
+                if child in seen:
+                    continue
+                child_usage = _windows_process_usage(child)
+                if child_usage is None or child_usage[0] < created:
+                    continue
+                seen.add(child)
+                cpu += child_usage[1]
+                rss += child_usage[2]
+                stack.append((child, child_usage[0]))
+        usage[root] = (cpu, rss)
+    return usage
+
+def _sample_usage(sessions):
+    """Sum CPU seconds and RSS bytes over the live processes of each session.
+
+    Jobs start in their own session, so this covers everything a job
+    spawned. Linux reads /proc, where CPU time of children that already
+    exited is included through their parents' counters; Windows walks each
+    job's live process tree and sums working sets. Elsewhere nothing is
+    returned.
+    """
+    usage = {}
+    if sys.platform == 'win32':
+        return _sample_usage_windows(sessions)
+    if not sys.platform.startswith('linux'):
+        return usage
+    wanted = set(sessions)
+    for name in os.listdir('/proc'):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f'/proc/{name}/stat', 'rb') as f:
+                # Fields after the parenthesized command name, which may contain spaces
+                fields = f.read().rsplit(b')', 1)[1].split()
+        except OSError:
+            continue
+        session = int(fields[3])
+        if session in wanted:
+            ticks = sum(int(value) for value in fields[11:15])
+            cpu, rss = usage.get(session, (0, 0))
+            usage[session] = (cpu + ticks / _CLOCK_TICKS, rss + int(fields[21]) * _PAGE_BYTES)
+    return usage
+
+class Job:
+    """A command running in the background with its output in an OutputRing.
+
+    stderr is merged into stdout so offsets address a single stream in the
+    order the command wrote it.
+    """
+
+    def __init__(self, job_id, command, cwd, name, proc):
+        self.job_id = job_id
+        self.command = command
+        self.cwd = cwd
+        self.name = name
+        self.proc = proc
+        self.output = OutputRing(JOB_BUFFER_BYTES)
+        self.started_at = time.time()
+        self.ended_at = None
+        self.cpu_seconds = None
+        self.rss_bytes = None
+        self.peak_rss_bytes = None
+        self.done = asyncio.Event()
+        self.pump = asyncio.ensure_future(self._pump())
+        self.monitor = asyncio.ensure_future(self._monitor())
+
+    async def _pump(self):
+        while True:
+            data = await self.proc.stdout.read(READ_CHUNK_BYTES)
+            if not data:
+                return
+            self.output.write(data)
+
+    async def _monitor(self):
+        await self.proc.wait()
+        # Let the pump drain what the command printed just before exiting
+        await asyncio.wait([self.pump], timeout=KILL_GRACE_SECONDS)
+        self.ended_at = time.time()
+        self.done.set()
+
+    @property
+    def running(self):
+        return not self.done.is_set()
+
+    def record_usage(self, usage):
+        if usage is None:
+            return
+        self.cpu_seconds = round(usage[0], 3)
+        self.rss_bytes = usage[1]
+        self.peak_rss_bytes = max(self.peak_rss_bytes or 0, usage[1])
+
+    def status(self):
+        end = self.ended_at if self.ended_at is not None else time.time()
+        return {
+            "job_id": self.job_id,
+            "name": self.name,
+            "command": self.command,
+            "cwd": self.cwd,
+            "pid": self.proc.pid,
+            "running": self.running,
+            "exit_code": self.proc.returncode if not self.running else None,
+            "started_at": datetime.datetime.fromtimestamp(self.started_at).isoformat(),
+            "elapsed_seconds": round(end - self.started_at, 3),
+            "cpu_seconds": self.cpu_seconds,
+            "rss_bytes": self.rss_bytes if self.running else None,
+            "peak_rss_bytes": self.peak_rss_bytes,
+            "output_bytes": self.output.total,
+            "output_start": self.output.start
+        }
+
+async def _refresh_usage(jobs):
+    """Sample CPU and memory for the running ``jobs`` off the event loop."""
+    running = [job for job in jobs if job.running]
+    if not running:
+        return
+    usage = await asyncio.get_running_loop().run_in_executor(
+        None, _sample_usage, [job.proc.pid for job in running])
+    for job in running:
+        job.record_usage(usage.get(job.proc.pid))
+
+async def _sample_jobs():
+    """Keep resource figures fresh while any job runs, so finished jobs keep their last sample."""
+    global _sampler
+    try:
+        while any(job.running for job in _jobs.values()):
+            await _refresh_usage(list(_jobs.values()))
+            await asyncio.sleep(JOB_SAMPLE_INTERVAL)
+    finally:
+        _sampler = None
+
+def _forget_finished_jobs():
+    """Drop the oldest finished jobs beyond JOB_MAX_FINISHED."""
+    finished = [job_id for job_id, job in _jobs.items() if not job.running]
+    for job_id in finished[:max(len(finished) - JOB_MAX_FINISHED, 0)]:
+        del _jobs[job_id]
+
+@atexit.register
+def _kill_children():
+    """Jobs, sessions and Python workers run in their own process groups; kill them on exit."""
+    procs = ([job.proc for job in _jobs.values()] + [session.proc for session in _sessions.values()]
+             + [worker.proc for worker in _py_workers])
+    for proc in procs:
+        if proc.returncode is None:
+            try:
+                if sys.platform == 'win32':
+                    subprocess.run(['taskkill', '/F', '/T', '/PID', str(proc.pid)],
+                                   capture_output=True)
+                else:
+                    os.killpg(proc.pid, signal.SIGKILL)
+            except OSError:
+                pass
+
+def _job_error(job_id):
+    return f"Error: Job '{job_id}' not found."
+
+@mcp.tool()
+async def start_job(command: str, cwd: Optional[str] = None, name: Optional[str] = None) -> str:
+    """Start a command in the background and return its job id immediately.
+    
+    Use job_tail to read its output, job_status or job_wait to follow it and
+    kill_job to stop it. The newest output of each job is kept in memory
+    (MCP_TERMINAL_JOB_BUFFER bytes, 1 MB by default). Running jobs are
+    killed when the server exits.
+    
+    Args:
+        command: Command to execute
+        cwd: Working directory for the command
+        name: Optional label to recognize the job by
+    """
+    try:
+        proc = await asyncio.create_subprocess_shell(
+            command, cwd=cwd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT, **_process_group_kwargs())
+        job_id = str(next(_job_ids))
+        job = _jobs[job_id] = Job(job_id, command, cwd, name, proc)
+        _forget_finished_jobs()
         
-        output = result.stdout
-        if result.stderr:
-            output += "\nErrors:\n" + result.stderr
+        global _sampler
+        if _sampler is None:
+            _sampler = asyncio.ensure_future(_sample_jobs())
+        return json.dumps(job.status())
+    except Exception as e:
+        return f"Error starting job: {str(e)}"
+
+@mcp.tool()
+async def job_status(job_id: Optional[str] = None) -> str:
+    """Report state, exit code, CPU time and memory of one job or all jobs.
+    
+    CPU time and RSS (the working set on Windows) cover every process the
+    job started and are reported on Linux and Windows; for finished jobs
+    they are the last sample taken while the job ran.
+    
+    Args:
+        job_id: Job to report on; omit to list every job
+    """
+    try:
+        if job_id is None:
+            jobs = list(_jobs.values())
+        elif job_id in _jobs:
+            jobs = [_jobs[job_id]]
+        else:
+            return _job_error(job_id)
             
-        return output
+        await _refresh_usage(jobs)
+        statuses = [job.status() for job in jobs]
+        return json.dumps(statuses if job_id is None else statuses[0])
     except Exception as e:
-        return f"Error executing Python script: {str(e)}"
+        return f"Error getting job status: {str(e)}"
+
+@mcp.tool()
+async def job_tail(job_id: str, offset: Optional[int] = None,
+                   max_bytes: int = JOB_TAIL_BYTES) -> str:
+    """Read a job's output from a byte offset, or its last bytes.
+    
+    Pass the returned "next_offset" as ``offset`` to read on from where the
+    previous call stopped. If the requested bytes were already dropped from
+    the job's buffer, reading starts at the oldest byte still held and
+    "skipped_bytes" says how much was lost.
+    
+    Args:
+        job_id: Job to read
+        offset: Byte offset to read from; omit for the last max_bytes of output
+        max_bytes: Maximum number of bytes to return
+    """
+    try:
+        job = _jobs.get(job_id)
+        if job is None:
+            return _job_error(job_id)
+            
+        ring = job.output
+        requested = max(ring.total - max_bytes, 0) if offset is None else max(offset, 0)
+        data, start = ring.read(requested, max(max_bytes, 0))
+        decoder = codecs.getincrementaldecoder(OUTPUT_ENCODING)(errors='replace')
+        text = decoder.decode(data, final=not job.running)
+        # Leave a character split at the end of the slice for the next read
+        pending = len(decoder.getstate()[0])
+        return json.dumps({
+            "job_id": job_id,
+            "output": text.replace('\r\n', '\n'),
+            "offset": start,
+            "next_offset": start + len(data) - pending,
+            "skipped_bytes": max(start - requested, 0) if offset is not None else 0,
+            "output_bytes": ring.total,
+            "running": job.running
+        })
+    except Exception as e:
+        return f"Error reading job output: {str(e)}"
+
+@mcp.tool()
+async def job_wait(job_id: str, timeout: float = JOB_WAIT_TIMEOUT) -> str:
+    """Wait for a job to finish, up to ``timeout`` seconds, and return its status.
+    
+    Args:
+        job_id: Job to wait for
+        timeout: Maximum number of seconds to wait
+    """
+    try:
+        job = _jobs.get(job_id)
+        if job is None:
+            return _job_error(job_id)
+            
+        try:
+            await asyncio.wait_for(job.done.wait(), max(timeout, 0))
+        except asyncio.TimeoutError:
+            pass
+        await _refresh_usage([job])
+        return json.dumps({**job.status(), "timed_out": job.running})
+    except Exception as e:
+        return f"Error waiting for job: {str(e)}"
+
+@mcp.tool()
+async def kill_job(job_id: str) -> str:
+    """Kill a job and every process it started.
+    
+    Args:
+        job_id: Job to kill
+    """
+    try:
+        job = _jobs.get(job_id)
+        if job is None:
+            return _job_error(job_id)
+            
+        if job.running:
+            await kill_process_group(job.proc)
+            await job.done.wait()
+        return json.dumps(job.status())
+    except Exception as e:
+        return f"Error killing job: {str(e)}"
 
 if __name__ == "__main__":
     # Initialize and run the server
-    mcp.run(transport='stdio') 
\ No newline at end of file
+    mcp.run(transport='stdio')
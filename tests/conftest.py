@@ -0,0 +1,25 @@
+import json
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The servers read their config from %APPDATA% at import time, so point it at
+# a scratch directory that allows everything below it before importing them
+ROOT = os.path.realpath(tempfile.mkdtemp(prefix='mcp_tests_'))
+os.environ['APPDATA'] = os.path.join(ROOT, 'appdata')
+os.environ.setdefault('LOCALAPPDATA', os.path.join(ROOT, 'localappdata'))
+CONFIG_DIR = os.path.join(os.environ['APPDATA'], 'Claude', 'mcp_scripts')
+os.makedirs(CONFIG_DIR)
+with open(os.path.join(CONFIG_DIR, 'allowed_dirs.json'), 'w', encoding='utf-8') as f:
+    json.dump({"allowed_dirs": [os.path.join(ROOT, 'allowed')]}, f)
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+@pytest.fixture
+def workspace(tmp_path_factory):
+    """A fresh directory inside the allowed root."""
+    path = os.path.join(ROOT, 'allowed', tmp_path_factory.mktemp('ws').name)
+    os.makedirs(path)
+    return path
@@ -0,0 +1,36 @@
+import asyncio
+import os
+import tempfile
+
+import pytest
+
+import filesystem
+
+@pytest.fixture
+def escape_link(workspace):
+    """An allowed directory holding a link to a subdirectory outside every allowed root."""
+    outside = tempfile.mkdtemp(prefix='mcp_outside_')
+    os.makedirs(os.path.join(outside, 'sub'))
+    with open(os.path.join(outside, 'secret.txt'), 'w', encoding='utf-8') as f:
+        f.write('secret')
+    link = os.path.join(workspace, 'link')
+    try:
+        os.symlink(os.path.join(outside, 'sub'), link, target_is_directory=True)
+    except (OSError, NotImplementedError):
+        pytest.skip("symlinks are not available")
+    return link
+
+def test_link_to_outside_is_refused(escape_link):
+    assert not filesystem.is_path_allowed(escape_link)
+    assert not filesystem.is_path_allowed(os.path.join(escape_link, 'x.txt'))
+
+def test_parent_of_link_is_resolved_after_the_link(escape_link):
+    path = os.path.join(escape_link, '..', 'secret.txt')
+    assert not filesystem.is_path_allowed(path)
+    assert asyncio.run(filesystem.read_file(path)).startswith("Error")
+
+def test_plain_parent_components_are_allowed(workspace):
+    with open(os.path.join(workspace, 'a.txt'), 'w', encoding='utf-8') as f:
+        f.write('a')
+    os.makedirs(os.path.join(workspace, 'sub'))
+    assert asyncio.run(filesystem.read_file(os.path.join(workspace, 'sub', '..', 'a.txt'))) == 'a'
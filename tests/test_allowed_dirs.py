@@ -0,0 +1,43 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+import allowed_dirs_config
+import allowed_dirs_manager
+
+@pytest.fixture
+def config_file(tmp_path, monkeypatch):
+    path = str(tmp_path / 'allowed_dirs.json')
+    monkeypatch.setattr(allowed_dirs_config, 'ALLOWED_DIRS_PATH', path)
+    monkeypatch.setattr(allowed_dirs_config, 'LEGACY_ALLOWED_DIRS_PATH', str(tmp_path / 'legacy.json'))
+    return path
+
+def test_add_refuses_to_overwrite_malformed_config(config_file):
+    malformed = '{"allowed_dirs": ["/a", "/b",]}'
+    with open(config_file, 'w', encoding='utf-8') as f:
+        f.write(malformed)
+    result = json.loads(asyncio.run(allowed_dirs_manager.add_allowed_directory('/z')))
+    assert not result['success']
+    with open(config_file, encoding='utf-8') as f:
+        assert f.read() == malformed
+    # The servers' read path still falls back to an empty list
+    assert allowed_dirs_config.load_allowed_dirs()[0] == ()
+
+def test_add_keeps_other_keys(config_file):
+    with open(config_file, 'w', encoding='utf-8') as f:
+        json.dump({"allowed_dirs": ["/a"], "note": "keep me"}, f)
+    asyncio.run(allowed_dirs_manager.add_allowed_directory('/z'))
+    with open(config_file, encoding='utf-8') as f:
+        data = json.load(f)
+    assert data == {"allowed_dirs": ["/a", os.path.normpath('/z')], "note": "keep me"}
+
+def test_legacy_config_is_used_only_without_the_current_one(config_file):
+    legacy = allowed_dirs_config.LEGACY_ALLOWED_DIRS_PATH
+    with open(legacy, 'w', encoding='utf-8') as f:
+        json.dump({"allowed_dirs": ["/legacy"]}, f)
+    assert allowed_dirs_config.load_allowed_dirs()[0] == ("/legacy",)
+    with open(config_file, 'w', encoding='utf-8') as f:
+        json.dump({"allowed_dirs": ["/current"]}, f)
+    assert allowed_dirs_config.load_allowed_dirs()[0] == ("/current",)
@@ -0,0 +1,40 @@
+import asyncio
+import json
+import os
+
+import filesystem
+
+def _make_tree(root, dirs=300, files=100):
+    for d in range(dirs):
+        dir_path = os.path.join(root, f'd{d}')
+        os.makedirs(dir_path)
+        for f in range(files):
+            open(os.path.join(dir_path, f'f{f}.txt'), 'w').close()
+
+def test_small_read_finishes_during_large_walk(workspace):
+    tree = os.path.join(workspace, 'tree')
+    _make_tree(tree)
+    small = os.path.join(workspace, 'small.txt')
+    with open(small, 'w', encoding='utf-8') as f:
+        f.write('hello')
+        
+    async def scenario():
+        finished = []
+        
+        async def run(name, coro):
+            result = await coro
+            finished.append(name)
+            return result
+            
+        search = asyncio.create_task(run('search', filesystem.search_files(tree, '*.missing')))
+        # Let the walk get onto the worker pool before the read is issued
+        await asyncio.sleep(0.005)
+        assert not search.done()
+        content = await run('read', filesystem.read_file(small))
+        matches = await search
+        return finished, content, matches
+        
+    finished, content, matches = asyncio.run(scenario())
+    assert content == 'hello'
+    assert json.loads(matches) == []
+    assert finished == ['read', 'search']
@@ -0,0 +1,71 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+import filesystem
+
+def _write(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+def test_regex_edit_keeps_line_endings(workspace):
+    path = os.path.join(workspace, 'ws.txt')
+    _write(path, b'a  \nb  \nc\n')
+    result = asyncio.run(filesystem.edit_file(path, [{'pattern': r'\s+$', 'replacement': ''}]))
+    assert json.loads(result)['applied']
+    assert _read(path) == b'a\nb\nc\n'
+
+def test_regex_edit_anchors_on_crlf_lines(workspace):
+    path = os.path.join(workspace, 'crlf.txt')
+    _write(path, b'foo\r\nfoobar\r\nfoo')
+    result = asyncio.run(filesystem.edit_file(path, [{'pattern': r'^foo$', 'replacement': 'baz'}]))
+    assert json.loads(result)['changes'][0]['occurrences'] == 2
+    assert _read(path) == b'baz\r\nfoobar\r\nbaz'
+
+def test_streamed_literal_edit_on_crlf_file(workspace):
+    path = os.path.join(workspace, 'literal.txt')
+    _write(path, b'one  \r\ntwo\r\n')
+    asyncio.run(filesystem.edit_file(path, [{'oldText': 'two', 'newText': '2'}], stream_threshold=0))
+    assert _read(path) == b'one  \r\n2\r\n'
+
+def test_streamed_dry_run_diff(workspace):
+    path = os.path.join(workspace, 'dry.txt')
+    _write(path, b'a  \nb\n')
+    result = json.loads(asyncio.run(filesystem.edit_file(
+        path, [{'pattern': r'\s+$', 'replacement': ''}], dry_run=True)))
+    assert '-a  \n+a\n' in result['diff']
+    assert _read(path) == b'a  \nb\n'
+
+def test_multi_line_edit_above_the_stream_threshold(workspace):
+    path = os.path.join(workspace, 'multi.txt')
+    _write(path, b'def f():\r\n    return 1\r\n')
+    result = asyncio.run(filesystem.edit_file(
+        path, [{'oldText': 'def f():\n    return 1', 'newText': 'def f():\n    return 2'}],
+        stream_threshold=0))
+    assert json.loads(result)['changes'][0]['oldText'] == 'def f():\n    return 1'
+    assert _read(path) == b'def f():\r\n    return 2\r\n'
+
+@pytest.mark.parametrize('threshold', [None, 0])
+def test_overlapping_edits_are_rejected_on_both_paths(workspace, threshold):
+    path = os.path.join(workspace, 'overlap.txt')
+    _write(path, b'abcdef\n')
+    result = asyncio.run(filesystem.edit_file(
+        path, [{'oldText': 'abcd', 'newText': 'x'}, {'oldText': 'cdef', 'newText': 'y'}],
+        stream_threshold=threshold))
+    assert result == "Error editing file: Edits overlap; combine them into one edit"
+    assert _read(path) == b'abcdef\n'
+
+@pytest.mark.parametrize('threshold', [None, 0])
+def test_prefix_anchor_does_not_shadow_longer_one(workspace, threshold):
+    path = os.path.join(workspace, 'prefix.txt')
+    _write(path, b'foobar\r\nfoo\r\n')
+    asyncio.run(filesystem.edit_file(
+        path, [{'oldText': 'foo', 'newText': 'F'}, {'oldText': 'foobar', 'newText': 'FB'}],
+        stream_threshold=threshold))
+    assert _read(path) == b'FB\r\nF\r\n'
@@ -0,0 +1,32 @@
+import os
+
+import pytest
+
+import filesystem
+
+# Fixed-width lines, so the first chunk ends exactly after line CHUNK_LINES
+LINE_BYTES = 16
+CHUNK_LINES = filesystem.GREP_CHUNK_BYTES // LINE_BYTES
+
+@pytest.fixture
+def big_file(workspace):
+    """A file over two chunks long with a match on each side of the first chunk boundary."""
+    path = os.path.join(workspace, 'big.txt')
+    with open(path, 'w', encoding='utf-8', newline='\n') as f:
+        for line_no in range(1, CHUNK_LINES * 2 + 100):
+            text = 'needle' if line_no in (CHUNK_LINES, CHUNK_LINES + 1) else 'hay'
+            f.write(f'{text} {line_no}'.ljust(LINE_BYTES - 1) + '\n')
+    return path
+
+@pytest.mark.parametrize('is_regex', [False, True])
+def test_matches_on_both_sides_of_a_chunk_boundary(big_file, is_regex):
+    matches, searched, binary = filesystem.grep_batch([big_file], 'needle', is_regex, False, 0, 10)
+    assert searched == 1 and not binary
+    assert [m['line'] for m in matches] == [CHUNK_LINES, CHUNK_LINES + 1]
+    assert matches[1]['text'].startswith(f'needle {CHUNK_LINES + 1}')
+
+def test_context_spans_a_chunk_boundary(big_file):
+    matches, _, _ = filesystem.grep_batch([big_file], 'needle', False, False, 1, 10)
+    assert [m['line'] for m in matches] == [CHUNK_LINES, CHUNK_LINES + 1]
+    assert matches[0]['after'][0].startswith('needle')
+    assert matches[1]['before'][0].startswith('needle')
@@ -0,0 +1,56 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+import allowed_dirs_config
+import filesystem
+
+def _touch(path):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(path)
+
+@pytest.fixture
+def linked_root(tmp_path, monkeypatch):
+    """An allowed directory configured through a symlink; yields its real path."""
+    real = tmp_path / 'real'
+    real.mkdir()
+    _touch(str(real / 'a.txt'))
+    link = tmp_path / 'link'
+    try:
+        os.symlink(str(real), str(link), target_is_directory=True)
+    except (OSError, NotImplementedError):
+        pytest.skip("symlinks are not available")
+    config = str(tmp_path / 'allowed_dirs.json')
+    with open(config, 'w', encoding='utf-8') as f:
+        json.dump({"allowed_dirs": [str(link)]}, f)
+    monkeypatch.setattr(allowed_dirs_config, 'ALLOWED_DIRS_PATH', config)
+    return str(real)
+
+def test_indexed_search_by_real_path_of_linked_root(linked_root):
+    assert filesystem.is_path_allowed(linked_root)
+    result = asyncio.run(filesystem.search_files(linked_root, '*.txt', use_index=True))
+    assert json.loads(result) == [os.path.join(linked_root, 'a.txt')]
+
+def test_changes_by_real_path_of_linked_root(linked_root):
+    
+    async def poll():
+        result = json.loads(await filesystem.changes_since(linked_root))
+        _touch(os.path.join(linked_root, 'b.txt'))
+        changes = []
+        # inotify events reach the watcher thread asynchronously, so allow a few polls
+        for _ in range(20):
+            result = json.loads(await filesystem.changes_since(linked_root, result['cursor']))
+            changes.extend(result['changes'])
+            if changes:
+                break
+            await asyncio.sleep(0.05)
+        return changes
+        
+    changes = asyncio.run(poll())
+    assert [change['path'] for change in changes] == [os.path.join(linked_root, 'b.txt')]
+
+def test_index_root_is_spelled_like_the_path(workspace):
+    upper = os.path.join(os.path.dirname(os.path.dirname(workspace)), 'ALLOWED')
+    assert filesystem._index_root_for(os.path.join(upper, 'x')) == upper
@@ -0,0 +1,38 @@
+import asyncio
+import os
+
+import filesystem
+
+def _files(workspace, count):
+    paths = []
+    for i in range(count):
+        path = os.path.join(workspace, f'f{i}.txt')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f'file {i}')
+        paths.append(path)
+    return paths
+
+def test_plain_call_returns_path_to_content_map(workspace):
+    paths = _files(workspace, 3)
+    result = asyncio.run(filesystem.read_multiple_files(paths))
+    assert result == {path: f'file {i}' for i, path in enumerate(paths)}
+
+def test_budget_returns_pages_with_continuation(workspace):
+    paths = _files(workspace, 3)
+    
+    async def read_all():
+        first = await filesystem.read_multiple_files(paths, max_entries=2)
+        rest = await filesystem.read_multiple_files(paths, continuation=first['continuation'])
+        return first, rest
+        
+    first, rest = asyncio.run(read_all())
+    assert list(first['files']) == paths[:2]
+    assert list(rest['files']) == paths[2:]
+    assert rest['continuation'] is None
+
+def test_refused_and_missing_paths_are_reported_per_file(workspace):
+    paths = _files(workspace, 1) + [os.path.join(workspace, 'missing.txt'), os.path.abspath(os.sep)]
+    result = asyncio.run(filesystem.read_multiple_files(paths))
+    assert result[paths[0]] == 'file 0'
+    assert result[paths[1]].startswith("Error reading file:")
+    assert result[paths[2]] == f"Error: Access to path '{paths[2]}' is not allowed."
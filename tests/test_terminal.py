@@ -0,0 +1,39 @@
+import asyncio
+import sys
+
+import pytest
+
+import terminal
+
+pytestmark = pytest.mark.skipif(sys.platform == 'win32', reason="POSIX session framing")
+
+def _in_session(*commands):
+    """Run commands one after another in a fresh session, failing rather than hanging."""
+    
+    async def run():
+        try:
+            return [await asyncio.wait_for(terminal.run_command(command, session='test'), 10)
+                    for command in commands]
+        finally:
+            await terminal.close_session('test')
+            
+    return asyncio.run(run())
+
+def test_unterminated_quote_is_a_syntax_error_not_a_hang():
+    quoted, after = _in_session('echo "abc', 'echo still here')
+    assert 'nterminated' in quoted or 'unexpected EOF' in quoted
+    assert after.strip() == 'still here'
+
+def test_session_keeps_state_between_commands():
+    _, cwd = _in_session("cd / && X='it''s'", 'echo "$PWD $X"')
+    assert cwd.strip() == '/ its'
+
+def test_redirecting_stdout_does_not_hide_the_end_of_a_command():
+    hidden, shown = _in_session('exec >/dev/null; echo hidden', 'echo shown')
+    assert hidden.strip() == '' and shown.strip() == 'shown'
+
+def test_session_commands_have_a_default_time_limit(monkeypatch):
+    monkeypatch.setattr(terminal, 'SESSION_COMMAND_TIMEOUT', 0.5)
+    timed_out, after = _in_session('sleep 5', 'echo restarted')
+    assert 'timed out after 0.5 seconds' in timed_out
+    assert after.strip() == 'restarted'